@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MenuItem, Table, Customer, Order, OrderItem, Employee
+from .models import MenuItem, Table, Customer, Order, OrderItem, Employee, DailySalesRollup, DailyItemSales, ItemSalesTotal, ReplicaHeartbeat
 
 admin.site.register(MenuItem)
 admin.site.register(Table)
@@ -7,3 +7,7 @@ admin.site.register(Customer)
 admin.site.register(Order)
 admin.site.register(OrderItem)
 admin.site.register(Employee)
+admin.site.register(DailySalesRollup)
+admin.site.register(DailyItemSales)
+admin.site.register(ItemSalesTotal)
+admin.site.register(ReplicaHeartbeat)
@@ -0,0 +1,324 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+
+from .catalog import get_menu_version
+from .conditional import etag, get_order_version, make_etag, menu_etag, orders_etag, tables_etag
+from .customer_search import MAX_SEARCH_LIMIT, SEARCH_LIMIT, search_customers
+from .floor import get_floor_version
+from .models import Customer, MenuItem, Order, OrderItem, Table
+from .queries import filter_orders, parse_order_filters
+from .services import add_lines, open_order, set_order_status
+
+# JSON API, version 1 (/api/v1/)
+# For the POS terminals, which used to scrape the HTML pages. Rows are read
+# with values(), never as model instances, and only the columns a response
+# carries are selected; related names (an order's table number, a line's
+# menu item name) come from the same query through a join.
+#
+# Every list and the order detail take ?fields=a,b,c to pick from the
+# resource's fields below; without it a short default set is returned.
+# Lists are keyset-paginated on the resource's ordering: ?limit= (default
+# 50, at most 200) and ?cursor= from the previous page's next_cursor, so a
+# deep page costs the same as the first. The menu, tables, orders and order
+# detail answer polls with 304 Not Modified like the pages (conditional.py).
+#
+# /customers/search/?q= is the typeahead behind the table form's customer
+# field (customer_search.py): the best `limit` (default 10) prefix matches
+# by name, email or phone, unpaginated.
+#
+# Errors come back as {"errors": [...]} with status 400. POSTs take a JSON
+# body and need the CSRF token like every other form in the app (the
+# csrftoken cookie, sent back in an X-CSRFToken header).
+
+API_PAGE_SIZE = 50
+MAX_API_PAGE_SIZE = 200
+
+
+class Resource:
+    def __init__(self, model, fields, default, ordering):
+        self.model = model
+        # name in the payload -> values() lookup
+        self.fields = fields
+        self.default = default
+        # Concrete, non-null model fields the cursor follows, unique together
+        self.ordering = ordering
+
+
+MENU_ITEMS = Resource(
+    MenuItem,
+    {
+        'id': 'id', 'name': 'name', 'description': 'description', 'price': 'price',
+        'category': 'category', 'available': 'available', 'updated_at': 'updated_at',
+    },
+    default=['id', 'name', 'price', 'category', 'available'],
+    ordering=('category', 'name', 'id'),
+)
+
+TABLES = Resource(
+    Table,
+    {
+        'id': 'id', 'number': 'number', 'capacity': 'capacity', 'state': 'state',
+        'state_changed_at': 'state_changed_at', 'customer_id': 'customer_id', 'customer': 'customer__name',
+    },
+    default=['id', 'number', 'capacity', 'state'],
+    ordering=('number',),
+)
+
+CUSTOMERS = Resource(
+    Customer,
+    {'id': 'id', 'name': 'name', 'email': 'email', 'phone': 'phone', 'created_at': 'created_at'},
+    default=['id', 'name', 'phone'],
+    # Alphabetical through the name_key index, so a page reads `limit` rows
+    # instead of sorting the whole table
+    ordering=('name_key', 'id'),
+)
+
+ORDERS = Resource(
+    Order,
+    {
+        'id': 'id', 'status': 'status', 'total_amount': 'total_amount', 'created_at': 'created_at',
+        'updated_at': 'updated_at', 'table_id': 'table_id', 'table': 'table__number',
+        'customer_id': 'customer_id', 'customer': 'customer__name',
+    },
+    default=['id', 'status', 'table', 'total_amount', 'created_at'],
+    ordering=('-created_at', '-id'),
+)
+
+# The lines of an order, always sent whole
+LINE_FIELDS = {
+    'id': 'id', 'menu_item_id': 'menu_item_id', 'name': 'menu_item__name', 'quantity': 'quantity', 'price': 'price',
+}
+ORDER_DETAIL_DEFAULT = [*ORDERS.default, 'lines']
+
+
+def json_errors(view):
+    """Turn a ValidationError raised by the view into a 400 with its messages."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ValidationError as e:
+            return JsonResponse({'errors': e.messages}, status=400)
+    return wrapper
+
+
+def selected_fields(request, available, default):
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(default)
+    names = list(dict.fromkeys(name.strip() for name in requested.split(',') if name.strip()))
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        raise ValidationError(
+            f"fields must be a comma-separated list of: {', '.join(available)}."
+        )
+    return names
+
+
+def page_limit(request):
+    try:
+        limit = int(request.GET.get('limit', API_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_API_PAGE_SIZE:
+        raise ValidationError(f"limit must be a number from 1 to {MAX_API_PAGE_SIZE}.")
+    return limit
+
+
+def flag(value, name):
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise ValidationError(f"{name} must be true or false.")
+
+
+def json_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        raise ValidationError("Request body must be a JSON object.")
+    return data
+
+
+# Cursors
+# The ordering values of the last row on a page, as JSON in URL-safe base64.
+def _cursor_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(row, ordering):
+    values = [_cursor_value(row[name.lstrip('-')]) for name in ordering]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, resource):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(resource.ordering):
+            raise ValueError
+        return [
+            resource.model._meta.get_field(name.lstrip('-')).to_python(value)
+            for name, value in zip(resource.ordering, values)
+        ]
+    except (ValueError, TypeError, UnicodeDecodeError, ValidationError):
+        raise ValidationError("cursor is not valid.")
+
+
+def after(ordering, values):
+    """Rows that come after `values` in `ordering`."""
+    condition = Q()
+    for i, name in enumerate(ordering):
+        term = Q(**{f"{name.lstrip('-')}__{'lt' if name.startswith('-') else 'gt'}": values[i]})
+        for previous, value in zip(ordering[:i], values):
+            term &= Q(**{previous.lstrip('-'): value})
+        condition |= term
+    return condition
+
+
+def page(request, resource, queryset):
+    fields = selected_fields(request, resource.fields, resource.default)
+    limit = page_limit(request)
+    lookups = {name: resource.fields[name] for name in fields}
+    columns = list(dict.fromkeys([*lookups.values(), *(name.lstrip('-') for name in resource.ordering)]))
+
+    queryset = queryset.order_by(*resource.ordering)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        queryset = queryset.filter(after(resource.ordering, decode_cursor(cursor, resource)))
+    # One extra row tells us whether there is a next page
+    rows = list(queryset.values(*columns)[:limit + 1])
+    return {
+        'results': [{name: row[lookup] for name, lookup in lookups.items()} for row in rows[:limit]],
+        'next_cursor': encode_cursor(rows[limit - 1], resource.ordering) if len(rows) > limit else None,
+    }
+
+
+def order_payload(pk, fields):
+    lookups = {name: ORDERS.fields[name] for name in fields if name != 'lines'}
+    row = get_object_or_404(Order.objects.values('id', *lookups.values()), pk=pk)
+    payload = {name: row[lookup] for name, lookup in lookups.items()}
+    if 'lines' in fields:
+        lines = OrderItem.objects.filter(order_id=pk).order_by('id').values(*LINE_FIELDS.values())
+        payload['lines'] = [{name: line[lookup] for name, lookup in LINE_FIELDS.items()} for line in lines]
+    return payload
+
+
+def order_etag(request, id):
+    # Lines carry menu item names, and the table number and customer name
+    # come from the floor map's rows
+    return make_etag('api-order', id, get_order_version(id), get_menu_version(), get_floor_version())
+
+
+@require_GET
+@etag(menu_etag)
+@json_errors
+def menu_items(request):
+    queryset = MenuItem.objects.all()
+    if request.GET.get('category'):
+        queryset = queryset.filter(category=request.GET['category'])
+    if request.GET.get('available'):
+        queryset = queryset.filter(available=flag(request.GET['available'], 'available'))
+    return JsonResponse(page(request, MENU_ITEMS, queryset))
+
+
+@require_GET
+@etag(tables_etag)
+@json_errors
+def tables(request):
+    queryset = Table.objects.all()
+    state = request.GET.get('state')
+    if state:
+        if state not in dict(Table.STATE_CHOICES):
+            raise ValidationError(f"state must be one of {', '.join(dict(Table.STATE_CHOICES))}.")
+        queryset = queryset.filter(state=state)
+    return JsonResponse(page(request, TABLES, queryset))
+
+
+@require_GET
+@json_errors
+def customers(request):
+    return JsonResponse(page(request, CUSTOMERS, Customer.objects.all()))
+
+
+@require_GET
+@json_errors
+def customer_search(request):
+    fields = selected_fields(request, CUSTOMERS.fields, CUSTOMERS.default)
+    try:
+        limit = int(request.GET.get('limit', SEARCH_LIMIT))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_SEARCH_LIMIT:
+        raise ValidationError(f"limit must be a number from 1 to {MAX_SEARCH_LIMIT}.")
+    lookups = {name: CUSTOMERS.fields[name] for name in fields}
+    rows = search_customers(
+        request.GET.get('q', '').strip(), limit, Customer.objects.values('id', *lookups.values()),
+    )
+    return JsonResponse({'results': [{name: row[lookup] for name, lookup in lookups.items()} for row in rows]})
+
+
+@require_http_methods(['GET', 'HEAD', 'POST'])
+@etag(orders_etag)
+@json_errors
+def orders(request):
+    if request.method == 'POST':
+        # {"table_id": 3, "status": "Pending"}; the table's seated customer is used
+        data = json_body(request)
+        status = data.get('status', Order.PENDING)
+        if status not in dict(Order.ORDER_STATUS_CHOICES):
+            raise ValidationError(f"status must be one of {', '.join(dict(Order.ORDER_STATUS_CHOICES))}.")
+        if not isinstance(data.get('table_id'), int):
+            raise ValidationError("table_id must be a table id.")
+        order = open_order(get_object_or_404(Table, pk=data['table_id']), status)
+        return JsonResponse(order_payload(order.pk, ORDER_DETAIL_DEFAULT), status=201)
+
+    queryset = filter_orders(Order.objects.all(), parse_order_filters(request.GET))
+    return JsonResponse(page(request, ORDERS, queryset))
+
+
+@require_GET
+@etag(order_etag)
+@json_errors
+def order(request, id):
+    fields = selected_fields(request, [*ORDERS.fields, 'lines'], ORDER_DETAIL_DEFAULT)
+    return JsonResponse(order_payload(id, fields))
+
+
+@require_POST
+@json_errors
+def order_lines(request, id):
+    # {"items": [{"menu_item_id": 1, "quantity": 2}, ...]}
+    order = get_object_or_404(Order, pk=id)
+    items = json_body(request).get('items')
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValidationError("items must be a list of {menu_item_id, quantity} objects.")
+    add_lines(order, [(item.get('menu_item_id'), item.get('quantity')) for item in items])
+    return JsonResponse(order_payload(order.pk, ORDER_DETAIL_DEFAULT), status=201)
+
+
+@require_POST
+@json_errors
+def order_status(request, id):
+    # {"status": "Completed"}
+    order = get_object_or_404(Order, pk=id)
+    status = json_body(request).get('status')
+    if status not in dict(Order.ORDER_STATUS_CHOICES):
+        raise ValidationError(f"status must be one of {', '.join(dict(Order.ORDER_STATUS_CHOICES))}.")
+    set_order_status(order, status)
+    return JsonResponse(order_payload(order.pk, ORDER_DETAIL_DEFAULT))
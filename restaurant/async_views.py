@@ -0,0 +1,106 @@
+import asyncio
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.http import Http404
+from django.shortcuts import render
+from django.utils import timezone
+
+from .catalog import aget_menu_catalog
+from .conditional import etag, menu_etag, order_detail_etag, orders_etag, tables_etag
+from .customer_search import acustomer_page
+from .floor import aget_floor_map
+from .models import Customer, DailySalesRollup, Employee, MenuItem, Order
+from .queries import apaginate_orders, filter_orders, order_with_lines, orders_for_list, parse_order_filters
+from .rollups import aleaderboard, asales_for_week
+from .routers import replica_reads
+
+# Async read views
+# The read-heavy pages again, written against the async ORM so that under
+# ASGI they wait on the database without holding a worker thread. urls.py
+# serves these instead of the ones in views.py when ASYNC_READ_VIEWS is on.
+# Everything a template touches is loaded before rendering, because a lazy
+# query from inside a template is not allowed in async code.
+
+
+@replica_reads
+async def dashboard(request):
+    today = timezone.localdate()
+    week_start = today - timedelta(days=today.weekday())
+
+    # The aggregates do not depend on each other, so they are awaited together.
+    # Django still runs the queries of one request on one connection, so this
+    # saves the hops between them rather than making the database run them in
+    # parallel.
+    weekly_sales, popular, totals, floor, total_menu_items, total_customers, total_employees = (
+        await asyncio.gather(
+            asales_for_week(week_start),
+            aleaderboard('all', limit=4),
+            DailySalesRollup.objects.aaggregate(total=Sum('order_count')),
+            aget_floor_map(),
+            MenuItem.objects.acount(),
+            Customer.objects.acount(),
+            Employee.objects.acount(),
+        )
+    )
+
+    context = {
+        'total_orders': totals['total'] or 0,
+        'occupied_tables': floor.occupied,
+        'total_menu_items': total_menu_items,
+        'total_customers': total_customers,
+        'total_employees': total_employees,
+        'weekly_sales': weekly_sales,
+        'popular_items': {
+            'labels': [item['menu_item__name'] for item in popular],
+            'data': [item['quantity'] for item in popular],
+        },
+    }
+    return render(request, 'restaurant/dashboard.html', context)
+
+
+@etag(orders_etag)
+async def orders(request):
+    filters = parse_order_filters(request.GET)
+    queryset = filter_orders(orders_for_list(), filters)
+    orders, next_cursor = await apaginate_orders(queryset, cursor=request.GET.get('cursor'))
+
+    params = request.GET.copy()
+    params.pop('cursor', None)
+
+    context = {
+        'orders': orders,
+        'filters': filters,
+        'status_choices': Order.ORDER_STATUS_CHOICES,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+        'filter_query': params.urlencode(),
+    }
+    return render(request, 'restaurant/orders.html', context)
+
+
+@etag(menu_etag)
+async def menu(request):
+    catalog = await aget_menu_catalog()
+    return render(request, 'restaurant/menu.html', {'menu_items': catalog.items, 'menu_version': catalog.version})
+
+
+@etag(tables_etag)
+async def tables(request):
+    floor = await aget_floor_map()
+    return render(request, 'restaurant/tables.html', {'tables': floor.tables, 'floor_version': floor.version})
+
+
+async def customer_list(request):
+    query = request.GET.get('q', '').strip()
+    customers, more = await acustomer_page(query)
+    return render(request, 'restaurant/customers.html', {'customers': customers, 'more': more, 'query': query})
+
+
+@etag(order_detail_etag)
+async def order_detail(request, id):
+    try:
+        order = await order_with_lines().aget(id=id)
+    except Order.DoesNotExist:
+        raise Http404("No Order matches the given query.")
+    return render(request, 'restaurant/order_detail.html', {'order': order})
@@ -0,0 +1,91 @@
+from itertools import groupby
+
+from django.core.cache import cache
+
+from .models import MenuItem
+from .routers import primary_reads
+from .versions import aget_version, bump_version, get_version
+
+# Menu catalog
+# The menu changes a few times a day but is read on every order-entry page.
+# A snapshot of all menu items is stored in Django's cache under the current
+# menu version, and each process also keeps the last snapshot it built in
+# memory. Writes to MenuItem bump the version (see signals.py), as do bulk
+# imports, so readers only ever pay for one lookup of the version number
+# until the menu actually changes. The version is kept in the database (see
+# versions.py), so a bump made by any process, a management command
+# included, reaches every other one.
+
+VERSION_KEY = 'menu_catalog'
+SNAPSHOT_KEY = 'menu_catalog:items:{version}'
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+_snapshot = None
+
+
+class MenuCatalog:
+    def __init__(self, version, items):
+        self.version = version
+        self.items = items
+        self.by_id = {item.pk: item for item in items}
+        self.available = [item for item in items if item.available]
+
+    def get(self, pk):
+        return self.by_id.get(pk)
+
+    def available_by_category(self):
+        """[(category, [items])] for the items that can currently be ordered."""
+        return [(category, list(items)) for category, items in groupby(self.available, key=lambda i: i.category)]
+
+
+def get_menu_version():
+    return get_version(VERSION_KEY)
+
+
+def bump_menu_version():
+    bump_version(VERSION_KEY)
+
+
+def _menu_items():
+    return MenuItem.objects.order_by('category', 'name', 'id')
+
+
+def get_menu_catalog():
+    global _snapshot
+    version = get_menu_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    key = SNAPSHOT_KEY.format(version=version)
+    items = cache.get(key)
+    if items is None:
+        with primary_reads():
+            items = list(_menu_items())
+        cache.set(key, items, SNAPSHOT_TIMEOUT)
+
+    _snapshot = MenuCatalog(version, items)
+    return _snapshot
+
+
+async def aget_menu_version():
+    return await aget_version(VERSION_KEY)
+
+
+async def aget_menu_catalog():
+    """Async version of get_menu_catalog(), sharing the same snapshots."""
+    global _snapshot
+    version = await aget_menu_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    key = SNAPSHOT_KEY.format(version=version)
+    items = await cache.aget(key)
+    if items is None:
+        with primary_reads():
+            items = [item async for item in _menu_items()]
+        await cache.aset(key, items, SNAPSHOT_TIMEOUT)
+
+    _snapshot = MenuCatalog(version, items)
+    return _snapshot
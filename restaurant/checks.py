@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Deployment checks, run by `manage.py check --deploy`
+
+
+@register(Tags.staticfiles, deploy=True)
+def check_self_hosted_assets(app_configs, **kwargs):
+    if settings.SELF_HOSTED_ASSETS:
+        return []
+    missing = [str(path) for path in settings.BUILT_ASSETS if not path.exists()]
+    return [Warning(
+        "Pages load Tailwind (its in-browser compiler), Alpine, Font Awesome "
+        "and Chart.js from CDNs.",
+        hint=(
+            "Run `npm install && python manage.py build_assets` and commit "
+            "package-lock.json and restaurant/static/restaurant. Missing: "
+            + (', '.join(missing) if missing else "none; RESTAURANT_SELF_HOSTED_ASSETS is off.")
+        ),
+        id='restaurant.W001',
+    )]
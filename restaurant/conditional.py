@@ -0,0 +1,124 @@
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from .catalog import get_menu_version
+from .floor import get_floor_version
+from .models import Order
+from .routers import primary_reads
+from .versions import bump_version, get_version
+
+# Conditional GET
+# Waiter tablets and kitchen screens poll the orders, order detail, menu and
+# tables pages. Each of those pages gets an ETag made from the versions of
+# everything it shows, and a poll whose If-None-Match still matches is
+# answered 304 Not Modified before the view runs:
+#  - menu: the menu catalog version (catalog.py);
+#  - tables: the floor map version (floor.py);
+#  - orders: the orders version below, plus the floor version for the table
+#    numbers and customer names in each row;
+#  - order detail: that order's own version (Order.version), plus the menu
+#    version for the names on its lines.
+# Once a change to an order or one of its lines commits, the orders version
+# and that order's version are bumped (signals.py, and services.py for the
+# bulk writes that skip signals), like the menu and floor versions. The
+# versions are kept in the database so that every worker process sees a
+# bump (see versions.py), and each one is read by primary key, so a poll
+# costs one or two indexed lookups instead of the page's queries.
+#
+# Pages holding a form (tables, order detail) also hash in the client's CSRF
+# cookie, so a client whose token changed is sent a page with a new one.
+# Only ETags are sent, not Last-Modified: versions are counters rather than
+# times, and If-Modified-Since on its own could not notice a renamed menu
+# item on an unchanged order.
+
+ORDERS_VERSION_KEY = 'orders'
+
+
+def get_orders_version():
+    return get_version(ORDERS_VERSION_KEY)
+
+
+def get_order_version(pk):
+    """Order `pk`'s version, or None if there is no such order."""
+    with primary_reads():
+        return Order.objects.filter(pk=pk).values_list('version', flat=True).first()
+
+
+def bump_orders_version(pk=None):
+    """Mark the orders list, and order `pk` if given, as changed."""
+    bump_version(ORDERS_VERSION_KEY)
+    if pk is not None:
+        # Set from the clock rather than incremented: saving an Order read
+        # before the last bump writes its old version back, and the bump that
+        # follows must not then land on a number a client has already seen.
+        Order.objects.filter(pk=pk).update(version=time.time_ns())
+
+
+def make_etag(*parts, request=None):
+    if request is not None:
+        parts += (request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),)
+    return hashlib.md5(':'.join(map(str, parts)).encode(), usedforsecurity=False).hexdigest()
+
+
+def menu_etag(request):
+    return make_etag('menu', get_menu_version())
+
+
+def tables_etag(request):
+    return make_etag('tables', get_floor_version(), request=request)
+
+
+def orders_etag(request):
+    return make_etag('orders', get_orders_version(), get_floor_version())
+
+
+def order_detail_etag(request, id):
+    return make_etag('order', id, get_order_version(id), get_menu_version(), request=request)
+
+
+def _conditional_response(request, etag):
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=quote_etag(etag))
+
+
+def _set_etag(response, etag):
+    if etag is not None and response.status_code in (200, 304):
+        response.headers.setdefault('ETag', quote_etag(etag))
+    return response
+
+
+def etag(etag_func):
+    """
+    Answer GET and HEAD requests whose If-None-Match matches etag_func(request,
+    *args, **kwargs) with a 304 without running the view.
+
+    Like django.views.decorators.http.etag, but for an async view etag_func is
+    run in a thread, so it may block on the database.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                tag = await sync_to_async(etag_func)(request, *args, **kwargs) if request.method in ('GET', 'HEAD') else None
+                response = _conditional_response(request, tag)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _set_etag(response, tag)
+            return markcoroutinefunction(wrapper)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            tag = etag_func(request, *args, **kwargs) if request.method in ('GET', 'HEAD') else None
+            response = _conditional_response(request, tag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return _set_etag(response, tag)
+        return wrapper
+    return decorator
@@ -0,0 +1,93 @@
+from django.db import connections
+from django.db.models import Q
+
+from .models import Customer, phone_digits, search_key
+
+# Customer lookup
+# The typeahead on the table form and the search box on the customers page
+# match what was typed against the start of a customer's name, last name,
+# email or phone. Those are matched on the normalised copies Customer keeps
+# (name_key, surname_key, email_key, phone_key), each with its own index,
+# so a lookup is an index range scan of at most `limit` rows per key however
+# many customers there are: no LIKE '%...%' and no full scan.
+#
+# Input that looks like a phone number (digits, spaces, + - ( ) .) is only
+# matched against phone numbers, and input with an @ only against emails.
+# Anything else tries names first, then last names, then emails, and stops
+# as soon as it has `limit` customers.
+
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 100
+# The customers page lists this many: the newest, or the best matches for
+# its search box
+CUSTOMER_LIST_LIMIT = 100
+PHONE_CHARACTERS = set('0123456789 +-().')
+
+
+def _prefix(queryset, key, prefix):
+    if connections[queryset.db].vendor == 'mysql':
+        # LIKE 'abc%' is a range scan on MySQL; the keys are already
+        # lowercase, so the case-insensitive collation does not matter
+        return queryset.filter(**{f'{key}__istartswith': prefix})
+    # SQLite only uses an index for LIKE on NOCASE columns, but a range on
+    # the key works anywhere: U+10FFFF sorts after every other character.
+    return queryset.filter(Q(**{f'{key}__gte': prefix}) & Q(**{f'{key}__lt': prefix + '\U0010ffff'}))
+
+
+def lookups(query, queryset=None):
+    """The querysets to try for `query`, best matches first."""
+    queryset = Customer.objects.all() if queryset is None else queryset
+    if query and set(query) <= PHONE_CHARACTERS:
+        digits = phone_digits(query)
+        return [_prefix(queryset, 'phone_key', digits).order_by('phone_key')] if digits else []
+    prefix = search_key(query)
+    if not prefix:
+        return []
+    keys = ['email_key'] if '@' in prefix else ['name_key', 'surname_key', 'email_key']
+    return [_prefix(queryset, key, prefix).order_by(key, 'id') for key in keys]
+
+
+def _pk(row):
+    return row['id'] if isinstance(row, dict) else row.pk
+
+
+def search_customers(query, limit=SEARCH_LIMIT, queryset=None):
+    """
+    Up to `limit` customers whose name, last name, email or phone starts with
+    `query`. `queryset` may narrow the columns, e.g. Customer.objects.values(
+    'id', 'name'); values() rows must include the id.
+    """
+    found = {}
+    for candidates in lookups(query, queryset):
+        for row in candidates[:limit]:
+            found.setdefault(_pk(row), row)
+        if len(found) >= limit:
+            break
+    return list(found.values())[:limit]
+
+
+async def asearch_customers(query, limit=SEARCH_LIMIT, queryset=None):
+    found = {}
+    for candidates in lookups(query, queryset):
+        async for row in candidates[:limit]:
+            found.setdefault(_pk(row), row)
+        if len(found) >= limit:
+            break
+    return list(found.values())[:limit]
+
+
+def customer_page(query):
+    """(customers, more) for the customers page; `more` if some were left out."""
+    if query:
+        customers = search_customers(query, CUSTOMER_LIST_LIMIT + 1)
+    else:
+        customers = list(Customer.objects.order_by('-created_at', '-id')[:CUSTOMER_LIST_LIMIT + 1])
+    return customers[:CUSTOMER_LIST_LIMIT], len(customers) > CUSTOMER_LIST_LIMIT
+
+
+async def acustomer_page(query):
+    if query:
+        customers = await asearch_customers(query, CUSTOMER_LIST_LIMIT + 1)
+    else:
+        customers = [c async for c in Customer.objects.order_by('-created_at', '-id')[:CUSTOMER_LIST_LIMIT + 1]]
+    return customers[:CUSTOMER_LIST_LIMIT], len(customers) > CUSTOMER_LIST_LIMIT
@@ -0,0 +1,233 @@
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+# Database connection pool
+# Django can keep one connection per thread open between requests
+# (CONN_MAX_AGE), but under ASGI, or with more threads than the database
+# should serve, a shared pool is the better fit: a request checks a
+# connection out when it first touches the database and hands it back when
+# Django closes it at the end of the request. The backends in restaurant/db/
+# turn this on with OPTIONS['pool'], the same switch Django's PostgreSQL
+# backend uses, taking True or a dict of the ConnectionPool arguments below.
+#
+# Connections are handed out most recently used first, so a quiet pool
+# settles on a few warm connections and the rest age out. With
+# CONN_HEALTH_CHECKS a connection is pinged before it is handed out.
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, min_size=0, max_size=10, timeout=30.0, max_lifetime=3600.0, max_idle=600.0, check=None):
+        if max_size < 1 or not 0 <= min_size <= max_size:
+            raise ImproperlyConfigured("Connection pool sizes need 0 <= min_size <= max_size and max_size >= 1.")
+        # min_size connections are opened by open()
+        self.min_size = min_size
+        self.max_size = max_size
+        # Seconds to wait for a connection when max_size are in use
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check = check
+        self.connects = 0
+        self.closed = False
+        self._idle = deque()
+        self._opened_at = {}
+        self._size = 0
+        self._lock = threading.Condition()
+
+    @property
+    def size(self):
+        """Connections open, whether idle or checked out."""
+        return self._size
+
+    def open(self, connect):
+        """Open connections until min_size are open."""
+        while True:
+            with self._lock:
+                if self.closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = self._connect(connect)
+            except BaseException:
+                self._forget(None)
+                raise
+            self.putconn(connection)
+
+    def getconn(self, connect):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                connection = self._checkout(deadline)
+            if connection is None:
+                break
+            if self.check is None or self.check(connection):
+                return connection
+            self._close(connection)
+        try:
+            return self._connect(connect)
+        except BaseException:
+            self._forget(None)
+            raise
+
+    def putconn(self, connection, discard=False):
+        if connection not in self._opened_at:
+            # Checked out of a pool that has since been replaced
+            connection.close()
+            return
+        now = time.monotonic()
+        expired = now - self._opened_at[connection] >= self.max_lifetime
+        if discard or expired or self.closed:
+            self._close(connection)
+            return
+        with self._lock:
+            self._idle.append((connection, now))
+            self._lock.notify()
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            idle, self._idle = list(self._idle), deque()
+        for connection, returned in idle:
+            self._close(connection)
+
+    def _checkout(self, deadline):
+        """An idle connection, or None after reserving room to open one. Called with the lock held."""
+        while True:
+            if self.closed:
+                raise PoolTimeout("The connection pool is closed.")
+            now = time.monotonic()
+            while self._idle:
+                connection, returned = self._idle.pop()
+                if now - returned < self.max_idle and now - self._opened_at[connection] < self.max_lifetime:
+                    return connection
+                self._close(connection, locked=True)
+            if self._size < self.max_size:
+                self._size += 1
+                return None
+            remaining = deadline - now
+            if remaining <= 0:
+                raise PoolTimeout(f"No database connection free after {self.timeout}s ({self.max_size} in use).")
+            self._lock.wait(remaining)
+
+    def _connect(self, connect):
+        connection = connect()
+        self._opened_at[connection] = time.monotonic()
+        self.connects += 1
+        return connection
+
+    def _close(self, connection, locked=False):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        if locked:
+            self._opened_at.pop(connection, None)
+            self._size -= 1
+            self._lock.notify()
+        else:
+            self._forget(connection)
+
+    def _forget(self, connection):
+        with self._lock:
+            self._opened_at.pop(connection, None)
+            self._size -= 1
+            self._lock.notify()
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Serve a Django backend's connections from a ConnectionPool when its
+    OPTIONS['pool'] is set, and behave exactly like the backend otherwise.
+    """
+
+    _connection_pools = {}
+    _pools_lock = threading.Lock()
+
+    def pool_supported(self):
+        return True
+
+    @staticmethod
+    def check_connection(connection):
+        """Whether a pooled raw connection still works."""
+        return True
+
+    @property
+    def pool(self):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options or not self.pool_supported():
+            return None
+        # Keyed by NAME too, as the test runner points an alias at another database
+        key = (self.alias, self.settings_dict['NAME'])
+        pool = self._connection_pools.get(key)
+        if pool is None:
+            if self.settings_dict.get('CONN_MAX_AGE', 0) != 0:
+                raise ImproperlyConfigured("Pooling doesn't support persistent connections; set CONN_MAX_AGE to 0.")
+            options = {} if options is True else dict(options)
+            if self.settings_dict['CONN_HEALTH_CHECKS']:
+                options.setdefault('check', type(self).check_connection)
+            with self._pools_lock:
+                pool = self._connection_pools.setdefault(key, ConnectionPool(**options))
+        return pool
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def connect_raw(self):
+        return super().get_new_connection(self.get_connection_params())
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            return pool.getconn(partial(super().get_new_connection, conn_params))
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        # Anything left mid-transaction or after an error is not handed on
+        discard = (
+            self.in_atomic_block or self.errors_occurred
+            or self.autocommit != self.settings_dict['AUTOCOMMIT']
+        )
+        connection, self.connection = self.connection, None
+        with self.wrap_database_errors:
+            pool.putconn(connection, discard=discard)
+
+    def close_pool(self):
+        pool = self._connection_pools.pop((self.alias, self.settings_dict['NAME']), None)
+        if pool is not None:
+            pool.close()
+
+
+def open_pools():
+    """Startup hook: open min_size connections in every pooled database."""
+    for alias in connections:
+        if not connections.settings[alias]['OPTIONS'].get('pool'):
+            continue
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is not None:
+            pool.open(connections[alias].connect_raw)
+
+
+def close_pools():
+    """Shutdown hook: close every idle pooled connection."""
+    with PooledDatabaseWrapperMixin._pools_lock:
+        pools = list(PooledDatabaseWrapperMixin._connection_pools.values())
+        PooledDatabaseWrapperMixin._connection_pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,11 @@
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+
+from ..pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, SQLiteDatabaseWrapper):
+    """SQLite with optional pooling, for development and benchmarks against MySQL."""
+
+    def pool_supported(self):
+        # Django keeps an in-memory database on one connection for its lifetime
+        return not self.is_in_memory_db()
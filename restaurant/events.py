@@ -0,0 +1,130 @@
+import asyncio
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Kitchen events
+# Order changes that the kitchen display cares about are published here after
+# their transaction commits. Each event carries everything a screen needs to
+# update itself, so connected screens never query the database for updates.
+#
+# LocalBroker fans events out to the subscribers in this process only. With
+# more than one worker process, point KITCHEN_EVENT_BROKER at a class with
+# the same publish/subscribe/unsubscribe interface backed by a shared broker.
+
+ORDER_CREATED = 'order_created'
+ITEMS_ADDED = 'items_added'
+LINE_UPDATED = 'line_updated'
+STATUS_CHANGED = 'status_changed'
+ORDER_REMOVED = 'order_removed'
+
+
+class Event:
+    __slots__ = ('id', 'kind', 'data')
+
+    def __init__(self, id, kind, data):
+        self.id = id
+        self.kind = kind
+        self.data = data
+
+    def to_sse(self):
+        return f"id: {self.id}\nevent: {self.kind}\ndata: {json.dumps(self.data)}\n\n"
+
+
+class Subscription:
+    """The queue of events waiting for one connected screen."""
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def put(self, event):
+        # Called from whichever thread published the event
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The screen's event loop has gone away
+            self.overflowed = True
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A screen this far behind has to start over from a snapshot
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """The next event, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    def __init__(self, history=500, queue_size=1000):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.history = deque(maxlen=history)
+        self.queue_size = queue_size
+        self.last_id = 0
+
+    def publish(self, kind, data):
+        with self.lock:
+            self.last_id += 1
+            event = Event(self.last_id, kind, data)
+            self.history.append(event)
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.put(event)
+        return event
+
+    def subscribe(self, last_id=None):
+        """
+        Start receiving events on the running event loop.
+
+        Returns (subscription, missed). `missed` is the list of events after
+        `last_id` still in the history, or None when the caller has to reload
+        a snapshot because the events it missed are no longer available.
+        """
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self.lock:
+            self.subscribers.add(subscription)
+            missed = None
+            if last_id is not None and last_id <= self.last_id:
+                oldest = self.history[0].id if self.history else self.last_id + 1
+                if last_id >= oldest - 1:
+                    missed = [event for event in self.history if event.id > last_id]
+        return subscription, missed
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'KITCHEN_EVENT_BROKER', 'restaurant.events.LocalBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def publish_on_commit(kind, data):
+    """Publish once the surrounding transaction commits, never for a rollback."""
+    transaction.on_commit(lambda: get_broker().publish(kind, data))
+
+
+def line_data(line, menu_item):
+    return {'id': line.pk, 'name': menu_item.name, 'quantity': line.quantity}
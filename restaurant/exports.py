@@ -0,0 +1,159 @@
+import csv
+import json
+import zlib
+
+from django.db.models import Q
+
+from .models import OrderItem
+
+# Order history export
+# Orders are read in keyset batches over (created_at, id) and each batch's
+# lines in one more query, so an export holds one batch in memory however
+# long the history is. The MySQL driver buffers a whole result set on the
+# client even under QuerySet.iterator(), which is why batches are fetched
+# as separate queries rather than from one cursor.
+
+EXPORT_BATCH_SIZE = 2000
+# Output is handed to the response in pieces of about this many bytes
+FLUSH_BYTES = 64 * 1024
+
+CSV_HEADER = [
+    'order_id', 'created_at', 'status', 'table', 'customer', 'order_total',
+    'line_id', 'menu_item_id', 'menu_item', 'category', 'quantity', 'unit_price', 'line_total',
+]
+
+ORDER_FIELDS = ('id', 'created_at', 'status', 'table__number', 'customer__name', 'total_amount')
+LINE_FIELDS = ('id', 'order_id', 'menu_item_id', 'menu_item__name', 'menu_item__category', 'quantity', 'price')
+
+
+def order_batches(queryset, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of (order, [lines]) value dicts, oldest order first."""
+    queryset = queryset.order_by('created_at', 'id').values(*ORDER_FIELDS)
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            page = page.filter(Q(created_at__gt=last['created_at']) | Q(created_at=last['created_at'], id__gt=last['id']))
+        orders = list(page[:batch_size])
+        if not orders:
+            return
+        lines = {order['id']: [] for order in orders}
+        for line in OrderItem.objects.using(queryset.db).filter(order_id__in=list(lines)).order_by('id').values(*LINE_FIELDS):
+            lines[line['order_id']].append(line)
+        yield [(order, lines[order['id']]) for order in orders]
+        if len(orders) < batch_size:
+            return
+        last = orders[-1]
+
+
+class _Buffer:
+    """A file-like object csv.writer can write into, drained after each batch."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+    def drain(self):
+        text = ''.join(self.parts)
+        self.parts = []
+        return text
+
+
+def csv_chunks(batches):
+    """One CSV row per order line; orders without lines get one row with blank line columns."""
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    yield buffer.drain()
+    for batch in batches:
+        for order, lines in batch:
+            head = [
+                order['id'], order['created_at'].isoformat(), order['status'], order['table__number'],
+                order['customer__name'] or '', order['total_amount'],
+            ]
+            if not lines:
+                writer.writerow(head + [''] * 7)
+            for line in lines:
+                writer.writerow(head + [
+                    line['id'], line['menu_item_id'], line['menu_item__name'], line['menu_item__category'],
+                    line['quantity'], line['price'], line['quantity'] * line['price'],
+                ])
+        yield buffer.drain()
+
+
+def _order_json(order, lines):
+    return {
+        'id': order['id'],
+        'created_at': order['created_at'].isoformat(),
+        'status': order['status'],
+        'table': order['table__number'],
+        'customer': order['customer__name'],
+        'total_amount': str(order['total_amount']),
+        'lines': [
+            {
+                'id': line['id'],
+                'menu_item_id': line['menu_item_id'],
+                'name': line['menu_item__name'],
+                'category': line['menu_item__category'],
+                'quantity': line['quantity'],
+                'unit_price': str(line['price']),
+                'line_total': str(line['quantity'] * line['price']),
+            }
+            for line in lines
+        ],
+    }
+
+
+def json_chunks(batches):
+    """A JSON array with one object per order, its lines nested inside."""
+    yield '['
+    separator = ''
+    for batch in batches:
+        parts = []
+        for order, lines in batch:
+            parts.append(separator + json.dumps(_order_json(order, lines)))
+            separator = ','
+        yield ''.join(parts)
+    yield ']'
+
+
+def encoded(chunks):
+    """UTF-8 bytes, regrouped into pieces of about FLUSH_BYTES."""
+    pending = []
+    size = 0
+    for chunk in chunks:
+        data = chunk.encode()
+        pending.append(data)
+        size += len(data)
+        if size >= FLUSH_BYTES:
+            yield b''.join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b''.join(pending)
+
+
+def gzipped(chunks):
+    """Compress a stream of bytes into a gzip stream as it goes."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+FORMATS = {
+    'csv': (csv_chunks, 'text/csv'),
+    'json': (json_chunks, 'application/json'),
+}
+
+
+def export_stream(queryset, format='csv', gzip=False, batch_size=EXPORT_BATCH_SIZE):
+    """Return (byte chunks, content type, file extension) for an export."""
+    render, content_type = FORMATS[format]
+    chunks = encoded(render(order_batches(queryset, batch_size)))
+    if gzip:
+        return gzipped(chunks), 'application/gzip', f'{format}.gz'
+    return chunks, content_type, format
@@ -0,0 +1,89 @@
+from django.core.cache import cache
+
+from .models import Table
+from .queries import tables_for_list
+from .routers import primary_reads
+from .versions import aget_version, bump_version, get_version
+
+# Floor map
+# The current state of every table, read by the tables and seating pages and
+# the occupancy figures on the dashboards. It is cached the same way as the
+# menu catalog (see catalog.py): a snapshot in Django's cache under a version
+# number kept in the database, plus the last snapshot in process memory. Saving or deleting a
+# table or a customer bumps the version once the change commits (see
+# signals.py), which includes every seating transition in services.py.
+
+VERSION_KEY = 'floor_map'
+SNAPSHOT_KEY = 'floor_map:tables:{version}'
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+_snapshot = None
+
+
+class FloorMap:
+    def __init__(self, version, tables):
+        self.version = version
+        self.tables = tables
+        self.by_id = {table.pk: table for table in tables}
+        self.total = len(tables)
+        self.occupied = sum(1 for table in tables if table.state != Table.AVAILABLE)
+        self.by_state = {state: 0 for state, label in Table.STATE_CHOICES}
+        for table in tables:
+            self.by_state[table.state] += 1
+
+    def get(self, pk):
+        return self.by_id.get(pk)
+
+    @property
+    def occupancy_rate(self):
+        """Share of tables occupied right now, as a percentage."""
+        return self.occupied / self.total * 100 if self.total else 0
+
+
+def get_floor_version():
+    return get_version(VERSION_KEY)
+
+
+def bump_floor_version():
+    bump_version(VERSION_KEY)
+
+
+def get_floor_map():
+    global _snapshot
+    version = get_floor_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    key = SNAPSHOT_KEY.format(version=version)
+    tables = cache.get(key)
+    if tables is None:
+        with primary_reads():
+            tables = list(tables_for_list())
+        cache.set(key, tables, SNAPSHOT_TIMEOUT)
+
+    _snapshot = FloorMap(version, tables)
+    return _snapshot
+
+
+async def aget_floor_version():
+    return await aget_version(VERSION_KEY)
+
+
+async def aget_floor_map():
+    """Async version of get_floor_map(), sharing the same snapshots."""
+    global _snapshot
+    version = await aget_floor_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    key = SNAPSHOT_KEY.format(version=version)
+    tables = await cache.aget(key)
+    if tables is None:
+        with primary_reads():
+            tables = [table async for table in tables_for_list()]
+        await cache.aset(key, tables, SNAPSHOT_TIMEOUT)
+
+    _snapshot = FloorMap(version, tables)
+    return _snapshot
@@ -1,7 +1,49 @@
 from django import forms
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse
+from .catalog import get_menu_catalog
 from .models import MenuItem, Customer, Table, Order, OrderItem, Employee
 
 
+class MenuItemChoiceIterator(ModelChoiceIterator):
+    # Options come from the cached menu catalog, grouped by category, instead
+    # of a query against MenuItem on every render.
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for category, items in get_menu_catalog().available_by_category():
+            yield (category, [self.choice(item) for item in items])
+
+    def __len__(self):
+        return len(get_menu_catalog().available) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(get_menu_catalog().available)
+
+
+class MenuItemChoiceField(forms.ModelChoiceField):
+    """Select an available menu item, validated against the menu catalog."""
+    iterator = MenuItemChoiceIterator
+
+    def __init__(self, **kwargs):
+        super().__init__(queryset=MenuItem.objects.filter(available=True), **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, MenuItem):
+            value = value.pk
+        try:
+            item = get_menu_catalog().get(int(value))
+        except (TypeError, ValueError):
+            item = None
+        if item is None or not item.available:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+            )
+        return item
+
+
 class MenuItemForm(forms.ModelForm):
     class Meta:
         model = MenuItem
@@ -43,10 +85,31 @@ class CustomerForm(forms.ModelForm):
         }
 
 
+class CustomerAutocomplete(forms.Widget):
+    # A text box that looks customers up through the search API as the user
+    # types, with the chosen id in a hidden input. Unlike a Select it never
+    # lists the customers, so the page stays small however many there are.
+    template_name = 'restaurant/widgets/customer_autocomplete.html'
+
+    class Media:
+        js = ['restaurant/js/customer_autocomplete.js']
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        customer = None
+        if value and str(value).isdigit():
+            customer = Customer.objects.filter(pk=value).values('name', 'phone').first()
+        context['widget']['label'] = f"{customer['name']} ({customer['phone']})" if customer else ''
+        context['widget']['search_url'] = reverse('api_customer_search')
+        return context
+
+
 class TableForm(forms.ModelForm):
+    # Choosing a customer seats them and clearing it frees the table; the
+    # views apply that through services.assign_customer.
     class Meta:
         model = Table
-        fields = ['number', 'capacity', 'customer', 'occupied']
+        fields = ['number', 'capacity', 'customer']
         widgets = {
             'number': forms.NumberInput(attrs={
                 'class': 'mt-1 block w-full px-3 py-2 text-sm rounded-md border border-gray-300 shadow-sm focus:border-blue-500 focus:ring-blue-500'
@@ -54,27 +117,15 @@ class TableForm(forms.ModelForm):
             'capacity': forms.NumberInput(attrs={
                 'class': 'mt-1 block w-full px-3 py-2 text-sm rounded-md border border-gray-300 shadow-sm focus:border-blue-500 focus:ring-blue-500'
             }),
-            'customer': forms.Select(attrs={
+            'customer': CustomerAutocomplete(attrs={
                 'class': 'mt-1 block w-full px-3 py-2 text-sm rounded-md border border-gray-300 shadow-sm focus:border-blue-500 focus:ring-blue-500'
             }),
-            'occupied': forms.CheckboxInput(attrs={
-                'class': 'h-4 w-4 text-blue-600 focus:ring-blue-500 border-gray-300 rounded'
-            }),
         }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        if self.instance and self.instance.customer:
-            self.fields['occupied'].initial = True
-        else:
-            self.fields['occupied'].initial = False
         self.fields['customer'].required = False
 
-    def clean_customer(self):
-        customer = self.cleaned_data.get('customer')
-        self.cleaned_data['occupied'] = bool(customer)
-        return customer
-
 
 class OrderForm(forms.ModelForm):
     class Meta:
@@ -88,13 +139,14 @@ class OrderForm(forms.ModelForm):
 
 
 class OrderItemForm(forms.ModelForm):
+    menu_item = MenuItemChoiceField(widget=forms.Select(attrs={
+        'class': 'mt-1 block w-full px-3 py-2 text-sm rounded-md border border-gray-300 shadow-sm focus:border-blue-500 focus:ring-blue-500'
+    }))
+
     class Meta:
         model = OrderItem
         fields = ['menu_item', 'quantity']
         widgets = {
-            'menu_item': forms.Select(attrs={
-                'class': 'mt-1 block w-full px-3 py-2 text-sm rounded-md border border-gray-300 shadow-sm focus:border-blue-500 focus:ring-blue-500'
-            }),
             'quantity': forms.NumberInput(attrs={
                 'class': 'mt-1 block w-full px-3 py-2 text-sm rounded-md border border-gray-300 shadow-sm focus:border-blue-500 focus:ring-blue-500'
             }),
@@ -120,13 +172,14 @@ class UpdateOrderForm(forms.ModelForm):
 
 
 class UpdateOrderItemForm(forms.ModelForm):
+    menu_item = MenuItemChoiceField(widget=forms.Select(attrs={
+        'class': 'mt-1 block w-full px-3 py-2 text-sm rounded-md border border-gray-300 shadow-sm focus:border-blue-500 focus:ring-blue-500'
+    }))
+
     class Meta:
         model = OrderItem
         fields = ['menu_item', 'quantity']
         widgets = {
-            'menu_item': forms.Select(attrs={
-                'class': 'mt-1 block w-full px-3 py-2 text-sm rounded-md border border-gray-300 shadow-sm focus:border-blue-500 focus:ring-blue-500'
-            }),
             'quantity': forms.NumberInput(attrs={
                 'class': 'mt-1 block w-full px-3 py-2 text-sm rounded-md border border-gray-300 shadow-sm focus:border-blue-500 focus:ring-blue-500'
             }),
@@ -161,3 +214,19 @@ class EmployeeForm(forms.ModelForm):
                 'class': 'mt-1 block w-full px-3 py-2 text-sm rounded-md border border-gray-300 shadow-sm focus:border-blue-500 focus:ring-blue-500'
             }),
         }
+
+
+class ImportForm(forms.Form):
+    kind = forms.ChoiceField(choices=[
+        ('menu', 'Menu items'),
+        ('customers', 'Customers'),
+        ('tables', 'Tables'),
+    ], widget=forms.Select(attrs={
+        'class': 'mt-1 block w-full px-3 py-2 text-sm rounded-md border border-gray-300 shadow-sm focus:border-blue-500 focus:ring-blue-500'
+    }))
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={
+        'class': 'mt-1 block w-full text-sm', 'accept': '.csv,text/csv'
+    }))
+    dry_run = forms.BooleanField(required=False, label="Check only, don't save", widget=forms.CheckboxInput(attrs={
+        'class': 'h-4 w-4 text-blue-600 focus:ring-blue-500 border-gray-300 rounded'
+    }))
@@ -0,0 +1,253 @@
+import csv
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .catalog import bump_menu_version
+from .floor import bump_floor_version
+from .forms import CustomerForm, MenuItemForm, TableForm
+from .models import Customer, MenuItem, Table
+
+# Bulk CSV import
+# Rows are read lazily from the file and handled in batches. Each row is
+# checked with the same form the UI uses; uniqueness is then checked for the
+# whole batch with one query, against both the database and the rows seen
+# earlier in the file. Valid rows are written with one bulk_create and one
+# bulk_update per batch: a row whose key matches an existing record updates
+# it, anything else is inserted. Invalid rows are skipped and reported.
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+FALSE_VALUES = {'', '0', 'false', 'no', 'n', 'off'}
+# Stands in for the pk when a non-unique key matches several records
+_AMBIGUOUS = object()
+
+
+class ImportKind:
+    def __init__(self, model, form_class, columns, key, unique=(), booleans=(), after_commit=None,
+                 prepare=None, derived=()):
+        self.model = model
+        self.form_class = form_class
+        self.columns = columns
+        # Rows whose key matches an existing record update it
+        self.key = key
+        self.unique = unique
+        self.booleans = booleans
+        self.after_commit = after_commit
+        # Called on each instance before it is written (bulk writes skip
+        # save()), filling in the `derived` columns
+        self.prepare = prepare
+        self.derived = derived
+
+
+KINDS = {
+    'menu': ImportKind(
+        MenuItem, MenuItemForm, ['name', 'description', 'price', 'category', 'available'],
+        key='name', booleans=['available'],
+        # Bulk writes skip the signals that refresh the cached menu and floor map
+        after_commit=bump_menu_version,
+    ),
+    'customers': ImportKind(
+        Customer, CustomerForm, ['name', 'email', 'phone'], key='email', unique=['email', 'phone'],
+        after_commit=bump_floor_version,
+        prepare=Customer.set_search_keys, derived=['name_key', 'surname_key', 'email_key', 'phone_key'],
+    ),
+    'tables': ImportKind(
+        Table, TableForm, ['number', 'capacity'], key='number', unique=['number'],
+        after_commit=bump_floor_version,
+    ),
+}
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row, message))
+
+    @property
+    def rows(self):
+        return self.created + self.updated + self.error_count
+
+
+class _RowValidator:
+    """
+    Run a row through the import form.
+
+    Building a form deep-copies all of its fields, which costs more than
+    validating a row, so one form is bound to each row in turn.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.form = kind.form_class(data={})
+        # Uniqueness is checked per batch in one query instead of per row
+        self.form.validate_unique = lambda: None
+
+    def validate(self, row):
+        data = dict(row)
+        for name in self.kind.booleans:
+            data[name] = (data.get(name) or '').strip().lower() not in FALSE_VALUES
+        form = self.form
+        form.data = data
+        form.instance = self.kind.model()
+        form._errors = None
+        if form.is_valid():
+            return form.instance, None
+        return None, '; '.join(
+            f"{field}: {' '.join(messages)}" if field != '__all__' else ' '.join(messages)
+            for field, messages in form.errors.items()
+        )
+
+
+def read_rows(file, kind):
+    """csv.DictReader over `file`, after checking the header has every column."""
+    reader = csv.DictReader(file)
+    try:
+        fieldnames = reader.fieldnames or []
+    except csv.Error as e:
+        raise ValueError(f"The header row cannot be read: {e}.")
+    missing = [column for column in kind.columns if column not in fieldnames]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}.")
+    return reader
+
+
+def import_records(kind_name, file, batch_size=IMPORT_BATCH_SIZE, dry_run=False):
+    kind = KINDS[kind_name]
+    rows = read_rows(file, kind)
+    validator = _RowValidator(kind)
+    result = ImportResult()
+    # Unique values already used by earlier rows of this file: {field: {value: row}}
+    seen = {field: {} for field in {kind.key, *kind.unique}}
+
+    numbered = _numbered(rows, result)
+    while True:
+        batch = list(islice(numbered, batch_size))
+        if not batch:
+            break
+        _import_batch(kind, batch, validator, seen, result, dry_run)
+    return result
+
+
+def _numbered(rows, result):
+    """(row number, row) for each row, stopping at the first one csv cannot parse."""
+    # Row 1 is the header
+    number = 1
+    try:
+        for number, row in enumerate(rows, start=2):
+            yield number, row
+    except csv.Error as e:
+        # e.g. a field over csv.field_size_limit(). Earlier batches are saved.
+        result.error(number + 1, f"{e}; this row and the rest of the file were not imported.")
+
+
+def _import_batch(kind, batch, validator, seen, result, dry_run):
+    valid = []
+    for number, row in batch:
+        instance, error = validator.validate(row)
+        if error:
+            result.error(number, error)
+        else:
+            valid.append((number, instance))
+
+    existing = _existing(kind, valid)
+    fields = [kind.key, *[field for field in kind.unique if field != kind.key]]
+    to_create, to_update = [], []
+    for number, instance in valid:
+        key_value = getattr(instance, kind.key)
+        target = existing[kind.key].get(key_value)
+        if target is _AMBIGUOUS:
+            result.error(number, f"{kind.key}: more than one existing record is named {key_value!r}.")
+            continue
+
+        problems = []
+        for field in fields:
+            value = getattr(instance, field)
+            if value in seen[field]:
+                problems.append(f"{field}: {value!r} is already used on row {seen[field][value]}.")
+            elif field in kind.unique and existing[field].get(value, target) != target:
+                problems.append(f"{field}: {value!r} belongs to another record.")
+        if problems:
+            result.error(number, ' '.join(problems))
+            continue
+
+        for field in fields:
+            seen[field][getattr(instance, field)] = number
+        if target is None:
+            to_create.append(instance)
+        else:
+            to_update.append((target, instance))
+
+    if dry_run:
+        result.created += len(to_create)
+        result.updated += len(to_update)
+        return
+    try:
+        with transaction.atomic():
+            _write(kind, to_create, to_update)
+            if kind.after_commit and (to_create or to_update):
+                transaction.on_commit(kind.after_commit)
+    except IntegrityError as exc:
+        # Someone else wrote a clashing record since the batch was checked
+        first, last = batch[0][0], batch[-1][0]
+        for number, instance in valid:
+            result.error(number, f"Rows {first}-{last} were not imported: {exc}")
+        return
+    result.created += len(to_create)
+    result.updated += len(to_update)
+
+
+def _write(kind, to_create, to_update):
+    manager = kind.model.objects
+    if kind.prepare:
+        for instance in [*to_create, *(instance for target, instance in to_update)]:
+            kind.prepare(instance)
+    columns = [*kind.columns, *kind.derived]
+    if kind.key in kind.unique:
+        # One INSERT ... ON CONFLICT (ON DUPLICATE KEY on MySQL) for the lot.
+        # bulk_update would send a CASE WHEN per column, which the database
+        # evaluates row by row and is several times slower.
+        manager.bulk_create(
+            to_create + [instance for target, instance in to_update],
+            update_conflicts=True, unique_fields=[kind.key],
+            update_fields=[column for column in columns if column != kind.key] + ['updated_at'],
+        )
+        return
+    manager.bulk_create(to_create)
+    # bulk_update leaves auto_now fields alone
+    now = timezone.now()
+    for target, instance in to_update:
+        instance.pk = target
+        instance.updated_at = now
+    manager.bulk_update([instance for target, instance in to_update], [*columns, 'updated_at'])
+
+
+def _existing(kind, valid):
+    """{field: {value: pk}} for the records matching this batch, in one query."""
+    fields = [kind.key, *[field for field in kind.unique if field != kind.key]]
+    lookup = Q()
+    for field in fields:
+        values = {getattr(instance, field) for number, instance in valid}
+        if values:
+            lookup |= Q(**{f'{field}__in': values})
+    found = {field: {} for field in fields}
+    if not valid:
+        return found
+    for record in kind.model.objects.filter(lookup).values('pk', *fields):
+        for field in fields:
+            value = record[field]
+            # A non-unique key (menu item names) can match several records
+            if value in found[field] and found[field][value] != record['pk']:
+                found[field][value] = _AMBIGUOUS
+            else:
+                found[field][value] = record['pk']
+    return found
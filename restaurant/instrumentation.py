@@ -0,0 +1,323 @@
+import contextvars
+import heapq
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+# Request instrumentation
+# PerformanceMiddleware times every request and, through a database execute
+# wrapper on every connection and the template backend below, how much of that went to SQL and
+# to rendering. Figures are aggregated per route in this process and served
+# in Prometheus text format by the metrics view. Requests over their budget
+# are logged to `restaurant.perf` with their slowest queries and the line of
+# our code that ran each one. Finding that line means walking the stack, so
+# it is only done for a query that is among the slowest of its request so
+# far.
+#
+# A streaming response (the order export, the kitchen feed) is counted when
+# its stream closes, with the bytes sent and the queries run while streaming;
+# its duration is still the time the view took to return.
+#
+# Settings:
+#   PERF_INSTRUMENTATION    turn the middleware on (default False)
+#   PERF_REQUEST_BUDGET_MS  wall time above which a request is slow (500)
+#   PERF_ROUTE_BUDGETS_MS   {url name: budget} overrides
+#   PERF_SLOW_QUERIES       how many queries to log for a slow request (5)
+
+logger = logging.getLogger('restaurant.perf')
+
+PROJECT_DIR = str(Path(__file__).resolve().parent.parent)
+THIS_FILE = __file__
+
+# Upper bounds in seconds of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = contextvars.ContextVar('restaurant_request_stats', default=None)
+
+
+def _origin():
+    """`file:line in function` of the innermost project frame running a query."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(PROJECT_DIR) and filename != THIS_FILE and 'site-packages' not in filename:
+            return f"{filename[len(PROJECT_DIR) + 1:]}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+class RequestStats:
+    def __init__(self):
+        self.query_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        # Min-heap of (seconds, number, sql, origin): the slowest queries so far
+        self.slowest = []
+        self.keep = getattr(settings, 'PERF_SLOW_QUERIES', 5)
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sql_seconds += elapsed
+            self.query_count += 1
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, (elapsed, self.query_count, sql, _origin()))
+            elif self.keep and elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, self.query_count, sql, _origin()))
+
+    def slowest_queries(self):
+        """(seconds, sql, origin) of the slowest queries, slowest first."""
+        return [(seconds, sql, origin) for seconds, _, sql, origin in sorted(self.slowest, reverse=True)]
+
+
+class RouteMetrics:
+    """Per-process counters, keyed by (route, method)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.routes = {}
+
+    def reset(self):
+        with self.lock:
+            self.requests = {}
+            self.routes = {}
+
+    def observe(self, route, method, status, seconds, stats, size, slow):
+        with self.lock:
+            key = (route, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            totals = self.routes.get((route, method))
+            if totals is None:
+                totals = self.routes[(route, method)] = {
+                    'count': 0, 'seconds': 0.0, 'queries': 0, 'sql_seconds': 0.0,
+                    'template_seconds': 0.0, 'bytes': 0, 'slow': 0,
+                    'buckets': [0] * len(DURATION_BUCKETS),
+                }
+            totals['count'] += 1
+            totals['seconds'] += seconds
+            totals['queries'] += stats.query_count
+            totals['sql_seconds'] += stats.sql_seconds
+            totals['template_seconds'] += stats.template_seconds
+            totals['bytes'] += size
+            totals['slow'] += slow
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    totals['buckets'][i] += 1
+
+    def render(self):
+        """The counters in Prometheus text exposition format."""
+        with self.lock:
+            requests = dict(self.requests)
+            routes = {key: dict(value, buckets=list(value['buckets'])) for key, value in self.routes.items()}
+
+        lines = [
+            '# HELP restaurant_requests_total Requests handled, by route, method and status.',
+            '# TYPE restaurant_requests_total counter',
+        ]
+        for (route, method, status), count in sorted(requests.items()):
+            lines.append(f'restaurant_requests_total{{route="{route}",method="{method}",status="{status}"}} {count}')
+
+        lines += [
+            '# HELP restaurant_request_duration_seconds Wall time spent handling requests.',
+            '# TYPE restaurant_request_duration_seconds histogram',
+        ]
+        for (route, method), totals in sorted(routes.items()):
+            labels = f'route="{route}",method="{method}"'
+            for bound, count in zip(DURATION_BUCKETS, totals['buckets']):
+                lines.append(f'restaurant_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'restaurant_request_duration_seconds_bucket{{{labels},le="+Inf"}} {totals["count"]}')
+            lines.append(f'restaurant_request_duration_seconds_sum{{{labels}}} {totals["seconds"]:.6f}')
+            lines.append(f'restaurant_request_duration_seconds_count{{{labels}}} {totals["count"]}')
+
+        counters = [
+            ('db_queries_total', 'queries', 'Database queries run.', '{}'),
+            ('db_query_seconds_total', 'sql_seconds', 'Time spent waiting on the database.', '{:.6f}'),
+            ('template_render_seconds_total', 'template_seconds', 'Time spent rendering templates.', '{:.6f}'),
+            ('response_bytes_total', 'bytes', 'Response body bytes sent; streamed bodies once their stream closes.', '{}'),
+            ('slow_requests_total', 'slow', 'Requests over their time budget.', '{}'),
+        ]
+        for name, field, help_text, fmt in counters:
+            lines += [f'# HELP restaurant_{name} {help_text}', f'# TYPE restaurant_{name} counter']
+            for (route, method), totals in sorted(routes.items()):
+                value = fmt.format(totals[field])
+                lines.append(f'restaurant_{name}{{route="{route}",method="{method}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = RouteMetrics()
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.record_query(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        # First in the list, so a temporary execute_wrapper() block popping
+        # its own wrapper leaves this one alone.
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+def install_query_recorders(**kwargs):
+    """
+    Put the query recorder on every connection of the current thread.
+
+    Connections belong to threads, and under ASGI a request's queries run in
+    a worker thread rather than the one running the middleware. Connections
+    therefore carry the recorder permanently and report to whichever request
+    is current in their context. Receivers of request_started run in the
+    thread that will run the request's queries; connection_created covers
+    connections opened elsewhere.
+    """
+    for connection in connections.all():
+        install_query_recorder(connection)
+
+
+def instrumentation_enabled():
+    return getattr(settings, 'PERF_INSTRUMENTATION', False)
+
+
+def request_budget(route):
+    budgets = getattr(settings, 'PERF_ROUTE_BUDGETS_MS', {})
+    return budgets.get(route, getattr(settings, 'PERF_REQUEST_BUDGET_MS', 500)) / 1000
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not instrumentation_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        request_started.connect(install_query_recorders, dispatch_uid='restaurant.perf')
+        connection_created.connect(install_query_recorder, dispatch_uid='restaurant.perf')
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def finish(self, request, response, elapsed, stats):
+        if response.streaming:
+            # Counted once the stream has been read or closed
+            if response.is_async:
+                chunks = self.astream(aiter(response.streaming_content), request, response, elapsed, stats)
+            else:
+                chunks = self.stream(iter(response.streaming_content), request, response, elapsed, stats)
+            response.streaming_content = chunks
+            return
+        self.observe(request, response, elapsed, stats, len(response.content))
+
+    def stream(self, chunks, request, response, elapsed, stats):
+        size = 0
+        try:
+            while True:
+                # Queries the stream runs belong to this request
+                token = _current.set(stats)
+                try:
+                    chunk = next(chunks, None)
+                finally:
+                    _current.reset(token)
+                if chunk is None:
+                    break
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.observe(request, response, elapsed, stats, size)
+
+    async def astream(self, chunks, request, response, elapsed, stats):
+        size = 0
+        try:
+            while True:
+                token = _current.set(stats)
+                try:
+                    chunk = await anext(chunks, None)
+                finally:
+                    _current.reset(token)
+                if chunk is None:
+                    break
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.observe(request, response, elapsed, stats, size)
+
+    def observe(self, request, response, elapsed, stats, size):
+        match = request.resolver_match
+        route = (match.view_name if match else None) or 'unresolved'
+        slow = elapsed > request_budget(route)
+        metrics.observe(route, request.method, response.status_code, elapsed, stats, size, slow)
+        if slow:
+            self.log_slow(request, route, elapsed, stats)
+
+    def log_slow(self, request, route, elapsed, stats):
+        lines = [
+            f"Slow request {request.method} {request.path} ({route}): {elapsed * 1000:.1f}ms, "
+            f"{stats.query_count} queries in {stats.sql_seconds * 1000:.1f}ms, "
+            f"templates {stats.template_seconds * 1000:.1f}ms"
+        ]
+        for seconds, sql, origin in stats.slowest_queries():
+            lines.append(f"  {seconds * 1000:.1f}ms at {origin}: {sql}")
+        logger.warning('\n'.join(lines))
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render time counted per request."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
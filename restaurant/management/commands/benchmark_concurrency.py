@@ -0,0 +1,184 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+from restaurant.profiling import page_host, page_urls, percentile
+
+# The pages that have async versions in restaurant/async_views.py
+READ_PAGES = ['dashboard', 'orders', 'menu', 'tables', 'customers', 'order_detail']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare WSGI and ASGI throughput on the read-heavy pages with many "
+        "concurrent clients. Each interface runs in its own process, calling "
+        "Django's handler directly, so the figures leave out the web server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interface', choices=['wsgi', 'asgi', 'both'], default='both')
+        parser.add_argument('--concurrency', type=int, default=200, help="Clients sending requests at once.")
+        parser.add_argument('--requests', type=int, default=2000, help="Total requests per interface.")
+        parser.add_argument('--wsgi-threads', type=int,
+                            help="Threads serving WSGI requests (default: one per client).")
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError("--concurrency and --requests must be at least 1.")
+
+        if options['interface'] == 'both':
+            results = {name: self.run_in_subprocess(name, options) for name in ('wsgi', 'asgi')}
+        else:
+            results = {options['interface']: self.run(options['interface'], options)}
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+            return
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name.upper():<5} {result['requests_per_second']:8.1f} req/s  "
+                f"p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  p99 {result['p99_ms']:8.2f}ms  "
+                f"errors {result['errors']}  (async views: {result['async_views']})"
+            )
+
+    def run_in_subprocess(self, interface, options):
+        """Run one interface in a fresh process, with the matching url set."""
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE,
+            PYTHONPATH=os.pathsep.join(path for path in sys.path if path),
+            RESTAURANT_ASYNC_VIEWS='1' if interface == 'asgi' else '0',
+        )
+        command = [
+            sys.executable, '-m', 'django', 'benchmark_concurrency', '--json', f'--interface={interface}',
+            f"--concurrency={options['concurrency']}", f"--requests={options['requests']}",
+        ]
+        if options['wsgi_threads']:
+            command.append(f"--wsgi-threads={options['wsgi_threads']}")
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode:
+            raise CommandError(f"{interface} run failed:\n{completed.stderr}")
+        return json.loads(completed.stdout)[interface]
+
+    def run(self, interface, options):
+        urls = [url for name, url in page_urls() if name in READ_PAGES]
+        requests = [urls[i % len(urls)] for i in range(options['requests'])]
+        host = page_host()
+
+        if interface == 'wsgi':
+            driver = WSGIDriver(host, options['wsgi_threads'] or options['concurrency'])
+        else:
+            driver = ASGIDriver(host, options['concurrency'])
+        # One untimed pass so caches and imports are warm
+        driver.run(urls)
+        started = time.perf_counter()
+        samples = driver.run(requests)
+        elapsed = time.perf_counter() - started
+
+        latencies = [seconds * 1000 for seconds, status in samples]
+        return {
+            'requests': len(samples),
+            'concurrency': options['concurrency'],
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(len(samples) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'errors': sum(1 for seconds, status in samples if status >= 400),
+            'async_views': settings.ASYNC_READ_VIEWS,
+        }
+
+
+def _split(url):
+    path, _, query = url.partition('?')
+    return path, query
+
+
+class WSGIDriver:
+    """Serve requests from a pool of threads, like a threaded WSGI server."""
+
+    def __init__(self, host, threads):
+        self.handler = WSGIHandler()
+        self.host = host
+        self.threads = threads
+
+    def request(self, url):
+        path, query = _split(url)
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+            'SERVER_NAME': self.host, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.host, 'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': BytesIO(),
+            'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        statuses = []
+        started = time.perf_counter()
+        body = self.handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            for _ in body:
+                pass
+        finally:
+            body.close()
+        return time.perf_counter() - started, int(statuses[0].split()[0])
+
+    def run(self, urls):
+        with ThreadPoolExecutor(self.threads) as pool:
+            return list(pool.map(self.request, urls))
+
+
+class ASGIDriver:
+    """Serve requests as coroutines on one event loop, like an ASGI server."""
+
+    def __init__(self, host, concurrency):
+        self.handler = ASGIHandler()
+        self.host = host
+        self.concurrency = concurrency
+
+    async def request(self, url, slots):
+        path, query = _split(url)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+            'root_path': '', 'headers': [(b'host', self.host.encode())],
+            'client': ('127.0.0.1', 0), 'server': (self.host, 80),
+        }
+        finished = asyncio.Event()
+        received = []
+        status = []
+
+        async def receive():
+            if not received:
+                received.append(True)
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                finished.set()
+
+        async with slots:
+            started = time.perf_counter()
+            await self.handler(scope, receive, send)
+            return time.perf_counter() - started, status[0]
+
+    async def _run(self, urls):
+        slots = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self.request(url, slots) for url in urls))
+
+    def run(self, urls):
+        return asyncio.run(self._run(urls))
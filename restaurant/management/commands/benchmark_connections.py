@@ -0,0 +1,115 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from restaurant.db.pool import close_pools
+from restaurant.profiling import page_host, page_urls, percentile
+
+from .benchmark_concurrency import WSGIDriver
+
+# Cheap pages that still query the database, so opening a connection is a
+# large share of each request. The menu and tables pages are served from
+# cached snapshots and usually make no queries at all.
+CHEAP_PAGES = ['dashboard', 'order_detail']
+
+# CONN_MAX_AGE and OPTIONS['pool'] for each way of handling connections
+MODES = {
+    'per-request': (0, None),
+    'persistent': (None, None),
+    'pooled': (0, True),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare opening a database connection per request with persistent "
+        "and pooled connections, serving cheap pages through Django's WSGI "
+        "handler from a pool of threads. Works against MySQL or SQLite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', choices=list(MODES), help="Modes to run (default: all).")
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per mode.")
+        parser.add_argument('--threads', type=int, default=4, help="Threads serving requests.")
+        parser.add_argument('--page', action='append', help=f"Pages to request (default: {', '.join(CHEAP_PAGES)}).")
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON.")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['threads'] < 1:
+            raise CommandError("--requests and --threads must be at least 1.")
+        pages = options['page'] or CHEAP_PAGES
+        urls = [url for name, url in page_urls() if name in pages]
+        if not urls:
+            raise CommandError(f"No such page: {', '.join(pages)}.")
+
+        settings_dict = connections[options['database']].settings_dict
+        saved = settings_dict['CONN_MAX_AGE'], dict(settings_dict['OPTIONS'])
+        results = {}
+        try:
+            for mode in options['mode'] or list(MODES):
+                if mode == 'pooled' and not hasattr(connections[options['database']], 'pool'):
+                    self.stderr.write(f"Skipping pooled: {settings_dict['ENGINE']} has no pool, use a restaurant.db backend.")
+                    continue
+                results[mode] = self.run(mode, urls, options)
+        finally:
+            settings_dict['CONN_MAX_AGE'], settings_dict['OPTIONS'] = saved
+            close_pools()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+            return
+        for mode, result in results.items():
+            self.stdout.write(
+                f"{mode:<12} {result['requests_per_second']:8.1f} req/s  "
+                f"p50 {result['p50_ms']:7.2f}ms  p95 {result['p95_ms']:7.2f}ms  p99 {result['p99_ms']:7.2f}ms  "
+                f"{result['connections']:>5} connections opened  errors {result['errors']}"
+            )
+
+    def run(self, mode, urls, options):
+        database = options['database']
+        max_age, pool = MODES[mode]
+        settings_dict = connections[database].settings_dict
+        settings_dict['CONN_MAX_AGE'] = max_age
+        # Backends without a pool pass every option on to the driver
+        settings_dict['OPTIONS'] = {name: value for name, value in settings_dict['OPTIONS'].items() if name != 'pool'}
+        if pool:
+            settings_dict['OPTIONS']['pool'] = pool
+        close_pools()
+        connections[database].close()
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            if connection.alias == database:
+                opened.append(connection)
+
+        requests = [urls[i % len(urls)] for i in range(options['requests'])]
+        # New threads each run, so no connection is carried over from the last mode
+        driver = WSGIDriver(page_host(), options['threads'])
+        # One untimed pass so caches and imports are warm
+        driver.run(urls)
+        connection_created.connect(count)
+        try:
+            started = time.perf_counter()
+            samples = driver.run(requests)
+            elapsed = time.perf_counter() - started
+        finally:
+            connection_created.disconnect(count)
+
+        # A checkout from the pool counts as connection_created too, so the
+        # pool's own count is used
+        pool = connections[database].pool if pool else None
+        latencies = [seconds * 1000 for seconds, status in samples]
+        return {
+            'requests': len(samples),
+            'threads': options['threads'],
+            'requests_per_second': round(len(samples) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'connections': pool.connects if pool is not None else len(opened),
+            'errors': sum(1 for seconds, status in samples if status >= 400),
+        }
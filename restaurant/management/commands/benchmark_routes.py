@@ -0,0 +1,143 @@
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from restaurant.profiling import page_client, percentile, response_size, route_names, route_requests
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every route in restaurant/urls.py with the test client and write "
+        "latency, query and response size figures as JSON. Requests that change "
+        "data are rolled back. Run it against a seeded database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help="Timed requests per route.")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed requests per route before timing.")
+        parser.add_argument('--only', action='append', default=[], help="Only routes whose name contains this text.")
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--compare', help="Baseline JSON from an earlier run to check for regressions.")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Allowed relative p95 slowdown before it counts as a regression (0.2 = 20%%).")
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help="Ignore p95 slowdowns smaller than this many milliseconds.")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Could not read baseline {options['compare']}: {exc}")
+
+        client = page_client()
+        requests = route_requests()
+        if options['only']:
+            requests = [r for r in requests if any(text in r['name'] for text in options['only'])]
+
+        routes = {}
+        for spec in requests:
+            for _ in range(options['warmup']):
+                self.send(client, spec)
+            samples = [self.send(client, spec) for _ in range(options['iterations'])]
+            routes[spec['name']] = result = self.summarise(spec, samples)
+            self.stdout.write(
+                f"{spec['name']:<36} {result['status']:>3}  p50 {result['p50_ms']:8.2f}ms  "
+                f"p95 {result['p95_ms']:8.2f}ms  p99 {result['p99_ms']:8.2f}ms  "
+                f"{result['queries']:>3} queries  {result['query_ms']:7.2f}ms in db  {result['bytes']:>8} bytes"
+            )
+
+        covered = {spec['name'].split(' ', 1)[1] for spec in route_requests()}
+        missing = sorted(route_names() - covered)
+        if missing:
+            self.stderr.write(f"Not benchmarked (no sample data?): {', '.join(missing)}")
+
+        report = {
+            'generated_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'iterations': options['iterations'],
+            'routes': routes,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+            self.stdout.write(f"Wrote {options['output']}")
+
+        if baseline is not None:
+            regressions = self.compare(baseline.get('routes', {}), routes, options['threshold'], options['min_delta_ms'])
+            if regressions:
+                for line in regressions:
+                    self.stderr.write(self.style.ERROR(line))
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}.")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}."))
+
+    def send(self, client, spec):
+        """Make one request and return (seconds, status, bytes, queries, query seconds)."""
+        kwargs = {}
+        if spec['data'] is not None:
+            kwargs['data'] = spec['data']
+        if spec['content_type']:
+            kwargs['content_type'] = spec['content_type']
+        request = getattr(client, spec['method'])
+        # The query log is a bounded deque; once full, CaptureQueriesContext
+        # can no longer tell which entries are new.
+        connection.queries_log.clear()
+
+        # Streaming responses run their queries while the body is read, so
+        # the body is read inside the timed and captured block.
+        with CaptureQueriesContext(connection) as queries:
+            if spec['mutates']:
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    response = request(spec['url'], **kwargs)
+                    size = response_size(response)
+                    elapsed = time.perf_counter() - started
+                    transaction.set_rollback(True)
+            else:
+                started = time.perf_counter()
+                response = request(spec['url'], **kwargs)
+                size = response_size(response)
+                elapsed = time.perf_counter() - started
+        # The savepoint and rollback around mutating requests are not the view's
+        captured = [q for q in queries.captured_queries if 'SAVEPOINT' not in q['sql'].upper()]
+        return elapsed, response.status_code, size, len(captured), sum(float(q['time']) for q in captured)
+
+    def summarise(self, spec, samples):
+        latencies = [s[0] * 1000 for s in samples]
+        return {
+            'method': spec['method'].upper(),
+            'url': spec['url'],
+            'status': samples[-1][1],
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'queries': int(statistics.median(s[3] for s in samples)),
+            'query_ms': round(statistics.median(s[4] for s in samples) * 1000, 3),
+            'bytes': int(statistics.median(s[2] for s in samples)),
+        }
+
+    def compare(self, baseline, routes, threshold, min_delta_ms):
+        regressions = []
+        for name, result in sorted(routes.items()):
+            before = baseline.get(name)
+            if before is None:
+                continue
+            slower = result['p95_ms'] - before['p95_ms']
+            if slower > min_delta_ms and result['p95_ms'] > before['p95_ms'] * (1 + threshold):
+                regressions.append(f"{name}: p95 {before['p95_ms']:.2f}ms -> {result['p95_ms']:.2f}ms")
+            if result['queries'] > before['queries']:
+                regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+        return regressions
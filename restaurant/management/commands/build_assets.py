@@ -0,0 +1,80 @@
+import shutil
+import subprocess
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+APP_DIR = Path(__file__).resolve().parents[2]
+STATIC_DIR = APP_DIR / 'static' / 'restaurant'
+TAILWIND_INPUT = APP_DIR / 'assets' / 'tailwind.css'
+TAILWIND_OUTPUT = STATIC_DIR / 'css' / 'app.css'
+LOCKFILE = Path(settings.BASE_DIR) / 'package-lock.json'
+
+# Files copied out of node_modules (versions are pinned in package.json):
+# (source, destination under restaurant/static/restaurant/vendor)
+VENDOR_FILES = [
+    ('alpinejs/dist/cdn.min.js', 'alpine.min.js'),
+    ('chart.js/dist/chart.umd.js', 'chart.umd.min.js'),
+    ('@fortawesome/fontawesome-free/css/all.min.css', 'fontawesome/css/all.min.css'),
+    ('@fortawesome/fontawesome-free/webfonts', 'fontawesome/webfonts'),
+]
+
+
+def npm_install():
+    # npm ci installs exactly what package-lock.json lists, and refuses to
+    # run without one
+    return 'npm ci' if LOCKFILE.exists() else 'npm install'
+
+
+class Command(BaseCommand):
+    help = (
+        "Build restaurant/static/restaurant: a minified Tailwind stylesheet holding "
+        "only the classes the templates use, and the vendored Alpine, Chart.js and "
+        "Font Awesome files. Run `npm ci` first (`npm install` until package-lock.json "
+        "is committed); collectstatic then fingerprints and compresses the result."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--node-modules', default=str(Path(settings.BASE_DIR) / 'node_modules'),
+            help="Where npm installed the packages.",
+        )
+        parser.add_argument('--skip-css', action='store_true', help="Only copy the vendored files.")
+
+    def handle(self, *args, **options):
+        node_modules = Path(options['node_modules'])
+        missing = [source for source, target in VENDOR_FILES if not (node_modules / source).exists()]
+        if missing:
+            raise CommandError(f"Missing from {node_modules}: {', '.join(missing)}. Run `{npm_install()}` first.")
+
+        vendor = STATIC_DIR / 'vendor'
+        for source, target in VENDOR_FILES:
+            source, target = node_modules / source, vendor / target
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if source.is_dir():
+                shutil.copytree(source, target, dirs_exist_ok=True)
+            else:
+                shutil.copyfile(source, target)
+            self.stdout.write(f"Vendored {target.relative_to(APP_DIR)}")
+
+        if not options['skip_css']:
+            self.build_css(node_modules)
+        if not LOCKFILE.exists():
+            self.stdout.write(f"Commit {LOCKFILE.name} as well, so the next build can use `npm ci`.")
+
+    def build_css(self, node_modules):
+        tailwind = node_modules / '.bin' / 'tailwindcss'
+        if not tailwind.exists():
+            raise CommandError(f"{tailwind} not found. Run `{npm_install()}` first.")
+        TAILWIND_OUTPUT.parent.mkdir(parents=True, exist_ok=True)
+        # tailwind.config.js lists the templates and Python files to scan for class names
+        result = subprocess.run(
+            [str(tailwind), '-c', str(Path(settings.BASE_DIR) / 'tailwind.config.js'),
+             '-i', str(TAILWIND_INPUT), '-o', str(TAILWIND_OUTPUT), '--minify'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"tailwindcss failed:\n{result.stderr}")
+        size = TAILWIND_OUTPUT.stat().st_size
+        self.stdout.write(f"Built {TAILWIND_OUTPUT.relative_to(APP_DIR)} ({size / 1024:.1f} KiB)")
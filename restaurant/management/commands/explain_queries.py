@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from restaurant.profiling import explain, full_scans, page_client, page_urls, response_size
+
+
+class Command(BaseCommand):
+    help = (
+        "Render every read-only page, EXPLAIN each SELECT it runs and report "
+        "queries that scan a whole table. Run it against a seeded database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print the plan of every query, not just scans.")
+        parser.add_argument('--fail-on-scan', action='store_true', help="Exit with an error if any full scan is found.")
+
+    def handle(self, *args, **options):
+        client = page_client()
+        scans_found = 0
+
+        for name, url in page_urls():
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+                response_size(response)
+            if response.status_code != 200:
+                self.stderr.write(f"{name}: {url} returned {response.status_code}, skipped")
+                continue
+
+            selects = [q['sql'] for q in queries.captured_queries if q['sql'].lstrip().upper().startswith('SELECT')]
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name} ({url}): {len(selects)} select(s)"))
+            for sql in selects:
+                plan = explain(sql)
+                scans = full_scans(plan)
+                scans_found += len(scans)
+                if scans:
+                    self.stdout.write(self.style.WARNING(f"  FULL SCAN: {sql}"))
+                    for line in scans:
+                        self.stdout.write(f"    {line}")
+                elif options['verbose_plans']:
+                    self.stdout.write(f"  {sql}")
+                if options['verbose_plans']:
+                    for line in plan:
+                        self.stdout.write(f"    | {line}")
+
+        if scans_found:
+            message = f"{scans_found} full table scan(s) found."
+            if options['fail_on_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS("No full table scans found."))
@@ -0,0 +1,48 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from restaurant.exports import EXPORT_BATCH_SIZE, FORMATS, export_stream
+from restaurant.models import Order
+from restaurant.queries import filter_orders, parse_order_filters
+
+
+class Command(BaseCommand):
+    help = "Stream the order history with its lines as CSV or JSON, optionally gzipped."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output', help="File to write (default: standard output).")
+        parser.add_argument('--status', choices=[status for status, label in Order.ORDER_STATUS_CHOICES])
+        parser.add_argument('--date-from', help="YYYY-MM-DD, inclusive.")
+        parser.add_argument('--date-to', help="YYYY-MM-DD, inclusive.")
+        parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        params = {key: options[key] for key in ('status', 'date_from', 'date_to') if options[key]}
+        filters = parse_order_filters(params)
+        for key in ('date_from', 'date_to'):
+            if key in params and filters[key] is None:
+                raise CommandError(f"--{key.replace('_', '-')} must be a date like 2024-01-31.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        queryset = filter_orders(Order.objects.all(), filters)
+        chunks, content_type, extension = export_stream(
+            queryset, options['format'], gzip=options['gzip'], batch_size=options['batch_size'],
+        )
+
+        if options['output']:
+            with open(options['output'], 'wb') as fh:
+                written = sum(fh.write(chunk) for chunk in chunks)
+            self.stdout.write(f"Wrote {written} bytes to {options['output']}")
+        elif options['gzip']:
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
+        else:
+            # Chunks always end on a character boundary
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
@@ -0,0 +1,48 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from restaurant.imports import IMPORT_BATCH_SIZE, KINDS, import_records
+
+
+class Command(BaseCommand):
+    help = (
+        "Import menu items, customers or tables from a CSV file whose first row "
+        "names the columns. Existing records are matched by name, email or number "
+        "and updated; other rows are added. Rows with errors are skipped and listed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(KINDS))
+        parser.add_argument('path', help="CSV file to read, or - for standard input.")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Check every row but save nothing.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        started = time.perf_counter()
+        try:
+            if options['path'] == '-':
+                result = self.run(sys.stdin, options)
+            else:
+                with open(options['path'], encoding='utf-8-sig', newline='') as fh:
+                    result = self.run(fh, options)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for row, message in result.errors:
+            self.stderr.write(f"row {row}: {message}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f"... and {result.error_count - len(result.errors)} more")
+        verb = "Checked" if options['dry_run'] else "Imported"
+        self.stdout.write(
+            f"{verb} {result.rows} rows in {elapsed:.2f}s: {result.created} new, "
+            f"{result.updated} updated, {result.error_count} with errors"
+        )
+
+    def run(self, file, options):
+        return import_records(options['kind'], file, batch_size=options['batch_size'], dry_run=options['dry_run'])
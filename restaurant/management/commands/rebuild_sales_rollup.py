@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from restaurant.rollups import rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailySalesRollup table from order history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Only rebuild days on or after this date (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid date: {options['since']}")
+        days = rebuild_sales_rollups(since=since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales rollup for {days} day(s)."))
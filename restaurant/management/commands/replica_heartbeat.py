@@ -0,0 +1,56 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from restaurant.models import ReplicaHeartbeat
+from restaurant.routers import replica_alias, replica_lag
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a heartbeat to the primary database every --interval seconds. "
+        "The read replica router measures replica lag by how old the heartbeat "
+        "it finds there is, so keep this running wherever a replica is used."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds between heartbeats.")
+        parser.add_argument('--count', type=int, help="Stop after this many heartbeats (default: run until stopped).")
+        parser.add_argument(
+            '--copy', action='store_true',
+            help="After each heartbeat, copy the primary over the replica. For two SQLite "
+                 "files standing in for a primary and a replica during development.",
+        )
+
+    def handle(self, *args, **options):
+        replica = replica_alias()
+        if options['copy']:
+            if replica is None:
+                raise CommandError(f"No {settings.REPLICA_DATABASE!r} database is configured.")
+            if {connections[alias].vendor for alias in (DEFAULT_DB_ALIAS, replica)} != {'sqlite'}:
+                raise CommandError("--copy only works between SQLite databases.")
+
+        beats = 0
+        while options['count'] is None or beats < options['count']:
+            if beats:
+                time.sleep(options['interval'])
+            ReplicaHeartbeat.objects.update_or_create(pk=1, defaults={'beat_at': timezone.now()})
+            if options['copy']:
+                self.copy(replica)
+            beats += 1
+            if replica is not None and options['verbosity'] > 1:
+                lag = replica_lag(replica)
+                self.stdout.write(f"Replica lag: {'unknown' if lag is None else f'{lag:.1f}s'}")
+
+    def copy(self, replica):
+        primary = connections[DEFAULT_DB_ALIAS]
+        primary.ensure_connection()
+        target = sqlite3.connect(connections[replica].settings_dict['NAME'])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
@@ -0,0 +1,258 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from restaurant.catalog import bump_menu_version
+from restaurant.conditional import bump_orders_version
+from restaurant.floor import bump_floor_version
+from restaurant.models import Customer, Employee, MenuItem, Order, OrderItem, Table, TableOccupancyEvent
+from restaurant.rollups import rebuild_sales_rollups
+
+FIRST_NAMES = ['Aarav', 'Priya', 'Rahul', 'Ananya', 'Vikram', 'Sneha', 'Arjun', 'Kavya', 'Rohan', 'Isha',
+               'John', 'Maria', 'Wei', 'Fatima', 'Carlos', 'Yuki', 'Omar', 'Elena', 'David', 'Amara']
+LAST_NAMES = ['Sharma', 'Patel', 'Iyer', 'Khan', 'Reddy', 'Nair', 'Gupta', 'Joshi', 'Das', 'Mehta',
+              'Smith', 'Garcia', 'Chen', 'Ali', 'Lopez', 'Tanaka', 'Hassan', 'Petrova', 'Brown', 'Okafor']
+MENU = {
+    'Starters': ['Paneer Tikka', 'Veg Spring Roll', 'Chicken 65', 'Hara Bhara Kebab', 'Tomato Soup', 'Masala Papad'],
+    'Mains': ['Butter Chicken', 'Dal Makhani', 'Paneer Butter Masala', 'Veg Biryani', 'Chicken Biryani',
+              'Palak Paneer', 'Mutton Rogan Josh', 'Chole Bhature', 'Fish Curry', 'Malai Kofta'],
+    'Breads': ['Butter Naan', 'Garlic Naan', 'Tandoori Roti', 'Laccha Paratha'],
+    'Desserts': ['Gulab Jamun', 'Rasmalai', 'Kulfi', 'Gajar Halwa'],
+    'Drinks': ['Masala Chai', 'Sweet Lassi', 'Fresh Lime Soda', 'Cold Coffee', 'Mango Shake'],
+}
+PRICE_RANGE = {'Starters': (120, 320), 'Mains': (220, 520), 'Breads': (30, 90), 'Desserts': (80, 200), 'Drinks': (40, 180)}
+
+# Share of a day's orders placed in each hour: a lunch peak around 13:00 and a
+# bigger dinner peak around 20:00.
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 3, 8, 10, 7, 3, 2, 2, 4, 8, 12, 11, 7, 3]
+# Monday .. Sunday
+WEEKDAY_WEIGHTS = [0.8, 0.8, 0.85, 0.9, 1.2, 1.5, 1.4]
+LINES_PER_ORDER = [1, 2, 3, 4, 5, 6, 8]
+LINES_WEIGHTS = [10, 25, 25, 18, 10, 8, 4]
+QUANTITY_WEIGHTS = [70, 20, 7, 3]
+
+
+@contextmanager
+def preserve_created_at(*models):
+    """Let bulk_create keep the created_at we generate instead of now()."""
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = "Generate a realistic, reproducible dataset for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=5000)
+        parser.add_argument('--tables', type=int, default=40)
+        parser.add_argument('--menu-items', type=int, default=60)
+        parser.add_argument('--employees', type=int, default=30)
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=730, help="Spread orders over this many days up to today.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['tables'] < 1 or options['customers'] < 1 or options['days'] < 1:
+            raise CommandError("--tables, --customers and --days must be at least 1.")
+        if options['orders'] and not (options['menu_items'] or MenuItem.objects.exists()):
+            raise CommandError("Orders need menu items; pass --menu-items.")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+
+        with preserve_created_at(Customer, Order):
+            customer_ids = self.seed_customers(options['customers'], options['days'])
+            table_ids = self.seed_tables(options['tables'], customer_ids)
+            menu = self.seed_menu(options['menu_items'])
+            self.seed_employees(options['employees'])
+            self.seed_orders(options['orders'], options['days'], customer_ids, table_ids, menu)
+
+        bump_menu_version()
+        bump_floor_version()
+        bump_orders_version()
+        days = rebuild_sales_rollups()
+        self.stdout.write(f"Rebuilt sales rollup for {days} day(s).")
+        self.stdout.write(self.style.SUCCESS(f"Seeded in {time.monotonic() - started:.1f}s."))
+
+    def insert(self, model, objects):
+        """bulk_create in batches, each batch in its own transaction."""
+        total = 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch, batch_size=self.batch_size)
+                total += len(batch)
+                batch = []
+                self.stdout.write(f"  {model.__name__}: {total}", ending='\r')
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+            total += len(batch)
+        self.stdout.write(f"  {model.__name__}: {total}")
+        return total
+
+    def next_id(self, model):
+        return (model.objects.aggregate(m=Max('id'))['m'] or 0) + 1
+
+    def random_moment(self, days):
+        """A timestamp in the last `days` days, weighted by weekday and hour."""
+        today = timezone.localdate()
+        while True:
+            day = today - timedelta(days=self.rng.randrange(days))
+            if self.rng.random() * max(WEEKDAY_WEIGHTS) <= WEEKDAY_WEIGHTS[day.weekday()]:
+                break
+        hour = self.rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+        moment = datetime.combine(day, datetime.min.time()) + timedelta(hours=hour, seconds=self.rng.randrange(3600))
+        # Today's orders cannot be later than right now
+        return min(timezone.make_aware(moment), timezone.now())
+
+    def seed_customers(self, count, days):
+        start = self.next_id(Customer)
+        rng = self.rng
+
+        def customers():
+            for pk in range(start, start + count):
+                customer = Customer(
+                    id=pk,
+                    name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    email=f"customer{pk}@example.com",
+                    phone=f"9{pk:09d}",
+                    created_at=self.random_moment(days),
+                )
+                customer.set_search_keys()
+                yield customer
+
+        self.insert(Customer, customers())
+        return list(range(start, start + count))
+
+    def seed_tables(self, count, customer_ids):
+        start_id = self.next_id(Table)
+        start_number = (Table.objects.aggregate(m=Max('number'))['m'] or 0) + 1
+        tables = []
+        for i in range(count):
+            # Roughly half the floor is seated right now
+            customer_id = self.rng.choice(customer_ids) if self.rng.random() < 0.5 else None
+            tables.append(Table(
+                id=start_id + i,
+                number=start_number + i,
+                capacity=self.rng.choice([2, 2, 4, 4, 4, 6, 8]),
+                customer_id=customer_id,
+                occupied=customer_id is not None,
+                state=Table.SEATED if customer_id is not None else Table.AVAILABLE,
+            ))
+        self.insert(Table, tables)
+        # Start the occupancy log with the parties seated now, as migration 0009 does
+        self.insert(TableOccupancyEvent, (
+            TableOccupancyEvent(table_id=table.id, kind=TableOccupancyEvent.SEAT, from_state=Table.AVAILABLE,
+                                to_state=Table.SEATED, customer_id=table.customer_id)
+            for table in tables if table.customer_id is not None
+        ))
+        return list(range(start_id, start_id + count))
+
+    def seed_menu(self, count):
+        start = self.next_id(MenuItem)
+        dishes = [(category, name) for category, names in MENU.items() for name in names]
+        items = []
+        for i in range(count):
+            category, name = dishes[i % len(dishes)]
+            if i >= len(dishes):
+                name = f"{name} ({i // len(dishes) + 1})"
+            low, high = PRICE_RANGE[category]
+            items.append(MenuItem(
+                id=start + i,
+                name=name,
+                description=f"House {name.lower()}",
+                price=Decimal(self.rng.randrange(low, high, 10)),
+                category=category,
+                available=self.rng.random() > 0.05,
+            ))
+        self.insert(MenuItem, items)
+        menu = items or list(MenuItem.objects.all())
+        # Popularity follows a Zipf-like curve: a few dishes sell most.
+        order = list(menu)
+        self.rng.shuffle(order)
+        weights = [1 / (rank + 1) for rank in range(len(order))]
+        return order, weights
+
+    def seed_employees(self, count):
+        start = self.next_id(Employee)
+        roles = ['Waiter'] * 6 + ['Chef'] * 3 + ['Manager']
+        self.insert(Employee, (
+            Employee(
+                id=pk,
+                name=f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}",
+                email=f"employee{pk}@example.com",
+                phone=f"8{pk:09d}",
+                salary=Decimal(self.rng.randrange(15000, 80000, 500)),
+                role=self.rng.choice(roles),
+            )
+            for pk in range(start, start + count)
+        ))
+
+    def seed_orders(self, count, days, customer_ids, table_ids, menu):
+        if not count:
+            return
+        items, weights = menu
+        start = self.next_id(Order)
+        today = timezone.localdate()
+        rng = self.rng
+        lines = []
+
+        def orders():
+            for pk in range(start, start + count):
+                created_at = self.random_moment(days)
+                total = Decimal('0')
+                picked = rng.choices(items, weights=weights, k=rng.choices(LINES_PER_ORDER, weights=LINES_WEIGHTS)[0])
+                for item in {item.pk: item for item in picked}.values():
+                    quantity = rng.choices([1, 2, 3, 4], weights=QUANTITY_WEIGHTS)[0]
+                    total += item.price * quantity
+                    lines.append(OrderItem(order_id=pk, menu_item_id=item.pk, quantity=quantity, price=item.price))
+                if timezone.localdate(created_at) == today:
+                    status = rng.choice([Order.PENDING, Order.IN_PROGRESS, Order.COMPLETED])
+                else:
+                    status = Order.CANCELLED if rng.random() < 0.03 else Order.COMPLETED
+                yield Order(
+                    id=pk,
+                    table_id=rng.choice(table_ids),
+                    customer_id=rng.choice(customer_ids),
+                    status=status,
+                    total_amount=total,
+                    created_at=created_at,
+                )
+
+        # Insert orders batch by batch, flushing the lines generated for each
+        # batch right after so memory stays bounded.
+        batch = []
+        inserted = 0
+        for order in orders():
+            batch.append(order)
+            if len(batch) >= self.batch_size:
+                inserted += self.flush_orders(batch, lines)
+                batch, lines[:] = [], []
+                self.stdout.write(f"  Order: {inserted}", ending='\r')
+        if batch:
+            inserted += self.flush_orders(batch, lines)
+        self.stdout.write(f"  Order: {inserted}")
+
+    def flush_orders(self, orders, lines):
+        with transaction.atomic():
+            Order.objects.bulk_create(orders, batch_size=self.batch_size)
+            OrderItem.objects.bulk_create(lines, batch_size=self.batch_size)
+        return len(orders)
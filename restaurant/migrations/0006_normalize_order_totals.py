@@ -0,0 +1,38 @@
+from django.db import migrations
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def normalize_order_totals(apps, schema_editor):
+    MenuItem = apps.get_model("restaurant", "MenuItem")
+    Order = apps.get_model("restaurant", "Order")
+    OrderItem = apps.get_model("restaurant", "OrderItem")
+    money = DecimalField(max_digits=12, decimal_places=2)
+
+    # The old increase/decrease quantity views stored the line total in
+    # OrderItem.price. Turn those rows back into unit prices.
+    menu_price = Subquery(MenuItem.objects.filter(pk=OuterRef("menu_item_id")).values("price")[:1])
+    OrderItem.objects.filter(
+        quantity__gt=1,
+        price=ExpressionWrapper(F("quantity") * menu_price, output_field=money),
+    ).update(price=menu_price)
+
+    # Re-derive every order total as the sum of quantity * unit price.
+    line_totals = (
+        OrderItem.objects.filter(order=OuterRef("pk"))
+        .values("order")
+        .annotate(total=Sum(ExpressionWrapper(F("quantity") * F("price"), output_field=money)))
+        .values("total")
+    )
+    Order.objects.update(total_amount=Coalesce(Subquery(line_totals), Value(0), output_field=money))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("restaurant", "0005_dailysalesrollup"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_order_totals, migrations.RunPython.noop),
+    ]
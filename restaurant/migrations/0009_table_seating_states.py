@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seat_tables_with_customers(apps, schema_editor):
+    Table = apps.get_model('restaurant', 'Table')
+    TableOccupancyEvent = apps.get_model('restaurant', 'TableOccupancyEvent')
+    # Table.save() used to set occupied but never clear it, so it is
+    # rederived here along with the new state.
+    Table.objects.filter(customer__isnull=False).update(state='seated', occupied=True)
+    Table.objects.filter(customer__isnull=True).update(state='available', occupied=False)
+    # Start the log with the parties seated right now
+    TableOccupancyEvent.objects.bulk_create(
+        TableOccupancyEvent(table_id=table_id, kind='seat', from_state='available', to_state='seated',
+                            customer_id=customer_id)
+        for table_id, customer_id in Table.objects.filter(customer__isnull=False).values_list('id', 'customer_id')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0008_item_sales_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='table',
+            name='state',
+            field=models.CharField(choices=[('available', 'Available'), ('seated', 'Seated'), ('ordered', 'Ordered'), ('billed', 'Billed')], default='available', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='table',
+            name='state_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='TableOccupancyEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('seat', 'Seat'), ('order', 'Order'), ('bill', 'Bill'), ('clear', 'Clear')], max_length=10)),
+                ('from_state', models.CharField(choices=[('available', 'Available'), ('seated', 'Seated'), ('ordered', 'Ordered'), ('billed', 'Billed')], max_length=10)),
+                ('to_state', models.CharField(choices=[('available', 'Available'), ('seated', 'Seated'), ('ordered', 'Ordered'), ('billed', 'Billed')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='restaurant.customer')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='restaurant.order')),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy_events', to='restaurant.table')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['table', 'created_at'], name='occupancy_table_created_idx'), models.Index(fields=['kind', 'created_at'], name='occupancy_kind_created_idx')],
+            },
+        ),
+        migrations.RunPython(seat_tables_with_customers, migrations.RunPython.noop),
+    ]
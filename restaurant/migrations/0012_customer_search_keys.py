@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:45
+
+import unicodedata
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+# Copies of restaurant.models.search_key and phone_digits as they were when
+# this migration was written, so later changes to those do not change what
+# it does
+def search_key(value, max_length=None):
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(value.casefold().split())[:max_length]
+
+
+def phone_digits(value):
+    return ''.join(char for char in value or '' if char in '0123456789')
+
+
+def fill_search_keys(apps, schema_editor):
+    Customer = apps.get_model('restaurant', 'Customer')
+    keys = ['name_key', 'surname_key', 'email_key', 'phone_key']
+    batch = []
+    for customer in Customer.objects.only('name', 'email', 'phone').iterator(chunk_size=BATCH_SIZE):
+        # As Customer.set_search_keys(), which the historical model lacks
+        customer.name_key = search_key(customer.name, 100)
+        customer.surname_key = customer.name_key.rpartition(' ')[2]
+        customer.email_key = search_key(customer.email, 254)
+        customer.phone_key = phone_digits(customer.phone)[:15]
+        batch.append(customer)
+        if len(batch) == BATCH_SIZE:
+            Customer.objects.bulk_update(batch, keys)
+            batch = []
+    Customer.objects.bulk_update(batch, keys)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0011_list_row_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='email_key',
+            field=models.CharField(default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='name_key',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_key',
+            field=models.CharField(default='', editable=False, max_length=15),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='surname_key',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        # Filled before the indexes are built, so they are built once
+        migrations.RunPython(fill_search_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['name_key'], name='customer_name_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['surname_key'], name='customer_surname_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['email_key'], name='customer_email_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['phone_key'], name='customer_phone_key_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:19
+
+import time
+
+from django.db import migrations, models
+
+
+def add_orders_version(apps, schema_editor):
+    # The row restaurant.conditional reads, so the first poll after the
+    # upgrade need not create it
+    ContentVersion = apps.get_model('restaurant', 'ContentVersion')
+    ContentVersion.objects.get_or_create(key='orders', defaults={'version': time.time_ns()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0012_customer_search_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentVersion',
+            fields=[
+                ('key', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(add_orders_version, migrations.RunPython.noop),
+    ]
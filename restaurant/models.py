@@ -1,31 +1,114 @@
+import unicodedata
+
 from django.db import models
 
 # Create your models here.
 
+def search_key(value, max_length=None):
+    """`value` casefolded, without accents and with its whitespace collapsed."""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(value.casefold().split())[:max_length]
+
+
+def phone_digits(value):
+    return ''.join(char for char in value or '' if char in '0123456789')
+
+
 class Customer(models.Model):
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=15, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Versions the cached list-page rows (templatetags/fragments.py)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Normalised copies of the fields above for the prefix search in
+    # customer_search.py. save() keeps them in step; code writing customers
+    # with bulk_create/bulk_update calls set_search_keys() itself.
+    name_key = models.CharField(max_length=100, default='', editable=False)
+    surname_key = models.CharField(max_length=100, default='', editable=False)
+    email_key = models.CharField(max_length=254, default='', editable=False)
+    phone_key = models.CharField(max_length=15, default='', editable=False)
+
+    # The source fields and the keys made from them
+    SEARCH_KEYS = {
+        'name': ['name_key', 'surname_key'],
+        'email': ['email_key'],
+        'phone': ['phone_key'],
+    }
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='customer_created_idx'),
+            # Also the order the API lists customers in (api.py)
+            models.Index(fields=['name_key', 'id'], name='customer_name_key_idx'),
+            models.Index(fields=['surname_key'], name='customer_surname_key_idx'),
+            models.Index(fields=['email_key'], name='customer_email_key_idx'),
+            models.Index(fields=['phone_key'], name='customer_phone_key_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def set_search_keys(self):
+        self.name_key = search_key(self.name, 100)
+        # The last word, so "sharma" finds "Asha Sharma"
+        self.surname_key = self.name_key.rpartition(' ')[2]
+        self.email_key = search_key(self.email, 254)
+        self.phone_key = phone_digits(self.phone)[:15]
+
+    def save(self, *args, **kwargs):
+        self.set_search_keys()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            keys = [key for field in update_fields for key in self.SEARCH_KEYS.get(field, [])]
+            kwargs['update_fields'] = [*update_fields, *keys]
+        super().save(*args, **kwargs)
+
 class Table(models.Model):
+    # Seating states, moved between by services.move_table (SEATING_TRANSITIONS)
+    AVAILABLE = 'available'
+    SEATED = 'seated'
+    ORDERED = 'ordered'
+    BILLED = 'billed'
+
+    STATE_CHOICES = [
+        (AVAILABLE, 'Available'),
+        (SEATED, 'Seated'),
+        (ORDERED, 'Ordered'),
+        (BILLED, 'Billed'),
+    ]
+
     id = models.AutoField(primary_key=True)
     number = models.IntegerField(unique=True)
     capacity = models.IntegerField()
     occupied = models.BooleanField(default=False)
     customer = models.ForeignKey(Customer, null=True, on_delete=models.SET_NULL)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=AVAILABLE)
+    state_changed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['occupied'], name='table_occupied_idx'),
+        ]
 
     def __str__(self):
         return f"Table {self.number} (Capacity: {self.capacity})"
     
     def save(self, *args, **kwargs):
-
-        if self.customer:
-            self.occupied = True
+        # A table with a customer is at least seated, and occupied always
+        # follows the state
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'customer', 'state'} & set(update_fields):
+            if self.customer_id and self.state == self.AVAILABLE:
+                self.state = self.SEATED
+            self.occupied = self.state != self.AVAILABLE
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'state', 'occupied'}
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'updated_at'}
         super().save(*args, **kwargs)
 
 class MenuItem(models.Model):
@@ -35,6 +118,12 @@ class MenuItem(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     category = models.CharField(max_length=50)
     available = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'available'], name='menuitem_category_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -63,6 +152,18 @@ class Order(models.Model):
     )
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Changes whenever the order or one of its lines does (see
+    # restaurant/conditional.py)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Orders list keyset pagination and date-range filters
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['table', 'status'], name='order_table_status_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} - {self.customer.name if self.customer else 'No customer'}"
@@ -74,6 +175,12 @@ class OrderItem(models.Model):
     quantity = models.IntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # Serves menu_item lookups and per-item quantity sums from the index alone
+            models.Index(fields=['menu_item', 'quantity'], name='orderitem_menu_qty_idx'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} x {self.menu_item.name}"
 
@@ -93,3 +200,103 @@ class Employee(models.Model):
 
     def __str__(self):
         return f"{self.name} - {self.role}"
+
+class DailySalesRollup(models.Model):
+    date = models.DateField(unique=True)
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    items_sold = models.IntegerField(default=0)
+    # {category: revenue as a string}, kept as text to avoid float rounding
+    category_revenue = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"Sales for {self.date}: {self.order_count} orders, {self.revenue}"
+
+
+class DailyItemSales(models.Model):
+    """Quantity and revenue of one menu item on one day, kept current from order lines."""
+    date = models.DateField()
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index the leaderboard windows are read through
+            models.UniqueConstraint(fields=['date', 'menu_item'], name='dailyitemsales_date_item_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.menu_item_id} on {self.date}: {self.quantity} sold, {self.revenue}"
+
+
+class ItemSalesTotal(models.Model):
+    """All-time quantity and revenue of one menu item."""
+    menu_item = models.OneToOneField(MenuItem, primary_key=True, on_delete=models.CASCADE, related_name='sales_total')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-quantity'], name='itemsalestotal_quantity_idx'),
+            models.Index(fields=['-revenue'], name='itemsalestotal_revenue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.menu_item_id}: {self.quantity} sold, {self.revenue}"
+
+
+class TableOccupancyEvent(models.Model):
+    """One seating transition of a table: who sat down, ordered, paid or left, and when."""
+    SEAT = 'seat'
+    ORDER = 'order'
+    BILL = 'bill'
+    CLEAR = 'clear'
+
+    KIND_CHOICES = [
+        (SEAT, 'Seat'),
+        (ORDER, 'Order'),
+        (BILL, 'Bill'),
+        (CLEAR, 'Clear'),
+    ]
+
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name='occupancy_events')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    from_state = models.CharField(max_length=10, choices=Table.STATE_CHOICES)
+    to_state = models.CharField(max_length=10, choices=Table.STATE_CHOICES)
+    customer = models.ForeignKey(Customer, null=True, blank=True, on_delete=models.SET_NULL)
+    order = models.ForeignKey(Order, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['table', 'created_at'], name='occupancy_table_created_idx'),
+            models.Index(fields=['kind', 'created_at'], name='occupancy_kind_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Table {self.table_id} {self.kind} at {self.created_at}"
+
+
+class ReplicaHeartbeat(models.Model):
+    """
+    A single row the primary rewrites every second or so (see the
+    replica_heartbeat command). How old it is on a replica is how far that
+    replica is behind.
+    """
+    beat_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Heartbeat at {self.beat_at}"
+
+
+class ContentVersion(models.Model):
+    """
+    The version number of something every process caches or answers ETags
+    for, such as the menu catalog (see restaurant/versions.py).
+    """
+    key = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.key} at version {self.version}"
@@ -0,0 +1,210 @@
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Order, TableOccupancyEvent
+from .queries import start_of_day
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Occupancy analytics
+# A table is taken to be occupied from a seat event to the clear event that
+# follows it, and for ORDER_SEATING after each order is placed (which covers
+# history from before seating was logged). Overlapping spans of the same
+# table are merged into seatings. The seatings of a run of days are then
+# cut into hour buckets all at once: with NumPy each seating is expanded to
+# the buckets it touches and summed with one bincount, without it the same
+# sums are made in a plain loop. NumPy is an optional dependency
+# (requirements-optional.txt); the tests run both paths.
+#
+# The figures for each finished day are cached, so a year of history is
+# computed once and then read with a single get_many. Today is recomputed on
+# every read. Rates are worked out at read time against the current number
+# of tables.
+
+ORDER_SEATING = timedelta(minutes=60)
+# A seat without a clear (a table someone forgot to free) counts for at most this long
+MAX_OPEN_SEATING = timedelta(hours=4)
+HOUR = 3600
+
+CACHE_KEY = 'occupancy:v1:{day}'
+CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def seating_intervals(start, end):
+    """
+    Seatings that overlap [start, end), as sorted (table_id, start, end)
+    lists with times in epoch seconds.
+    """
+    now = timezone.now()
+    spans = []
+    open_since = {}
+    events = TableOccupancyEvent.objects.filter(
+        kind__in=[TableOccupancyEvent.SEAT, TableOccupancyEvent.CLEAR],
+        created_at__gte=start - MAX_OPEN_SEATING,
+        created_at__lt=end + MAX_OPEN_SEATING,
+    ).order_by('table_id', 'created_at', 'id').values_list('table_id', 'kind', 'created_at')
+    for table_id, kind, at in events:
+        seated = open_since.pop(table_id, None)
+        if seated is not None:
+            spans.append((table_id, seated, min(at, seated + MAX_OPEN_SEATING)))
+        if kind == TableOccupancyEvent.SEAT and at < end:
+            open_since[table_id] = at
+    for table_id, seated in open_since.items():
+        spans.append((table_id, seated, max(seated, min(now, seated + MAX_OPEN_SEATING))))
+
+    orders = Order.objects.filter(
+        created_at__gte=start - ORDER_SEATING, created_at__lt=end,
+    ).values_list('table_id', 'created_at')
+    spans.extend((table_id, at, at + ORDER_SEATING) for table_id, at in orders)
+
+    merged = []
+    for table_id, seated, left in sorted((t, s.timestamp(), e.timestamp()) for t, s, e in spans):
+        last = merged[-1] if merged else None
+        if last and last[0] == table_id and seated <= last[2]:
+            last[2] = max(last[2], left)
+        else:
+            merged.append([table_id, seated, left])
+    return merged
+
+
+def occupied_seconds(starts, ends, edges):
+    """Seconds of seating that fall inside each bucket [edges[i], edges[i + 1])."""
+    if np is not None:
+        return _occupied_seconds_numpy(starts, ends, edges)
+    occupied = [0.0] * (len(edges) - 1)
+    for start, end in zip(starts, ends):
+        start, end = max(start, edges[0]), min(end, edges[-1])
+        bucket = bisect_right(edges, start) - 1
+        while end > start and bucket < len(occupied) and edges[bucket] < end:
+            occupied[bucket] += min(end, edges[bucket + 1]) - max(start, edges[bucket])
+            bucket += 1
+    return occupied
+
+
+def _occupied_seconds_numpy(starts, ends, edges):
+    edges = np.asarray(edges, dtype=float)
+    starts = np.clip(np.asarray(starts, dtype=float), edges[0], edges[-1])
+    ends = np.clip(np.asarray(ends, dtype=float), edges[0], edges[-1])
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if not len(starts):
+        return [0.0] * (len(edges) - 1)
+
+    # One row per (seating, bucket it touches)
+    first = np.searchsorted(edges, starts, side='right') - 1
+    last = np.searchsorted(edges, ends, side='left') - 1
+    counts = last - first + 1
+    seating = np.repeat(np.arange(len(starts)), counts)
+    bucket = first[seating] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    overlap = np.minimum(ends[seating], edges[bucket + 1]) - np.maximum(starts[seating], edges[bucket])
+    return np.bincount(bucket, weights=overlap, minlength=len(edges) - 1).tolist()
+
+
+def _sum_by(index, weights, size):
+    if np is not None:
+        return np.bincount(np.asarray(index, dtype=int), weights=np.asarray(weights, dtype=float), minlength=size).tolist()
+    totals = [0.0] * size
+    for i, weight in zip(index, weights):
+        totals[i] += weight
+    return totals
+
+
+def _compute_run(first, count):
+    """Figures for `count` consecutive days from `first`, from one read of the history."""
+    days = [first + timedelta(days=i) for i in range(count)]
+    day_edges = [start_of_day(day).timestamp() for day in days] + [start_of_day(days[-1] + timedelta(days=1)).timestamp()]
+    hour_edges = [min(day_edges[d] + hour * HOUR, day_edges[d + 1]) for d in range(count) for hour in range(24)]
+    hour_edges.append(day_edges[-1])
+
+    seatings = seating_intervals(start_of_day(days[0]), start_of_day(days[-1] + timedelta(days=1)))
+    tables = [table for table, start, end in seatings]
+    starts = [start for table, start, end in seatings]
+    ends = [end for table, start, end in seatings]
+    by_hour = occupied_seconds(starts, ends, hour_edges)
+
+    # Seatings and the gaps before them belong to the day they started on
+    counted = [i for i, start in enumerate(starts) if day_edges[0] <= start < day_edges[-1]]
+    day_of = [bisect_right(day_edges, starts[i]) - 1 for i in counted]
+    seating_count = _sum_by(day_of, [1] * len(counted), count)
+    seated_seconds = _sum_by(day_of, [ends[i] - starts[i] for i in counted], count)
+    gaps = [
+        (day, starts[i] - ends[i - 1]) for day, i in zip(day_of, counted)
+        if i and tables[i - 1] == tables[i] and ends[i - 1] >= day_edges[day]
+    ]
+    turnover_count = _sum_by([day for day, gap in gaps], [1] * len(gaps), count)
+    turnover_seconds = _sum_by([day for day, gap in gaps], [gap for day, gap in gaps], count)
+
+    return {
+        day: {
+            'date': day,
+            'occupied_seconds': by_hour[d * 24:(d + 1) * 24],
+            'seatings': int(seating_count[d]),
+            'seated_seconds': seated_seconds[d],
+            'turnovers': int(turnover_count[d]),
+            'turnover_seconds': turnover_seconds[d],
+        }
+        for d, day in enumerate(days)
+    }
+
+
+def daily_occupancy(first, last):
+    """Figures for each day from `first` to `last` inclusive, computing only the days not cached."""
+    days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+    keys = {day: CACHE_KEY.format(day=day.isoformat()) for day in days}
+    cached = cache.get_many(list(keys.values()))
+    found = {day: cached[key] for day, key in keys.items() if key in cached}
+
+    today = timezone.localdate()
+    missing = [day for day in days if day not in found]
+    while missing:
+        # Each run of consecutive missing days is read in one go
+        run = 1
+        while run < len(missing) and missing[run] == missing[0] + timedelta(days=run):
+            run += 1
+        computed = _compute_run(missing[0], run)
+        cache.set_many({keys[day]: stats for day, stats in computed.items() if day < today}, CACHE_TIMEOUT)
+        found.update(computed)
+        missing = missing[run:]
+    return [found[day] for day in days]
+
+
+def opening_hours():
+    return range(*settings.RESTAURANT_OPENING_HOURS)
+
+
+def _rate(seconds, tables, hours):
+    return seconds / (tables * hours * HOUR) * 100 if tables and hours else 0
+
+
+def summarize(days, tables):
+    """Occupancy, seating length and turnover over a list of daily_occupancy() figures."""
+    hours = opening_hours()
+    occupied = sum(day['occupied_seconds'][hour] for day in days for hour in hours)
+    seatings = sum(day['seatings'] for day in days)
+    turnovers = sum(day['turnovers'] for day in days)
+    return {
+        'occupancy_rate': _rate(occupied, tables, len(hours) * len(days)),
+        'hourly_rate': [_rate(sum(day['occupied_seconds'][hour] for day in days), tables, len(days)) for hour in range(24)],
+        'seatings': seatings,
+        'avg_seating_minutes': sum(day['seated_seconds'] for day in days) / seatings / 60 if seatings else 0,
+        'avg_turnover_minutes': sum(day['turnover_seconds'] for day in days) / turnovers / 60 if turnovers else 0,
+        'turnovers_per_table_per_day': seatings / tables / len(days) if tables and days else 0,
+    }
+
+
+def heatmap(days, tables, key):
+    """[(label, [rate per opening hour])] with days grouped by key(date) -> label, in first-seen order."""
+    groups = {}
+    for day in days:
+        groups.setdefault(key(day['date']), []).append(day)
+    return [
+        (label, [_rate(sum(day['occupied_seconds'][hour] for day in group), tables, len(group)) for hour in opening_hours()])
+        for label, group in groups.items()
+    ]
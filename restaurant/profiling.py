@@ -0,0 +1,224 @@
+import json
+
+from django.conf import settings
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+from django.test.client import BOUNDARY, encode_multipart
+from django.urls import reverse
+
+from .models import Customer, Employee, MenuItem, Order, OrderItem, Table
+from .urls import urlpatterns
+
+
+def page_host():
+    """A host name that passes the ALLOWED_HOSTS check outside the test runner."""
+    hosts = [host for host in settings.ALLOWED_HOSTS if host not in ('*',) and not host.startswith('.')]
+    return hosts[0] if hosts else 'localhost'
+
+
+def page_client():
+    return Client(HTTP_HOST=page_host(), raise_request_exception=False)
+
+
+def response_size(response):
+    """Body size in bytes, reading streaming responses to the end."""
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _samples():
+    """The oldest row of each kind, used to fill in URLs that need an id."""
+    def first(queryset):
+        return queryset.order_by('pk').values_list('pk', flat=True).first()
+
+    order_item = OrderItem.objects.order_by('pk').values('pk', 'order_id').first()
+    return {
+        'customer': first(Customer.objects.all()),
+        'table': first(Table.objects.all()),
+        'seated_table': first(Table.objects.filter(customer__isnull=False)),
+        'menu_item': first(MenuItem.objects.all()),
+        'available_menu_item': first(MenuItem.objects.filter(available=True)),
+        'order': order_item['order_id'] if order_item else first(Order.objects.all()),
+        'order_item': order_item['pk'] if order_item else None,
+        'employee': first(Employee.objects.all()),
+    }
+
+
+def page_urls():
+    """
+    (name, url) for every read-only page in restaurant/urls.py.
+
+    Pages that need an id use the oldest matching row in the database, so
+    run this against a seeded dataset. Routes that change data are left out.
+    """
+    samples = _samples()
+    pages = [
+        ('dashboard', reverse('dashboard')),
+        ('dashboard.view', reverse('dashboard.view')),
+        ('customers', reverse('customers')),
+        ('add_customer', reverse('add_customer')),
+        ('tables', reverse('tables')),
+        ('add_table', reverse('add_table')),
+        ('menu', reverse('menu')),
+        ('add_menu_item', reverse('add_menu_item')),
+        ('orders', reverse('orders')),
+        ('export_orders', reverse('export_orders') + '?format=csv'),
+        ('select_table_for_order', reverse('select_table_for_order')),
+        ('employees', reverse('employees')),
+        ('create_employee', reverse('create_employee')),
+        ('metrics', reverse('metrics')),
+        ('import_data', reverse('import_data')),
+        ('leaderboard_api', reverse('leaderboard_api') + '?window=30d'),
+        ('occupancy_analytics', reverse('occupancy_analytics')),
+        ('kitchen', reverse('kitchen')),
+        ('kitchen_feed', reverse('kitchen_feed')),
+        ('api_menu_items', reverse('api_menu_items') + '?available=true'),
+        ('api_tables', reverse('api_tables')),
+        ('api_customers', reverse('api_customers')),
+        ('api_customer_search', reverse('api_customer_search') + '?q=a'),
+        ('api_orders', reverse('api_orders')),
+    ]
+    if samples['customer']:
+        pages.append(('edit_customer', reverse('edit_customer', args=[samples['customer']])))
+    if samples['table']:
+        pages.append(('edit_table', reverse('edit_table', args=[samples['table']])))
+    if samples['seated_table']:
+        pages.append(('create_order', reverse('create_order', args=[samples['seated_table']])))
+    if samples['menu_item']:
+        pages.append(('update_menu_item', reverse('update_menu_item', args=[samples['menu_item']])))
+    if samples['order']:
+        pages.append(('order_detail', reverse('order_detail', args=[samples['order']])))
+        pages.append(('add_items_to_order', reverse('add_items_to_order', args=[samples['order']])))
+        pages.append(('add_order_item', reverse('add_order_item', args=[samples['order']])))
+        pages.append(('api_order', reverse('api_order', args=[samples['order']])))
+    if samples['order_item']:
+        pages.append(('update_order_item', reverse('update_order_item', args=[samples['order_item']])))
+    if samples['employee']:
+        pages.append(('update_employee', reverse('update_employee', args=[samples['employee']])))
+    return pages
+
+
+def route_requests():
+    """
+    One sample request for every route in restaurant/urls.py.
+
+    Returns dicts with name, method, url, data, content_type and mutates.
+    Requests that change data carry a valid payload and are meant to be run
+    inside a transaction that is rolled back afterwards.
+    """
+    samples = _samples()
+    requests = [
+        {'name': f'GET {name}', 'method': 'get', 'url': url, 'data': None, 'content_type': None, 'mutates': False}
+        for name, url in page_urls()
+    ]
+
+    def post(name, url, data, content_type=None):
+        requests.append({
+            'name': f'POST {name}', 'method': 'post', 'url': url,
+            'data': data, 'content_type': content_type, 'mutates': True,
+        })
+
+    # Deletes and quantity changes are plain GET links in this app
+    def get(name, url):
+        requests.append({'name': f'GET {name}', 'method': 'get', 'url': url, 'data': None, 'content_type': None, 'mutates': True})
+
+    post('add_customer', reverse('add_customer'), {'name': 'Bench Customer', 'email': 'bench@example.com', 'phone': '0000000001'})
+    post('add_table', reverse('add_table'), {'number': 999999, 'capacity': 4})
+    post('add_menu_item', reverse('add_menu_item'), {
+        'name': 'Bench Dish', 'description': 'Benchmark', 'price': '9.99', 'category': 'Bench', 'available': 'on',
+    })
+    post('create_employee', reverse('create_employee'), {
+        'name': 'Bench Employee', 'email': 'bench.employee@example.com', 'phone': '0000000002',
+        'salary': '1000', 'role': 'Waiter',
+    })
+    # Encoded once so that every repetition sends the whole file
+    post('import_data', reverse('import_data'), encode_multipart(BOUNDARY, {
+        'kind': 'tables', 'file': SimpleUploadedFile('tables.csv', b'number,capacity\n999998,2\n'),
+    }), f'multipart/form-data; boundary={BOUNDARY}')
+    if samples['customer']:
+        customer = Customer.objects.get(pk=samples['customer'])
+        post('edit_customer', reverse('edit_customer', args=[customer.pk]),
+             {'name': customer.name, 'email': customer.email, 'phone': customer.phone})
+        get('delete_customer', reverse('delete_customer', args=[customer.pk]))
+    if samples['table']:
+        table = Table.objects.get(pk=samples['table'])
+        post('edit_table', reverse('edit_table', args=[table.pk]),
+             {'number': table.number, 'capacity': table.capacity, 'customer': table.customer_id or ''})
+        get('delete_table', reverse('delete_table', args=[table.pk]))
+    if samples['seated_table']:
+        post('create_order', reverse('create_order', args=[samples['seated_table']]), {'status': Order.PENDING})
+        post('change_table_state', reverse('change_table_state', args=[samples['seated_table'], 'clear']), {})
+        post('api_orders', reverse('api_orders'), json.dumps({'table_id': samples['seated_table']}), 'application/json')
+    if samples['menu_item']:
+        item = MenuItem.objects.get(pk=samples['menu_item'])
+        post('update_menu_item', reverse('update_menu_item', args=[item.pk]), {
+            'name': item.name, 'description': item.description, 'price': item.price,
+            'category': item.category, 'available': 'on' if item.available else '',
+        })
+        get('delete_menu_item', reverse('delete_menu_item', args=[item.pk]))
+    if samples['order'] and samples['available_menu_item']:
+        order_id, menu_item_id = samples['order'], samples['available_menu_item']
+        line = {'menu_item': menu_item_id, 'quantity': 1}
+        post('add_items_to_order', reverse('add_items_to_order', args=[order_id]), line)
+        post('add_order_item', reverse('add_order_item', args=[order_id]), line)
+        post('add_order_lines', reverse('add_order_lines', args=[order_id]),
+             json.dumps({'items': [{'menu_item_id': menu_item_id, 'quantity': 2}]}), 'application/json')
+        post('change_order_status', reverse('change_order_status', args=[order_id]), {'status': Order.IN_PROGRESS})
+        post('api_order_lines', reverse('api_order_lines', args=[order_id]),
+             json.dumps({'items': [{'menu_item_id': menu_item_id, 'quantity': 2}]}), 'application/json')
+        post('api_order_status', reverse('api_order_status', args=[order_id]),
+             json.dumps({'status': Order.IN_PROGRESS}), 'application/json')
+        get('delete_order', reverse('delete_order', args=[order_id]))
+        if samples['order_item']:
+            post('update_order_item', reverse('update_order_item', args=[samples['order_item']]), line)
+            get('delete_order_item', reverse('delete_order_item', args=[samples['order_item']]))
+            get('increase_item_quantity', reverse('increase_item_quantity', args=[order_id, samples['order_item']]))
+            get('decrease_item_quantity', reverse('decrease_item_quantity', args=[order_id, samples['order_item']]))
+    if samples['employee']:
+        employee = Employee.objects.get(pk=samples['employee'])
+        post('update_employee', reverse('update_employee', args=[employee.pk]), {
+            'name': employee.name, 'email': employee.email, 'phone': employee.phone,
+            'salary': employee.salary, 'role': employee.role,
+        })
+        get('delete_employee', reverse('delete_employee', args=[employee.pk]))
+    return requests
+
+
+def route_names():
+    """Every named route in restaurant/urls.py."""
+    return {pattern.name for pattern in urlpatterns if pattern.name}
+
+
+def explain(sql):
+    """Return the query plan for `sql` as a list of text lines."""
+    vendor = connection.vendor
+    prefix = {'sqlite': 'EXPLAIN QUERY PLAN ', 'mysql': 'EXPLAIN FORMAT=TRADITIONAL '}.get(vendor, 'EXPLAIN ')
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        columns = [col[0] for col in cursor.description]
+        rows = cursor.fetchall()
+    if vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    if vendor == 'mysql':
+        return [' '.join(f'{col}={value}' for col, value in zip(columns, row)) for row in rows]
+    return [' '.join(str(value) for value in row) for row in rows]
+
+
+def full_scans(plan):
+    """The lines of a query plan that read a whole table."""
+    vendor = connection.vendor
+    if vendor == 'sqlite':
+        return [line for line in plan if line.startswith('SCAN ') and ' USING ' not in line]
+    if vendor == 'mysql':
+        return [line for line in plan if ' type=ALL ' in f' {line} ']
+    return [line for line in plan if 'Seq Scan' in line]
@@ -0,0 +1,197 @@
+import base64
+from datetime import datetime, time, timedelta
+
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Order, OrderItem, Table
+
+ORDERS_PAGE_SIZE = 50
+MAX_ORDERS_PAGE_SIZE = 200
+
+
+# Query shapes
+# Each list/detail page gets a queryset that already joins or prefetches
+# everything its template touches, so rendering costs a fixed number of
+# queries however many rows there are.
+def orders_for_list():
+    return Order.objects.select_related('table', 'customer')
+
+
+def tables_for_list():
+    return Table.objects.select_related('customer').order_by('number')
+
+
+def order_with_lines():
+    lines = OrderItem.objects.select_related('menu_item').order_by('id')
+    return Order.objects.select_related('table', 'customer').prefetch_related(
+        Prefetch('orderitem_set', queryset=lines)
+    )
+
+
+def order_summary(order_id):
+    """The order and its lines as plain data, read in two narrow queries."""
+    order = Order.objects.values('id', 'status', 'total_amount', 'table__number').get(pk=order_id)
+    lines = OrderItem.objects.filter(order_id=order_id).order_by('id').values(
+        'id', 'menu_item_id', 'menu_item__name', 'quantity', 'price',
+    )
+    return {
+        'id': order['id'],
+        'status': order['status'],
+        'table': order['table__number'],
+        'total_amount': str(order['total_amount']),
+        'lines': [
+            {
+                'id': line['id'],
+                'menu_item_id': line['menu_item_id'],
+                'name': line['menu_item__name'],
+                'quantity': line['quantity'],
+                'price': str(line['price']),
+            }
+            for line in lines
+        ],
+    }
+
+
+# The statuses an order is on the kitchen screens with
+KITCHEN_STATUSES = [Order.PENDING, Order.IN_PROGRESS]
+
+
+def kitchen_tickets(order_id=None):
+    """Orders the kitchen still has to work on, shaped like kitchen events; just `order_id`'s if given."""
+    orders = Order.objects.filter(status__in=KITCHEN_STATUSES)
+    lines = OrderItem.objects.filter(order__status__in=KITCHEN_STATUSES)
+    if order_id is not None:
+        orders = orders.filter(pk=order_id)
+        lines = lines.filter(order_id=order_id)
+    orders = orders.order_by('created_at', 'id').values('id', 'status', 'table__number', 'created_at')
+    tickets = {
+        order['id']: {
+            'order': order['id'],
+            'table': order['table__number'],
+            'status': order['status'],
+            'created_at': order['created_at'].isoformat(),
+            'lines': [],
+        }
+        for order in orders
+    }
+    lines = lines.order_by('id').values('id', 'order_id', 'menu_item__name', 'quantity')
+    for line in lines:
+        # An order opened between the two queries shows up with its own event
+        if line['order_id'] in tickets:
+            tickets[line['order_id']]['lines'].append(
+                {'id': line['id'], 'name': line['menu_item__name'], 'quantity': line['quantity']}
+            )
+    return list(tickets.values())
+
+
+# Cursor helpers
+# A cursor is the (created_at, id) pair of the last row on a page, encoded so
+# it can travel in a query string.
+def encode_cursor(order):
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _date_or_none(value):
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+def parse_order_filters(params):
+    """Pull the supported orders-page filters out of a QueryDict."""
+    status = params.get('status', '')
+    if status not in dict(Order.ORDER_STATUS_CHOICES):
+        status = ''
+    return {
+        'q': params.get('q', '').strip(),
+        'status': status,
+        'table': _int_or_none(params.get('table')),
+        'customer': _int_or_none(params.get('customer')),
+        'date_from': _date_or_none(params.get('date_from')),
+        'date_to': _date_or_none(params.get('date_to')),
+    }
+
+
+def filter_orders(queryset, filters):
+    if filters['status']:
+        queryset = queryset.filter(status=filters['status'])
+    if filters['table'] is not None:
+        queryset = queryset.filter(table__number=filters['table'])
+    if filters['customer'] is not None:
+        queryset = queryset.filter(customer_id=filters['customer'])
+    # Compare against day boundaries rather than created_at__date so the
+    # database can use a range scan on created_at.
+    if filters['date_from']:
+        queryset = queryset.filter(created_at__gte=start_of_day(filters['date_from']))
+    if filters['date_to']:
+        queryset = queryset.filter(created_at__lt=start_of_day(filters['date_to'] + timedelta(days=1)))
+
+    q = filters['q'].lstrip('#')
+    if q:
+        # Numbers match an order id or table number, anything else is a
+        # customer name search.
+        if q.isdigit():
+            queryset = queryset.filter(Q(id=int(q)) | Q(table__number=int(q)))
+        else:
+            queryset = queryset.filter(customer__name__icontains=q)
+    return queryset
+
+
+def _page_queryset(queryset, cursor, page_size):
+    queryset = queryset.order_by('-created_at', '-id')
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+    # One extra row tells us whether there is a next page
+    return queryset[:page_size + 1]
+
+
+def _split_page(rows, page_size):
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+
+def paginate_orders(queryset, cursor=None, page_size=ORDERS_PAGE_SIZE):
+    """
+    Keyset pagination over (created_at, id), newest first.
+
+    Returns the rows for this page and the cursor for the next one (None on
+    the last page). Cost does not depend on how deep into history the page is.
+    """
+    page_size = max(1, min(page_size, MAX_ORDERS_PAGE_SIZE))
+    rows = list(_page_queryset(queryset, cursor, page_size))
+    return _split_page(rows, page_size)
+
+
+async def apaginate_orders(queryset, cursor=None, page_size=ORDERS_PAGE_SIZE):
+    """Async version of paginate_orders()."""
+    page_size = max(1, min(page_size, MAX_ORDERS_PAGE_SIZE))
+    rows = [row async for row in _page_queryset(queryset, cursor, page_size)]
+    return _split_page(rows, page_size)
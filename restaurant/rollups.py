@@ -0,0 +1,191 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyItemSales, DailySalesRollup, ItemSalesTotal, Order, OrderItem
+
+# Leaderboard windows: name -> days counted back from today, None for all time
+LEADERBOARD_WINDOWS = {'today': 1, '7d': 7, '30d': 30, 'all': None}
+LEADERBOARD_ORDERINGS = ('quantity', 'revenue')
+
+
+def order_day(order):
+    return timezone.localdate(order.created_at)
+
+
+def line_amount(quantity, price):
+    return Decimal(quantity) * Decimal(price)
+
+
+def line_value():
+    """SQL expression for quantity * unit price of an OrderItem row."""
+    return ExpressionWrapper(F('quantity') * F('price'), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def apply_sales_delta(day, orders=0, revenue=0, items=0, categories=None, menu_items=None):
+    """
+    Add a change to one day's rollup row.
+
+    `categories` maps category -> revenue delta and `menu_items` maps menu
+    item id -> (quantity delta, revenue delta) for the leaderboard. The row
+    is locked for the duration of the update so concurrent order changes
+    cannot lose deltas.
+    """
+    if not (orders or revenue or items or categories or menu_items):
+        return
+    with transaction.atomic():
+        _add_item_sales(day, menu_items or {})
+        rollup, _ = DailySalesRollup.objects.select_for_update().get_or_create(date=day)
+        rollup.order_count += orders
+        rollup.revenue += Decimal(revenue)
+        rollup.items_sold += items
+        for category, amount in (categories or {}).items():
+            current = Decimal(rollup.category_revenue.get(category, '0')) + Decimal(amount)
+            if current:
+                rollup.category_revenue[category] = str(current)
+            else:
+                rollup.category_revenue.pop(category, None)
+        rollup.save()
+
+
+def _add_item_sales(day, menu_items):
+    """
+    Add (quantity, revenue) deltas to the leaderboard rows of several menu items.
+
+    Missing rows are created empty first, then every row moves in one UPDATE
+    per table, so a basket costs the same few queries whatever its size.
+    """
+    menu_items = {pk: delta for pk, delta in menu_items.items() if any(delta)}
+    if not menu_items:
+        return
+    # Only sales start a row; a negative delta with no row to apply it to
+    # means the menu item is being deleted along with its rows.
+    new = [pk for pk, (quantity, amount) in menu_items.items() if quantity > 0 or amount > 0]
+    DailyItemSales.objects.bulk_create(
+        [DailyItemSales(date=day, menu_item_id=pk) for pk in new], ignore_conflicts=True,
+    )
+    ItemSalesTotal.objects.bulk_create([ItemSalesTotal(menu_item_id=pk) for pk in new], ignore_conflicts=True)
+
+    quantity = Case(
+        *[When(menu_item_id=pk, then=Value(delta[0])) for pk, delta in menu_items.items()],
+        default=Value(0),
+    )
+    revenue = Case(
+        *[When(menu_item_id=pk, then=Value(Decimal(delta[1]))) for pk, delta in menu_items.items()],
+        default=Value(Decimal(0)), output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    for rows in (DailyItemSales.objects.filter(date=day), ItemSalesTotal.objects.all()):
+        rows.filter(menu_item_id__in=list(menu_items)).update(
+            quantity=F('quantity') + quantity, revenue=F('revenue') + revenue,
+        )
+
+
+def leaderboard(window='7d', order_by='quantity', limit=10):
+    """
+    The best-selling menu items over a window of LEADERBOARD_WINDOWS.
+
+    Reads at most 30 days of per-item rows, or the all-time totals, so the
+    cost does not grow with the order history.
+    """
+    return _leaderboard_queryset(window, order_by)[:limit]
+
+
+async def aleaderboard(window='7d', order_by='quantity', limit=10):
+    """Async version of leaderboard()."""
+    return [row async for row in _leaderboard_queryset(window, order_by)[:limit]]
+
+
+def _leaderboard_queryset(window, order_by):
+    days = LEADERBOARD_WINDOWS[window]
+    if order_by not in LEADERBOARD_ORDERINGS:
+        raise ValueError(f"Unknown leaderboard ordering: {order_by}")
+    fields = ('menu_item_id', 'menu_item__name', 'menu_item__category', 'quantity', 'revenue')
+    if days is None:
+        return ItemSalesTotal.objects.filter(quantity__gt=0).order_by(f'-{order_by}', 'menu_item_id').values(*fields)
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return (
+        DailyItemSales.objects.filter(date__gte=since)
+        .values('menu_item_id', 'menu_item__name', 'menu_item__category')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .filter(quantity__gt=0)
+        .order_by(f'-{order_by}', 'menu_item_id')
+    )
+
+
+def sales_for_week(week_start):
+    """Revenue for the seven days starting at week_start, read in one query."""
+    days = [week_start + timedelta(days=i) for i in range(7)]
+    revenue = dict(
+        DailySalesRollup.objects.filter(date__range=(days[0], days[-1])).values_list('date', 'revenue')
+    )
+    return [float(revenue.get(day, 0)) for day in days]
+
+
+async def asales_for_week(week_start):
+    """Async version of sales_for_week()."""
+    days = [week_start + timedelta(days=i) for i in range(7)]
+    rows = DailySalesRollup.objects.filter(date__range=(days[0], days[-1])).values_list('date', 'revenue')
+    revenue = {day: amount async for day, amount in rows}
+    return [float(revenue.get(day, 0)) for day in days]
+
+
+def rebuild_sales_rollups(since=None):
+    """Recompute every rollup row (or those from `since` on) from order history."""
+    orders = Order.objects.all()
+    lines = OrderItem.objects.all()
+    rollups = DailySalesRollup.objects.all()
+    if since:
+        orders = orders.filter(created_at__date__gte=since)
+        lines = lines.filter(order__created_at__date__gte=since)
+        rollups = rollups.filter(date__gte=since)
+
+    days = defaultdict(lambda: {'order_count': 0, 'revenue': Decimal('0'), 'items_sold': 0, 'category_revenue': {}})
+
+    order_counts = orders.annotate(day=TruncDate('created_at')).values('day').annotate(
+        order_count=Count('id'),
+    ).order_by()
+    for row in order_counts:
+        days[row['day']]['order_count'] = row['order_count']
+
+    item_sales = []
+    line_totals = lines.annotate(day=TruncDate('order__created_at')).values(
+        'day', 'menu_item_id', 'menu_item__category',
+    ).annotate(items=Sum('quantity'), amount=Sum(line_value())).order_by()
+    for row in line_totals:
+        day = days[row['day']]
+        day['items_sold'] += row['items'] or 0
+        day['revenue'] += row['amount'] or 0
+        if row['amount']:
+            category = row['menu_item__category']
+            day['category_revenue'][category] = str(Decimal(day['category_revenue'].get(category, '0')) + row['amount'])
+        if row['items']:
+            item_sales.append(DailyItemSales(
+                date=row['day'], menu_item_id=row['menu_item_id'], quantity=row['items'], revenue=row['amount'] or 0,
+            ))
+
+    with transaction.atomic():
+        rollups.delete()
+        DailySalesRollup.objects.bulk_create(
+            (DailySalesRollup(date=day, **values) for day, values in days.items()),
+            batch_size=1000,
+        )
+        item_days = DailyItemSales.objects.all()
+        if since:
+            item_days = item_days.filter(date__gte=since)
+        item_days.delete()
+        DailyItemSales.objects.bulk_create(item_sales, batch_size=1000)
+
+        # The all-time totals are the sum of every day, rebuilt or not
+        ItemSalesTotal.objects.all().delete()
+        ItemSalesTotal.objects.bulk_create(
+            ItemSalesTotal(menu_item_id=row['menu_item_id'], quantity=row['quantity'], revenue=row['revenue'])
+            for row in DailyItemSales.objects.values('menu_item_id').annotate(
+                quantity=Sum('quantity'), revenue=Sum('revenue'),
+            ).order_by()
+        )
+    return len(days)
@@ -0,0 +1,163 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.utils import timezone
+
+# Read replica routing
+# Reporting pages (the dashboards, exports, the leaderboard and occupancy
+# analytics) are marked with @replica_reads and read from the
+# REPLICA_DATABASE alias; everything else, and every write, stays on the
+# primary. Replicas lag behind, so reads go back to the primary when:
+#  - the request is a POST (or another unsafe method), or the client made
+#    one less than REPLICA_STICKY_SECONDS ago, so people see their own
+#    changes (ReplicaRoutingMiddleware keeps a cookie for this);
+#  - the code asks for the primary with primary_reads(), as the menu and
+#    floor snapshots do, since they are cached for every page;
+#  - the replica is more than REPLICA_MAX_LAG_SECONDS behind, going by the
+#    heartbeat row the replica_heartbeat command keeps writing, or cannot
+#    be reached. This is checked at most once per REPLICA_LAG_CHECK_SECONDS
+#    in each process.
+# Without a REPLICA_DATABASE in DATABASES the router does nothing.
+
+STICKY_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_pinned = ContextVar('primary_pinned', default=False)
+# {alias: (checked at, fresh)}
+_lag_checks = {}
+
+
+def replica_alias():
+    alias = getattr(settings, 'REPLICA_DATABASE', None)
+    return alias if alias in settings.DATABASES else None
+
+
+def replica_lag(alias):
+    """Seconds the replica is behind the primary, or None if it cannot tell."""
+    from .models import ReplicaHeartbeat
+
+    beat = ReplicaHeartbeat.objects.using(alias).values_list('beat_at', flat=True).first()
+    return max((timezone.now() - beat).total_seconds(), 0) if beat else None
+
+
+def replica_is_fresh(alias):
+    now = time.monotonic()
+    checked = _lag_checks.get(alias)
+    if checked and now - checked[0] < settings.REPLICA_LAG_CHECK_SECONDS:
+        return checked[1]
+    try:
+        lag = replica_lag(alias)
+    except DatabaseError:
+        lag = None
+    fresh = lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+    _lag_checks[alias] = (now, fresh)
+    return fresh
+
+
+def read_database():
+    """The alias reads go to right now."""
+    alias = replica_alias()
+    if alias is None or not _replica_reads.get() or _pinned.get() or not replica_is_fresh(alias):
+        return DEFAULT_DB_ALIAS
+    return alias
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside this block, e.g. to build a snapshot that is cached for everyone."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def replica_reads(view):
+    """Let a reporting view read from the replica."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+        return markcoroutinefunction(wrapper)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = read_database()
+        return alias if alias != DEFAULT_DB_ALIAS else None
+
+    def db_for_write(self, model, **hints):
+        # Not None: Django would then write an instance back to the database
+        # it was read from, which may be the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication
+        return db != replica_alias()
+
+
+class ReplicaRoutingMiddleware:
+    """Keep a client's reads on the primary for a while after it changes something."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def pinned(self, request):
+        if request.method not in SAFE_METHODS:
+            return True
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _pinned.set(self.pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = _pinned.set(self.pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        if request.method not in SAFE_METHODS and replica_alias():
+            seconds = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + seconds:.3f}', max_age=seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,320 @@
+import functools
+import random
+import time
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import events
+from .conditional import bump_orders_version
+from .models import MenuItem, Order, OrderItem, Table, TableOccupancyEvent
+from .queries import KITCHEN_STATUSES, kitchen_tickets
+from .rollups import apply_sales_delta, line_amount, order_day
+
+# Order mutation service
+# Every change to an order or its lines goes through here. OrderItem.price is
+# the unit price captured from the menu, a line is worth quantity * price, and
+# Order.total_amount is kept equal to the sum of its lines by applying the
+# change in value of the one line that moved, never by re-summing the order.
+#
+# Each mutation is one short transaction that locks the Order row first and
+# then the line it touches. Taking locks in that fixed order serialises
+# concurrent waiters on the same order without deadlocking them, and the
+# remaining conflicts (lock timeouts, deadlocks the database resolves for us,
+# SQLite's busy database) are retried from the top. The kitchen display is
+# told about each change once its transaction commits.
+
+MAX_ATTEMPTS = 20
+BACKOFF_SECONDS = 0.005
+MAX_BACKOFF_SECONDS = 0.2
+
+# MySQL: 1205 lock wait timeout, 1213 deadlock
+_MYSQL_CONFLICT_CODES = {1205, 1213}
+
+
+def _is_conflict(exc):
+    if exc.args and exc.args[0] in _MYSQL_CONFLICT_CODES:
+        return True
+    message = str(exc).lower()
+    return 'deadlock' in message or 'is locked' in message
+
+
+def retry_on_conflict(func):
+    """
+    Run `func` in its own transaction, retrying when it loses a lock conflict.
+
+    Inside an outer transaction a retry cannot start cleanly, so conflicts are
+    left for the caller that owns the transaction.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if connection.in_atomic_block:
+            return func(*args, **kwargs)
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as exc:
+                if attempt == MAX_ATTEMPTS or not _is_conflict(exc):
+                    raise
+                backoff = min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** attempt)
+                time.sleep(random.uniform(0, backoff))
+    return wrapper
+
+
+def _lock_order(order_id):
+    return Order.objects.select_for_update().get(pk=order_id)
+
+
+def _lock_line(line):
+    _lock_order(line.order_id)
+    return OrderItem.objects.select_for_update().select_related('order', 'menu_item').get(pk=line.pk)
+
+
+def _add_to_total(order_id, delta):
+    if delta:
+        Order.objects.filter(pk=order_id).update(total_amount=F('total_amount') + delta, updated_at=timezone.now())
+    # Runs after every line change, bulk ones included, which send no signals
+    transaction.on_commit(functools.partial(bump_orders_version, order_id))
+
+
+def _publish_line(line, removed=False):
+    data = events.line_data(line, line.menu_item)
+    if removed:
+        # Screens drop lines whose quantity reaches zero
+        data['quantity'] = 0
+    events.publish_on_commit(events.LINE_UPDATED, {'order': line.order_id, 'line': data})
+
+
+@retry_on_conflict
+def add_line(order, menu_item, quantity):
+    _lock_order(order.pk)
+    line = OrderItem.objects.create(order=order, menu_item=menu_item, quantity=quantity, price=menu_item.price)
+    _add_to_total(order.pk, line_amount(quantity, line.price))
+    events.publish_on_commit(events.ITEMS_ADDED, {'order': order.pk, 'lines': [events.line_data(line, menu_item)]})
+    return line
+
+
+def _merge_basket(basket):
+    """Validate (menu_item_id, quantity) pairs and merge repeated items."""
+    quantities = defaultdict(int)
+    errors = []
+    for index, (menu_item_id, quantity) in enumerate(basket):
+        try:
+            menu_item_id, quantity = int(menu_item_id), int(quantity)
+        except (TypeError, ValueError):
+            errors.append(f"Line {index + 1}: menu item and quantity must be whole numbers.")
+            continue
+        if quantity < 1:
+            errors.append(f"Line {index + 1}: quantity must be at least 1.")
+            continue
+        quantities[menu_item_id] += quantity
+    if not quantities and not errors:
+        errors.append("The basket is empty.")
+    if errors:
+        raise ValidationError(errors)
+    return quantities
+
+
+@retry_on_conflict
+def add_lines(order, basket):
+    """
+    Add a whole basket of (menu_item_id, quantity) pairs to an order at once.
+
+    Menu items are checked in one query, the lines go in with one bulk insert
+    and the order total moves once. Nothing is written if any line is invalid.
+    """
+    quantities = _merge_basket(basket)
+    menu_items = MenuItem.objects.filter(available=True).in_bulk(list(quantities))
+    missing = sorted(set(quantities) - set(menu_items))
+    if missing:
+        raise ValidationError(
+            [f"Menu item {pk} does not exist or is not available." for pk in missing]
+        )
+
+    order = _lock_order(order.pk)
+    lines = OrderItem.objects.bulk_create(
+        OrderItem(order=order, menu_item=menu_items[pk], quantity=quantity, price=menu_items[pk].price)
+        for pk, quantity in quantities.items()
+    )
+    if any(line.pk is None for line in lines):
+        # MySQL does not return the ids of a bulk insert, and the kitchen
+        # screens need them. The order is locked, so its newest lines are
+        # the ones just inserted.
+        lines = list(OrderItem.objects.filter(order_id=order.pk).order_by('-id')[:len(lines)])[::-1]
+        for line in lines:
+            line.order = order
+            line.menu_item = menu_items[line.menu_item_id]
+
+    # bulk_create skips model signals, so account for the lines here
+    total = 0
+    categories = defaultdict(int)
+    menu_items = {}
+    for line in lines:
+        amount = line_amount(line.quantity, line.price)
+        total += amount
+        categories[line.menu_item.category] += amount
+        menu_items[line.menu_item_id] = (line.quantity, amount)
+    _add_to_total(order.pk, total)
+    apply_sales_delta(
+        order_day(order), revenue=total, items=sum(quantities.values()), categories=categories, menu_items=menu_items,
+    )
+    events.publish_on_commit(events.ITEMS_ADDED, {
+        'order': order.pk,
+        'lines': [events.line_data(line, line.menu_item) for line in lines],
+    })
+    return lines
+
+
+@retry_on_conflict
+def update_line(line, menu_item, quantity):
+    """Point a line at a (possibly different) menu item and set its quantity."""
+    current = _lock_line(line)
+    old_amount = line_amount(current.quantity, current.price)
+    current.menu_item = menu_item
+    current.quantity = quantity
+    current.price = menu_item.price
+    current.save()
+    _add_to_total(current.order_id, line_amount(quantity, current.price) - old_amount)
+    _publish_line(current)
+    return current
+
+
+@retry_on_conflict
+def change_line_quantity(line, delta):
+    """Add `delta` to a line's quantity, removing the line if it drops to zero."""
+    current = _lock_line(line)
+    if current.quantity + delta <= 0:
+        _publish_line(current, removed=True)
+        current.delete()
+        _add_to_total(current.order_id, -line_amount(current.quantity, current.price))
+        return None
+    current.quantity += delta
+    current.save(update_fields=['quantity'])
+    _add_to_total(current.order_id, line_amount(delta, current.price))
+    _publish_line(current)
+    return current
+
+
+@retry_on_conflict
+def remove_line(line):
+    current = _lock_line(line)
+    _publish_line(current, removed=True)
+    current.delete()
+    _add_to_total(current.order_id, -line_amount(current.quantity, current.price))
+
+
+@retry_on_conflict
+def set_order_status(order, status):
+    # Only the status column is written so a concurrent line change to
+    # total_amount is never overwritten with a stale value.
+    current = _lock_order(order.pk)
+    current.status = status
+    current.save(update_fields=['status', 'updated_at'])
+    data = {'order': current.pk, 'status': status}
+    if status in KITCHEN_STATUSES:
+        # A screen that does not show the order yet (it was completed or
+        # cancelled before) adds it from here
+        data['ticket'] = kitchen_tickets(current.pk)[0]
+    events.publish_on_commit(events.STATUS_CHANGED, data)
+    if status == Order.COMPLETED:
+        _bill_if_settled(current)
+    return current
+
+
+# Seating
+# A table goes available -> seated (a customer sits down) -> ordered (an
+# order is placed, possibly several) -> billed (every open order completed)
+# -> available (the table is cleared). Each move locks the table row and is
+# recorded as a TableOccupancyEvent, which the occupancy figures are built
+# from. Saving the table refreshes the cached floor map on commit.
+
+SEATING_TRANSITIONS = {
+    TableOccupancyEvent.SEAT: ({Table.AVAILABLE}, Table.SEATED),
+    TableOccupancyEvent.ORDER: ({Table.SEATED, Table.ORDERED, Table.BILLED}, Table.ORDERED),
+    TableOccupancyEvent.BILL: ({Table.ORDERED}, Table.BILLED),
+    TableOccupancyEvent.CLEAR: ({Table.SEATED, Table.ORDERED, Table.BILLED}, Table.AVAILABLE),
+}
+
+
+def _lock_table(table_id):
+    return Table.objects.select_for_update().get(pk=table_id)
+
+
+def _move_table(table, kind, customer=None, order=None):
+    allowed, target = SEATING_TRANSITIONS[kind]
+    if table.state not in allowed:
+        raise ValidationError(f"Table {table.number} is {table.get_state_display().lower()}; it cannot be given a {kind}.")
+    if kind == TableOccupancyEvent.SEAT:
+        if customer is None:
+            raise ValidationError("A customer is needed to seat a table.")
+        table.customer = customer
+    event = TableOccupancyEvent(
+        table=table, kind=kind, from_state=table.state, to_state=target,
+        customer_id=table.customer_id, order=order,
+    )
+    if kind == TableOccupancyEvent.CLEAR:
+        table.customer = None
+    table.state = target
+    table.state_changed_at = timezone.now()
+    table.save(update_fields=['customer', 'state', 'state_changed_at'])
+    event.save()
+    return table
+
+
+@retry_on_conflict
+def move_table(table, kind, customer=None, order=None):
+    """Apply one seating transition, raising ValidationError if the table's state does not allow it."""
+    return _move_table(_lock_table(table.pk), kind, customer=customer, order=order)
+
+
+@retry_on_conflict
+def assign_customer(table, customer):
+    """Seat `customer` at the table, or clear it when `customer` is None."""
+    current = _lock_table(table.pk)
+    if current.customer_id == (customer.pk if customer else None):
+        return current
+    if current.state != Table.AVAILABLE:
+        _move_table(current, TableOccupancyEvent.CLEAR)
+    if customer is not None:
+        _move_table(current, TableOccupancyEvent.SEAT, customer=customer)
+    return current
+
+
+@retry_on_conflict
+def open_order(table, status=Order.PENDING):
+    """Place a new order for the customer seated at `table`."""
+    current = _lock_table(table.pk)
+    if current.customer_id is None:
+        raise ValidationError("This table does not have a customer assigned.")
+    order = Order.objects.create(table=current, customer_id=current.customer_id, status=status)
+    _move_table(current, TableOccupancyEvent.ORDER, order=order)
+    events.publish_on_commit(events.ORDER_CREATED, {
+        'order': order.id,
+        'table': current.number,
+        'status': order.status,
+        'created_at': order.created_at.isoformat(),
+        'lines': [],
+    })
+    return order
+
+
+def _bill_if_settled(order):
+    """Bill the order's table once none of its orders are still open."""
+    table = _lock_table(order.table_id)
+    if table.state != Table.ORDERED:
+        return
+    still_open = Order.objects.filter(
+        table_id=table.pk, status__in=[Order.PENDING, Order.IN_PROGRESS],
+    ).exclude(pk=order.pk)
+    # Only this party's orders count, not ones left open by earlier guests
+    seated_at = table.occupancy_events.filter(kind=TableOccupancyEvent.SEAT).order_by('-created_at').values_list(
+        'created_at', flat=True,
+    ).first()
+    if seated_at:
+        still_open = still_open.filter(created_at__gte=seated_at)
+    if not still_open.exists():
+        _move_table(table, TableOccupancyEvent.BILL, order=order)
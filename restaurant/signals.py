@@ -0,0 +1,148 @@
+import threading
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import events
+from .catalog import bump_menu_version
+from .conditional import bump_orders_version
+from .floor import bump_floor_version
+from .models import Customer, MenuItem, Order, OrderItem, Table
+from .queries import KITCHEN_STATUSES
+from .rollups import apply_sales_delta, line_amount, line_value, order_day
+
+# Orders whose lines are being removed by a cascade delete. Their lines are
+# taken out of the rollup in one grouped query instead of line by line.
+_deleting = threading.local()
+
+
+def _deleting_orders():
+    if not hasattr(_deleting, 'ids'):
+        _deleting.ids = set()
+    return _deleting.ids
+
+
+# Remember the values each line was loaded with so saves can be turned into
+# deltas without re-reading the row.
+@receiver(post_init, sender=OrderItem)
+def remember_line(sender, instance, **kwargs):
+    instance._rollup_line = (
+        instance.__dict__.get('menu_item_id'),
+        instance.__dict__.get('quantity'),
+        instance.__dict__.get('price'),
+    )
+
+
+# Revenue is tracked from order lines (quantity * unit price), which is what
+# Order.total_amount adds up to, so orders themselves only move the count.
+@receiver(post_save, sender=Order)
+def rollup_order_saved(sender, instance, created, **kwargs):
+    if created:
+        apply_sales_delta(order_day(instance), orders=1)
+
+
+@receiver(pre_delete, sender=Order)
+def rollup_order_deleting(sender, instance, **kwargs):
+    totals = instance.orderitem_set.values('menu_item_id', 'menu_item__category').annotate(
+        items=Sum('quantity'), amount=Sum(line_value()),
+    ).order_by()
+    items = 0
+    revenue = 0
+    categories = defaultdict(int)
+    menu_items = {}
+    for row in totals:
+        items += row['items'] or 0
+        revenue += row['amount'] or 0
+        categories[row['menu_item__category']] -= row['amount'] or 0
+        menu_items[row['menu_item_id']] = (-(row['items'] or 0), -(row['amount'] or 0))
+    apply_sales_delta(
+        order_day(instance), revenue=-revenue, items=-items, categories=categories, menu_items=menu_items,
+    )
+    _deleting_orders().add(instance.pk)
+
+
+@receiver(post_delete, sender=Order)
+def rollup_order_deleted(sender, instance, **kwargs):
+    _deleting_orders().discard(instance.pk)
+    apply_sales_delta(order_day(instance), orders=-1)
+
+
+@receiver(post_save, sender=OrderItem)
+def rollup_line_saved(sender, instance, created, **kwargs):
+    old_menu_item_id, old_quantity, old_price = instance._rollup_line
+    amount = line_amount(instance.quantity, instance.price)
+    categories = defaultdict(int)
+    categories[instance.menu_item.category] += amount
+    menu_items = defaultdict(lambda: (0, 0))
+    menu_items[instance.menu_item_id] = (instance.quantity, amount)
+    items = instance.quantity
+    if not created and old_quantity is not None:
+        old_category = (
+            instance.menu_item.category if old_menu_item_id == instance.menu_item_id
+            else MenuItem.objects.values_list('category', flat=True).get(pk=old_menu_item_id)
+        )
+        old_amount = line_amount(old_quantity, old_price)
+        categories[old_category] -= old_amount
+        quantity, revenue = menu_items[old_menu_item_id]
+        menu_items[old_menu_item_id] = (quantity - old_quantity, revenue - old_amount)
+        items -= old_quantity
+    apply_sales_delta(
+        order_day(instance.order), revenue=sum(categories.values()), items=items, categories=categories,
+        menu_items=menu_items,
+    )
+    instance._rollup_line = (instance.menu_item_id, instance.quantity, instance.price)
+
+
+@receiver(post_delete, sender=OrderItem)
+def rollup_line_deleted(sender, instance, **kwargs):
+    if instance.order_id in _deleting_orders():
+        return
+    amount = line_amount(instance.quantity, instance.price)
+    apply_sales_delta(
+        order_day(instance.order),
+        revenue=-amount,
+        items=-instance.quantity,
+        categories={instance.menu_item.category: -amount},
+        menu_items={instance.menu_item_id: (-instance.quantity, -amount)},
+    )
+
+
+# Any change to the menu invalidates the cached catalog once it commits
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def invalidate_menu_catalog(sender, **kwargs):
+    transaction.on_commit(bump_menu_version)
+
+
+# The floor map shows tables with their customer's name
+@receiver(post_save, sender=Table)
+@receiver(post_delete, sender=Table)
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_floor_map(sender, **kwargs):
+    transaction.on_commit(bump_floor_version)
+
+
+# Conditional GETs of the orders pages compare against the orders version
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order(sender, instance, **kwargs):
+    transaction.on_commit(partial(bump_orders_version, instance.pk))
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_order_lines(sender, instance, **kwargs):
+    transaction.on_commit(partial(bump_orders_version, instance.order_id))
+
+
+# A deleted order leaves the kitchen screens however it was deleted,
+# including with its table
+@receiver(post_delete, sender=Order)
+def publish_order_removed(sender, instance, **kwargs):
+    if instance.status in KITCHEN_STATUSES:
+        events.publish_on_commit(events.ORDER_REMOVED, {'order': instance.pk})
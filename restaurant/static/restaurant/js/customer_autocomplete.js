@@ -0,0 +1,115 @@
+// Customer typeahead for forms.CustomerAutocomplete: looks customers up
+// through the search API as the user types and keeps the chosen id in the
+// hidden input next to the text box.
+(function () {
+    var DELAY = 150;
+
+    function setUp(root) {
+        var hidden = root.querySelector('[data-customer-id]');
+        var input = root.querySelector('input[type="text"]');
+        var list = root.querySelector('ul');
+        var option = root.querySelector('template').content.firstElementChild;
+        var activeClass = list.dataset.activeClass;
+        var timer = null;
+        var pending = null;
+        var results = [];
+        var active = -1;
+
+        function close() {
+            list.classList.add('hidden');
+            input.setAttribute('aria-expanded', 'false');
+            active = -1;
+        }
+
+        function label(customer) {
+            return customer.phone ? customer.name + ' (' + customer.phone + ')' : customer.name;
+        }
+
+        function choose(customer) {
+            hidden.value = customer.id;
+            input.value = label(customer);
+            close();
+        }
+
+        function highlight(index) {
+            Array.prototype.forEach.call(list.children, function (item, i) {
+                item.classList.toggle(activeClass, i === index);
+            });
+            active = index;
+        }
+
+        function show(customers) {
+            results = customers;
+            list.replaceChildren();
+            customers.forEach(function (customer) {
+                var item = option.cloneNode(true);
+                item.textContent = label(customer);
+                // mousedown, so it runs before the text box loses focus
+                item.addEventListener('mousedown', function (event) {
+                    event.preventDefault();
+                    choose(customer);
+                });
+                list.appendChild(item);
+            });
+            if (customers.length) {
+                list.classList.remove('hidden');
+                input.setAttribute('aria-expanded', 'true');
+                highlight(-1);
+            } else {
+                close();
+            }
+        }
+
+        function search(query) {
+            if (pending) {
+                pending.abort();
+            }
+            pending = new AbortController();
+            var url = root.dataset.searchUrl + '?fields=id,name,phone&q=' + encodeURIComponent(query);
+            fetch(url, {signal: pending.signal, headers: {Accept: 'application/json'}})
+                .then(function (response) { return response.ok ? response.json() : {results: []}; })
+                .then(function (data) { show(data.results); })
+                .catch(function (error) {
+                    if (error.name !== 'AbortError') {
+                        close();
+                    }
+                });
+        }
+
+        input.addEventListener('input', function () {
+            // Typing again drops the customer chosen before
+            hidden.value = '';
+            clearTimeout(timer);
+            var query = input.value.trim();
+            if (!query) {
+                close();
+                return;
+            }
+            timer = setTimeout(function () { search(query); }, DELAY);
+        });
+
+        input.addEventListener('keydown', function (event) {
+            if (list.classList.contains('hidden')) {
+                return;
+            }
+            if (event.key === 'ArrowDown') {
+                event.preventDefault();
+                highlight(Math.min(active + 1, results.length - 1));
+            } else if (event.key === 'ArrowUp') {
+                event.preventDefault();
+                highlight(Math.max(active - 1, 0));
+            } else if (event.key === 'Enter' && active >= 0) {
+                event.preventDefault();
+                choose(results[active]);
+            } else if (event.key === 'Escape') {
+                close();
+            }
+        });
+
+        input.addEventListener('blur', close);
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('[data-customer-autocomplete]').forEach(setUp);
+    });
+})();
@@ -0,0 +1,128 @@
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Static assets
+# The stylesheet is built from the templates by Tailwind and the JS, fonts
+# and icon CSS are vendored into restaurant/static/restaurant/vendor by
+# `python manage.py build_assets`, so pages load nothing from a CDN once
+# that output is there (without it base.html uses the CDNs; see
+# templatetags/assets.py).
+# collectstatic then stores every file under a name with its content hash
+# (ManifestStaticFilesStorage) and writes a .gz, and with the brotli package
+# installed a .br, next to each hashed text file. serve() sends those
+# hashed files with a year-long immutable Cache-Control, choosing the
+# precompressed copy the client accepts; a web server in front can serve
+# STATIC_ROOT the same way (e.g. nginx gzip_static and brotli_static).
+
+COMPRESSIBLE = re.compile(r'\.(css|js|mjs|map|svg|json|txt|html|xml|ttf|eot|otf)$')
+# Smaller files gain nothing from compression once the headers are counted
+MIN_COMPRESS_SIZE = 256
+
+# A hashed name never changes content, so it may be cached for good
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+# Anything else (an unhashed name, in case one is linked directly)
+DEFAULT_MAX_AGE = 60 * 5
+
+# Preferred first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def _compress(content):
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content, quality=11)
+    return variants
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes .gz/.br copies of each hashed text file."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if not COMPRESSIBLE.search(name):
+                continue
+            with self.open(name) as original:
+                content = original.read()
+            if len(content) < MIN_COMPRESS_SIZE:
+                continue
+            for suffix, compressed in _compress(content).items():
+                # Only keep a variant that is worth sending
+                if len(compressed) < len(content):
+                    if self.exists(name + suffix):
+                        self.delete(name + suffix)
+                    self._save(name + suffix, ContentFile(compressed))
+
+
+def hashed_names():
+    """The names collectstatic stored files under, from the manifest."""
+    return set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+def accepted_encodings(request):
+    header = request.headers.get('Accept-Encoding', '')
+    accepted = set()
+    for part in header.split(','):
+        coding, *params = [param.strip() for param in part.split(';')]
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+@require_safe
+def serve(request, path):
+    """Serve a file from STATIC_ROOT, precompressed when possible."""
+    if not settings.STATIC_ROOT:
+        raise Http404("STATIC_ROOT is not set.")
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404(path)
+    if not os.path.isfile(fullpath):
+        raise Http404(path)
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    sent, content_encoding = fullpath, encoding
+    accepted = accepted_encodings(request)
+    for coding, suffix in ENCODINGS:
+        if coding in accepted and os.path.isfile(fullpath + suffix):
+            sent, content_encoding = fullpath + suffix, coding
+            break
+
+    response = FileResponse(
+        open(sent, 'rb'), content_type=content_type or 'application/octet-stream', filename=os.path.basename(fullpath),
+    )
+    if content_encoding:
+        response.headers['Content-Encoding'] = content_encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Last-Modified'] = http_date(os.stat(fullpath).st_mtime)
+    if path in hashed_names():
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = f'public, max-age={DEFAULT_MAX_AGE}'
+    return response
@@ -0,0 +1,15 @@
+from django import template
+from django.conf import settings
+
+# Front-end assets
+# base.html and the dashboard load Tailwind, Alpine, Font Awesome and
+# Chart.js from restaurant/static once `python manage.py build_assets` has
+# put them there, and from their CDNs (at the versions package.json pins)
+# without them; see SELF_HOSTED_ASSETS in settings.py.
+
+register = template.Library()
+
+
+@register.simple_tag
+def self_hosted_assets():
+    return settings.SELF_HOSTED_ASSETS
@@ -1,3 +1,1846 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gc
+import gzip
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import connection, connections
+from django.db.models import F, Sum
+from django.http import Http404, HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Customer, Table, MenuItem, Order, OrderItem, Employee, DailySalesRollup, DailyItemSales, ItemSalesTotal,
+    TableOccupancyEvent, ReplicaHeartbeat, ContentVersion,
+)
+from .catalog import get_menu_catalog
+from .customer_search import asearch_customers, search_customers
+from .db.pool import ConnectionPool, PoolTimeout
+from .db.sqlite3.base import DatabaseWrapper as PooledSQLiteWrapper
+from .forms import OrderItemForm
+from .instrumentation import metrics
+from .events import LocalBroker, get_broker
+from .imports import import_records
+from .rollups import leaderboard
+from . import routers
+from . import occupancy
+from .queries import start_of_day
+from . import async_views, checks, instrumentation, staticfiles, views
+from .floor import get_floor_map, get_floor_version
+from .services import add_line, add_lines, update_line, change_line_quantity, remove_line, set_order_status, move_table
+
+
+def clear_caches():
+    # Versions are rolled back with each test while the snapshots built for
+    # them stay in this process, so move every version somewhere new
+    cache.clear()
+    ContentVersion.objects.update(version=time.time_ns())
+
+
+class OrdersListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = Customer.objects.create(name='Alice', email='alice@example.com', phone='100')
+        cls.bob = Customer.objects.create(name='Bob', email='bob@example.com', phone='200')
+        cls.table1 = Table.objects.create(number=1, capacity=4)
+        cls.table2 = Table.objects.create(number=2, capacity=2)
+
+        now = timezone.now()
+        orders = []
+        for i in range(120):
+            orders.append(Order(
+                table=cls.table1 if i % 2 else cls.table2,
+                customer=cls.alice if i % 3 else cls.bob,
+                status=Order.COMPLETED if i % 4 else Order.PENDING,
+            ))
+        Order.objects.bulk_create(orders)
+        # created_at is auto_now_add, so spread the history out afterwards
+        for i, order in enumerate(Order.objects.order_by('id')):
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(hours=i))
+
+    def test_pages_walk_whole_history_without_overlap(self):
+        seen = []
+        url = reverse('orders')
+        params = {}
+        while True:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(order.id for order in response.context['orders'])
+            if not response.context['next_cursor']:
+                break
+            params = {'cursor': response.context['next_cursor']}
+        self.assertEqual(len(seen), 120)
+        self.assertEqual(len(set(seen)), 120)
+        self.assertEqual(len(response.context['orders']), 120 % 50)
+
+    def test_filters_are_applied_in_the_database(self):
+        response = self.client.get(reverse('orders'), {'status': Order.PENDING, 'table': 2})
+        orders = response.context['orders']
+        self.assertTrue(orders)
+        self.assertTrue(all(o.status == Order.PENDING and o.table_id == self.table2.id for o in orders))
+
+    def test_search_matches_customer_name_or_order_id(self):
+        response = self.client.get(reverse('orders'), {'q': 'bob'})
+        self.assertTrue(all(o.customer_id == self.bob.id for o in response.context['orders']))
+
+        order = Order.objects.first()
+        response = self.client.get(reverse('orders'), {'q': f'#{order.id}'})
+        self.assertIn(order.id, [o.id for o in response.context['orders']])
+
+    def test_date_range_filter(self):
+        today = timezone.localdate()
+        response = self.client.get(reverse('orders'), {'date_from': today.isoformat(), 'date_to': today.isoformat()})
+        self.assertTrue(all(timezone.localdate(o.created_at) == today for o in response.context['orders']))
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('orders'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['orders']), 50)
+
+
+class QueryCountMixin:
+    """
+    Every list/detail page must render in a fixed number of queries.
+
+    Subclasses seed ROWS customers, tables, menu items, orders and order
+    lines and assert the same query budget at each size.
+    """
+    ROWS = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        n = cls.ROWS
+        Customer.objects.bulk_create(
+            Customer(name=f'Customer {i}', email=f'c{i}@example.com', phone=f'{i:010d}') for i in range(n)
+        )
+        customers = list(Customer.objects.order_by('id'))
+        Table.objects.bulk_create(
+            Table(number=i, capacity=4, occupied=True, customer=customers[i]) for i in range(n)
+        )
+        tables = list(Table.objects.order_by('id'))
+        MenuItem.objects.bulk_create(
+            MenuItem(name=f'Dish {i}', description='', price=Decimal('10.00'), category='Mains') for i in range(n)
+        )
+        menu_items = list(MenuItem.objects.order_by('id'))
+        Order.objects.bulk_create(
+            Order(table=tables[i], customer=customers[i], total_amount=Decimal('10.00')) for i in range(n)
+        )
+        cls.order = Order.objects.order_by('id').first()
+        OrderItem.objects.bulk_create(
+            OrderItem(order=cls.order, menu_item=menu_items[i], quantity=1, price=Decimal('10.00')) for i in range(n)
+        )
+
+    def setUp(self):
+        clear_caches()
+
+    def assertPageQueries(self, num, url):
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    # Besides the page's own queries, one primary-key lookup for each version
+    # it depends on: orders, order, menu or floor (see versions.py)
+
+    def test_orders(self):
+        self.assertPageQueries(3, reverse('orders'))
+
+    def test_order_detail(self):
+        self.assertPageQueries(4, reverse('order_detail', args=[self.order.id]))
+
+    def test_tables(self):
+        self.assertPageQueries(2, reverse('tables'))
+
+    def test_select_table(self):
+        self.assertPageQueries(2, reverse('select_table_for_order'))
+
+    def test_customers(self):
+        self.assertPageQueries(1, reverse('customers'))
+
+    def test_menu(self):
+        self.assertPageQueries(2, reverse('menu'))
+        # served from the menu catalog once it is warm
+        self.assertPageQueries(1, reverse('menu'))
+
+    def test_add_items_to_order(self):
+        self.client.get(reverse('menu'))
+        self.assertPageQueries(2, reverse('add_items_to_order', args=[self.order.id]))
+
+    def test_employees(self):
+        self.assertPageQueries(1, reverse('employees'))
+
+    def test_dashboard(self):
+        self.assertPageQueries(8, reverse('dashboard'))
+
+
+class QueryCount10Tests(QueryCountMixin, TestCase):
+    ROWS = 10
+
+
+# Rendering thousands of rows is over the request budget by design here
+@override_settings(PERF_REQUEST_BUDGET_MS=60000)
+class QueryCount1000Tests(QueryCountMixin, TestCase):
+    ROWS = 1000
+
+
+@override_settings(PERF_REQUEST_BUDGET_MS=60000)
+class QueryCount10000Tests(QueryCountMixin, TestCase):
+    ROWS = 10000
+
+
+class DailySalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name='Alice', email='alice@example.com', phone='100')
+        cls.table = Table.objects.create(number=1, capacity=4, customer=cls.customer)
+        cls.soup = MenuItem.objects.create(name='Soup', description='', price=Decimal('5.00'), category='Starters')
+        cls.steak = MenuItem.objects.create(name='Steak', description='', price=Decimal('20.00'), category='Mains')
+
+    def rollup(self):
+        return DailySalesRollup.objects.get(date=timezone.localdate())
+
+    def place_order(self):
+        order = Order.objects.create(table=self.table, customer=self.customer)
+        OrderItem.objects.create(order=order, menu_item=self.soup, quantity=2, price=self.soup.price)
+        OrderItem.objects.create(order=order, menu_item=self.steak, quantity=1, price=self.steak.price)
+        order.total_amount = Decimal('30.00')
+        order.save()
+        return order
+
+    def test_rollup_follows_order_changes(self):
+        order = self.place_order()
+        rollup = self.rollup()
+        self.assertEqual(rollup.order_count, 1)
+        self.assertEqual(rollup.revenue, Decimal('30.00'))
+        self.assertEqual(rollup.items_sold, 3)
+        self.assertEqual(rollup.category_revenue, {'Starters': '10.00', 'Mains': '20.00'})
+
+        line = order.orderitem_set.get(menu_item=self.soup)
+        line.menu_item = self.steak
+        line.price = self.steak.price
+        line.save()
+        self.assertEqual(self.rollup().category_revenue, {'Mains': '60.00'})
+
+        order.delete()
+        rollup = self.rollup()
+        self.assertEqual((rollup.order_count, rollup.revenue, rollup.items_sold), (0, 0, 0))
+        self.assertEqual(rollup.category_revenue, {})
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self.place_order()
+        self.place_order()
+        incremental = self.rollup()
+        call_command('rebuild_sales_rollup', stdout=StringIO())
+        rebuilt = self.rollup()
+        self.assertEqual(
+            (rebuilt.order_count, rebuilt.revenue, rebuilt.items_sold),
+            (incremental.order_count, incremental.revenue, incremental.items_sold),
+        )
+        self.assertEqual(
+            {k: Decimal(v) for k, v in rebuilt.category_revenue.items()},
+            {k: Decimal(v) for k, v in incremental.category_revenue.items()},
+        )
+
+    def test_dashboard_weekly_chart_reads_rollup(self):
+        self.place_order()
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(sum(response.context['weekly_sales']), 30.0)
+        self.assertEqual(response.context['total_orders'], 1)
+
+
+
+class LeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(name='Alice', email='alice@example.com', phone='100')
+        cls.table = Table.objects.create(number=1, capacity=4, customer=customer)
+        cls.soup = MenuItem.objects.create(name='Soup', description='', price=Decimal('5.00'), category='Starters')
+        cls.steak = MenuItem.objects.create(name='Steak', description='', price=Decimal('20.00'), category='Mains')
+
+    def standings(self, window='7d', order_by='quantity'):
+        return [(row['menu_item__name'], row['quantity'], row['revenue']) for row in leaderboard(window, order_by)]
+
+    def test_counts_quantity_not_lines(self):
+        order = Order.objects.create(table=self.table)
+        add_line(order, self.soup, 3)
+        add_line(order, self.steak, 1)
+        self.assertEqual(self.standings(), [('Soup', 3, Decimal('15.00')), ('Steak', 1, Decimal('20.00'))])
+        self.assertEqual(self.standings('all', 'revenue')[0][0], 'Steak')
+
+    def test_follows_line_changes_and_deletes(self):
+        order = Order.objects.create(table=self.table)
+        line = add_line(order, self.soup, 2)
+        update_line(line, self.steak, 1)
+        self.assertEqual(self.standings('today'), [('Steak', 1, Decimal('20.00'))])
+        self.client.post(reverse('add_order_lines', args=[order.pk]),
+                         json.dumps({'items': [{'menu_item_id': self.soup.pk, 'quantity': 4}]}),
+                         content_type='application/json')
+        self.assertEqual(self.standings('30d')[0], ('Soup', 4, Decimal('20.00')))
+        order.delete()
+        self.assertEqual(self.standings('all'), [])
+
+    def test_windows_exclude_older_days(self):
+        DailyItemSales.objects.create(
+            date=timezone.localdate() - timedelta(days=10), menu_item=self.soup, quantity=5, revenue=Decimal('25'),
+        )
+        ItemSalesTotal.objects.create(menu_item=self.soup, quantity=5, revenue=Decimal('25'))
+        self.assertEqual(self.standings('7d'), [])
+        self.assertEqual(self.standings('30d'), [('Soup', 5, Decimal('25.00'))])
+        self.assertEqual(self.standings('all'), [('Soup', 5, Decimal('25.00'))])
+
+    def test_rebuild_matches_incremental(self):
+        for quantity in (1, 2):
+            order = Order.objects.create(table=self.table)
+            add_line(order, self.soup, quantity)
+            add_line(order, self.steak, 1)
+        incremental = {window: self.standings(window) for window in ('today', 'all')}
+        call_command('rebuild_sales_rollup', stdout=StringIO())
+        self.assertEqual({window: self.standings(window) for window in ('today', 'all')}, incremental)
+
+    def test_api(self):
+        add_line(Order.objects.create(table=self.table), self.steak, 2)
+        response = self.client.get(reverse('leaderboard_api'), {'window': 'all', 'limit': 1})
+        self.assertEqual(response.json(), {'window': 'all', 'order_by': 'quantity', 'items': [
+            {'menu_item_id': self.steak.pk, 'name': 'Steak', 'category': 'Mains', 'quantity': 2, 'revenue': '40.00'},
+        ]})
+        response = self.client.get(reverse('leaderboard_api'), {'window': 'year', 'limit': 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()['errors']), 2)
+
+    def test_top_n_is_one_query(self):
+        with self.assertNumQueries(1):
+            list(leaderboard('30d', 'revenue', 5))
+
+class OrderLineServiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name='Alice', email='alice@example.com', phone='100')
+        cls.table = Table.objects.create(number=1, capacity=4, customer=cls.customer)
+        cls.soup = MenuItem.objects.create(name='Soup', description='', price=Decimal('5.00'), category='Starters')
+        cls.steak = MenuItem.objects.create(name='Steak', description='', price=Decimal('20.00'), category='Mains')
+
+    def setUp(self):
+        clear_caches()
+        self.order = Order.objects.create(table=self.table, customer=self.customer)
+
+    def total(self):
+        self.order.refresh_from_db()
+        return self.order.total_amount
+
+    def test_line_changes_keep_total_equal_to_sum_of_lines(self):
+        soup = add_line(self.order, self.soup, 2)
+        steak = add_line(self.order, self.steak, 1)
+        self.assertEqual(self.total(), Decimal('30.00'))
+
+        change_line_quantity(soup, 1)
+        self.assertEqual(self.total(), Decimal('35.00'))
+        soup.refresh_from_db()
+        # price stays the unit price no matter the quantity
+        self.assertEqual((soup.quantity, soup.price), (3, Decimal('5.00')))
+
+        update_line(steak, self.soup, 4)
+        self.assertEqual(self.total(), Decimal('35.00'))
+
+        self.assertIsNone(change_line_quantity(steak, -4))
+        self.assertEqual(self.total(), Decimal('15.00'))
+
+        remove_line(soup)
+        self.assertEqual(self.total(), Decimal('0.00'))
+        self.assertEqual(DailySalesRollup.objects.get(date=timezone.localdate()).revenue, 0)
+
+    def test_quantity_views_use_unit_prices(self):
+        line = add_line(self.order, self.steak, 1)
+        self.client.get(reverse('increase_item_quantity', args=[self.order.id, line.id]))
+        self.client.get(reverse('increase_item_quantity', args=[self.order.id, line.id]))
+        self.assertEqual(self.total(), Decimal('60.00'))
+        self.client.get(reverse('decrease_item_quantity', args=[self.order.id, line.id]))
+        self.assertEqual(self.total(), Decimal('40.00'))
+        self.client.post(reverse('update_order_item', args=[line.id]), {'menu_item': self.soup.id, 'quantity': 3})
+        self.assertEqual(self.total(), Decimal('15.00'))
+        self.client.get(reverse('delete_order_item', args=[line.id]))
+        self.assertEqual(self.total(), Decimal('0.00'))
+
+    def test_line_change_cost_does_not_grow_with_order_size(self):
+        line = add_line(self.order, self.soup, 1)
+        with CaptureQueriesContext(connection) as small:
+            change_line_quantity(line, 1)
+        for _ in range(50):
+            add_line(self.order, self.steak, 1)
+        with CaptureQueriesContext(connection) as large:
+            change_line_quantity(line, 1)
+        self.assertEqual(len(small), len(large))
+
+
+class ConcurrentOrderMutationTests(TransactionTestCase):
+    """Hammer one order from many threads and check nothing is lost."""
+    WORKERS = 50
+    INCREMENTS = 4
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and (
+            connection.is_in_memory_db() or connection.settings_dict['OPTIONS'].get('transaction_mode') != 'IMMEDIATE'
+        ):
+            self.skipTest("Needs a file-backed SQLite test database in IMMEDIATE transaction mode (see settings.py).")
+        customer = Customer.objects.create(name='Alice', email='alice@example.com', phone='100')
+        table = Table.objects.create(number=1, capacity=4, customer=customer)
+        self.soup = MenuItem.objects.create(name='Soup', description='', price=Decimal('5.00'), category='Starters')
+        self.steak = MenuItem.objects.create(name='Steak', description='', price=Decimal('20.00'), category='Mains')
+        self.order = Order.objects.create(table=table, customer=customer)
+        self.line = add_line(self.order, self.soup, 1)
+
+    def run_workers(self, work):
+        errors = []
+        start = threading.Barrier(self.WORKERS)
+
+        def run(i):
+            try:
+                start.wait()
+                work(i)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(self.WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_concurrent_line_and_status_changes_keep_exact_totals(self):
+        statuses = [Order.PENDING, Order.IN_PROGRESS]
+
+        def work(i):
+            for _ in range(self.INCREMENTS):
+                change_line_quantity(self.line, 1)
+            add_line(self.order, self.steak, 1)
+            set_order_status(self.order, statuses[i % 2])
+
+        self.run_workers(work)
+
+        self.line.refresh_from_db()
+        self.order.refresh_from_db()
+        quantity = 1 + self.WORKERS * self.INCREMENTS
+        self.assertEqual(self.line.quantity, quantity)
+        self.assertEqual(self.order.orderitem_set.filter(menu_item=self.steak).count(), self.WORKERS)
+        self.assertEqual(
+            self.order.total_amount,
+            quantity * self.soup.price + self.WORKERS * self.steak.price,
+        )
+        rollup = DailySalesRollup.objects.get(date=timezone.localdate())
+        self.assertEqual(rollup.revenue, self.order.total_amount)
+        self.assertEqual(rollup.items_sold, quantity + self.WORKERS)
+
+
+class BulkOrderLinesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(name='Alice', email='alice@example.com', phone='100')
+        cls.table = Table.objects.create(number=7, capacity=4, customer=cls.customer)
+        cls.soup = MenuItem.objects.create(name='Soup', description='', price=Decimal('5.00'), category='Starters')
+        cls.steak = MenuItem.objects.create(name='Steak', description='', price=Decimal('20.00'), category='Mains')
+        cls.sold_out = MenuItem.objects.create(
+            name='Lobster', description='', price=Decimal('50.00'), category='Mains', available=False,
+        )
+
+    def setUp(self):
+        self.order = Order.objects.create(table=self.table, customer=self.customer)
+        self.url = reverse('add_order_lines', args=[self.order.id])
+
+    def post_json(self, items):
+        return self.client.post(self.url, json.dumps({'items': items}), content_type='application/json')
+
+    def test_basket_is_added_in_one_request(self):
+        response = self.post_json([
+            {'menu_item_id': self.soup.id, 'quantity': 2},
+            {'menu_item_id': self.steak.id, 'quantity': 1},
+            {'menu_item_id': self.soup.id, 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['total_amount'], '35.00')
+        self.assertEqual(data['table'], 7)
+        self.assertEqual(
+            sorted((line['name'], line['quantity']) for line in data['lines']),
+            [('Soup', 3), ('Steak', 1)],
+        )
+        self.assertEqual(DailySalesRollup.objects.get(date=timezone.localdate()).revenue, Decimal('35.00'))
+
+    def test_form_encoded_basket(self):
+        response = self.client.post(self.url, {'menu_item': [self.soup.id, self.steak.id], 'quantity': [1, 2]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['total_amount'], '45.00')
+
+    def test_invalid_basket_writes_nothing(self):
+        response = self.post_json([
+            {'menu_item_id': self.soup.id, 'quantity': 2},
+            {'menu_item_id': self.sold_out.id, 'quantity': 1},
+            {'menu_item_id': self.steak.id, 'quantity': 0},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()['errors']), 1)
+        self.assertFalse(self.order.orderitem_set.exists())
+
+        response = self.post_json([{'menu_item_id': 999999, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.order.orderitem_set.exists())
+
+    def test_line_ids_are_published_when_the_backend_does_not_return_them(self):
+        broker = get_broker()
+        start = broker.last_id
+        # As on MySQL, where bulk_create leaves the pks unset
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+                self.captureOnCommitCallbacks(execute=True):
+            lines = add_lines(self.order, [(self.soup.id, 2), (self.steak.id, 1)])
+        stored = list(self.order.orderitem_set.order_by('id'))
+        self.assertEqual([line.pk for line in lines], [line.pk for line in stored])
+        events = [event.data for event in broker.history if event.id > start and event.kind == 'items_added']
+        self.assertEqual(events, [{'order': self.order.pk, 'lines': [
+            {'id': stored[0].pk, 'name': 'Soup', 'quantity': 2}, {'id': stored[1].pk, 'name': 'Steak', 'quantity': 1},
+        ]}])
+
+    def test_query_count_does_not_grow_with_basket_size(self):
+        dishes = MenuItem.objects.bulk_create(
+            MenuItem(name=f'Dish {i}', description='', price=Decimal('1.00'), category='Mains') for i in range(12)
+        )
+        with CaptureQueriesContext(connection) as small:
+            self.post_json([{'menu_item_id': self.soup.id, 'quantity': 1}])
+        with CaptureQueriesContext(connection) as large:
+            self.post_json([{'menu_item_id': dish.id, 'quantity': 1} for dish in dishes])
+        self.assertEqual(len(small), len(large))
+
+
+class MenuCatalogTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.soup = MenuItem.objects.create(name='Soup', description='', price=Decimal('5.00'), category='Starters')
+        self.steak = MenuItem.objects.create(name='Steak', description='', price=Decimal('20.00'), category='Mains')
+
+    def test_catalog_groups_available_items_by_category(self):
+        MenuItem.objects.create(name='Lobster', description='', price=Decimal('50.00'), category='Mains', available=False)
+        catalog = get_menu_catalog()
+        self.assertEqual(len(catalog.items), 3)
+        self.assertEqual(
+            [(category, [item.name for item in items]) for category, items in catalog.available_by_category()],
+            [('Mains', ['Steak']), ('Starters', ['Soup'])],
+        )
+        # Only the version is read
+        with self.assertNumQueries(1):
+            self.assertIs(get_menu_catalog(), catalog)
+
+    def test_menu_writes_invalidate_catalog(self):
+        self.assertEqual(len(get_menu_catalog().items), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('add_menu_item'), {
+                'name': 'Cake', 'description': 'Chocolate', 'price': '6.00', 'category': 'Desserts', 'available': 'on',
+            })
+        self.assertIn('Cake', [item.name for item in get_menu_catalog().items])
+
+        cake = MenuItem.objects.get(name='Cake')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('delete_menu_item', args=[cake.id]))
+        self.assertNotIn('Cake', [item.name for item in get_menu_catalog().items])
+
+    def test_order_item_form_validates_against_catalog(self):
+        get_menu_catalog()
+        with self.assertNumQueries(1):
+            self.assertIn('optgroup label="Mains"', str(OrderItemForm()['menu_item']))
+        form = OrderItemForm({'menu_item': self.steak.id, 'quantity': 2})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['menu_item'], self.steak)
+        self.assertFalse(OrderItemForm({'menu_item': 999999, 'quantity': 1}).is_valid())
+
+
+class ExplainQueriesCommandTests(TestCase):
+    def test_reports_on_every_page(self):
+        customer = Customer.objects.create(name='Alice', email='alice@example.com', phone='100')
+        table = Table.objects.create(number=1, capacity=4, customer=customer)
+        soup = MenuItem.objects.create(name='Soup', description='', price=Decimal('5.00'), category='Starters')
+        add_line(Order.objects.create(table=table, customer=customer), soup, 1)
+
+        out = StringIO()
+        call_command('explain_queries', stdout=out, stderr=out)
+        output = out.getvalue()
+        for name in ('dashboard', 'orders', 'order_detail', 'add_items_to_order', 'menu', 'tables'):
+            self.assertIn(f'{name} (', output)
+
+
+class SeedRestaurantCommandTests(TestCase):
+    def seed(self):
+        call_command(
+            'seed_restaurant', customers=50, tables=5, menu_items=20, employees=3, orders=300, days=30,
+            batch_size=100, seed=7, stdout=StringIO(),
+        )
+
+    def test_seeds_consistent_dataset(self):
+        self.seed()
+        self.assertEqual(Order.objects.count(), 300)
+        self.assertEqual(Customer.objects.count(), 50)
+        self.assertTrue(OrderItem.objects.exists())
+        self.assertFalse(Order.objects.filter(created_at__gt=timezone.now()).exists())
+        self.assertGreater(Order.objects.filter(created_at__lt=timezone.now() - timedelta(days=7)).count(), 0)
+
+        order = Order.objects.order_by('?').first()
+        self.assertEqual(order.total_amount, sum(line.quantity * line.price for line in order.orderitem_set.all()))
+        self.assertEqual(
+            DailySalesRollup.objects.aggregate(total=Sum('order_count'))['total'], 300,
+        )
+
+        # Every seated table has the SEAT event that put its party there
+        seated = Table.objects.filter(state=Table.SEATED)
+        self.assertTrue(seated.exists())
+        self.assertEqual(
+            set(TableOccupancyEvent.objects.filter(kind=TableOccupancyEvent.SEAT).values_list('table_id', 'customer_id')),
+            set(seated.values_list('id', 'customer_id')),
+        )
+
+    def test_same_seed_gives_same_data(self):
+        self.seed()
+        first = list(Order.objects.order_by('id').values_list('table_id', 'total_amount'))
+        for model in (OrderItem, Order, Table, Customer, MenuItem, Employee):
+            model.objects.all().delete()
+        self.seed()
+        second = list(Order.objects.order_by('id').values_list('table_id', 'total_amount'))
+        self.assertEqual(first, second)
+
+
+class BenchmarkRoutesCommandTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        call_command(
+            'seed_restaurant', customers=20, tables=4, menu_items=10, employees=2, orders=30, days=5,
+            seed=3, stdout=StringIO(),
+        )
+
+    def run_benchmark(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('benchmark_routes', '--iterations=2', '--warmup=0', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_covers_every_route_and_leaves_data_alone(self):
+        orders = Order.objects.count()
+        lines = OrderItem.objects.count()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.json')
+            out, err = self.run_benchmark(f'--output={path}')
+            with open(path) as fh:
+                report = json.load(fh)
+
+        self.assertNotIn('Not benchmarked', err)
+        self.assertIn('POST add_order_lines', report['routes'])
+        self.assertEqual(report['routes']['GET orders']['status'], 200)
+        self.assertEqual(report['routes']['GET orders']['queries'], 3)
+        self.assertEqual(Order.objects.count(), orders)
+        self.assertEqual(OrderItem.objects.count(), lines)
+
+    def test_compare_flags_extra_queries(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.json')
+            self.run_benchmark('--only=GET orders', f'--output={path}')
+            with open(path) as fh:
+                report = json.load(fh)
+            report['routes']['GET orders']['queries'] = 0
+            with open(path, 'w') as fh:
+                json.dump(report, fh)
+            with self.assertRaisesMessage(CommandError, 'regression'):
+                self.run_benchmark('--only=GET orders', f'--compare={path}')
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        customer = Customer.objects.create(name='Asha', email='asha@example.com', phone='1')
+        table = Table.objects.create(number=1, capacity=4, customer=customer)
+        Order.objects.create(table=table, customer=customer)
+
+    def test_counts_requests_per_route(self):
+        self.client.get(reverse('orders'))
+        self.client.get(reverse('orders'))
+        self.client.force_login(User.objects.create(username='ops', is_staff=True))
+        body = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('restaurant_requests_total{route="orders",method="GET",status="200"} 2', body)
+        self.assertIn('restaurant_db_queries_total{route="orders",method="GET"} 6', body)
+        self.assertIn('restaurant_request_duration_seconds_count{route="orders",method="GET"} 2', body)
+        self.assertIn('restaurant_slow_requests_total{route="orders",method="GET"} 0', body)
+        template_line = next(line for line in body.splitlines() if line.startswith('restaurant_template_render_seconds_total{route="orders"'))
+        self.assertGreater(float(template_line.split()[-1]), 0)
+
+    def test_metrics_are_for_staff_only(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        self.client.force_login(User.objects.create(username='waiter'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        with override_settings(PERF_METRICS_PUBLIC=True):
+            self.client.logout()
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(PERF_ROUTE_BUDGETS_MS={'orders': 0})
+    def test_logs_slow_requests_with_their_sql(self):
+        with self.assertLogs('restaurant.perf', 'WARNING') as logs:
+            self.client.get(reverse('orders'))
+        self.assertIn('Slow request GET /orders/ (orders)', logs.output[0])
+        self.assertIn('restaurant_order', logs.output[0])
+        self.assertIn('at restaurant/queries.py:', logs.output[0])
+
+    @override_settings(PERF_SLOW_QUERIES=2)
+    def test_finds_the_origin_of_the_slowest_queries_only(self):
+        stats = instrumentation.RequestStats()
+        timings = iter([0.0, 0.3, 0.0, 0.1, 0.0, 0.2, 0.0, 0.05])
+        with mock.patch.object(instrumentation.time, 'perf_counter', lambda: next(timings)), \
+                mock.patch.object(instrumentation, '_origin', return_value='here') as origin:
+            for sql in ['a', 'b', 'c', 'd']:
+                stats.record_query(lambda *args: None, sql, None, False, {})
+        self.assertEqual(stats.query_count, 4)
+        # 'd' was faster than both kept queries, so its stack was not walked
+        self.assertEqual(origin.call_count, 3)
+        self.assertEqual([sql for _, sql, _ in stats.slowest_queries()], ['a', 'c'])
+
+    def test_counts_streamed_responses_when_they_close(self):
+        response = self.client.get(reverse('export_orders'))
+        self.assertNotIn(('export_orders', 'GET'), metrics.routes)
+        body = b''.join(response.streaming_content)
+
+        totals = metrics.routes[('export_orders', 'GET')]
+        self.assertEqual(totals['count'], 1)
+        self.assertEqual(totals['bytes'], len(body))
+        # The orders are read while the file streams, after the view returned
+        self.assertGreater(totals['queries'], 0)
+
+    @override_settings(PERF_INSTRUMENTATION=False)
+    def test_disabled(self):
+        self.client.get(reverse('orders'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        self.assertEqual(metrics.routes, {})
+
+
+class KitchenFeedTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(name='Ravi', email='ravi@example.com', phone='1')
+        self.table = Table.objects.create(number=7, capacity=4, customer=customer)
+        self.order = Order.objects.create(table=self.table, customer=customer)
+        self.item = MenuItem.objects.create(name='Dosa', description='', price=Decimal('90'), category='Mains')
+        self.broker = get_broker()
+
+    def published_since(self, last_id):
+        return [(event.kind, event.data) for event in self.broker.history if event.id > last_id]
+
+    def test_services_publish_after_commit(self):
+        start = self.broker.last_id
+        with self.captureOnCommitCallbacks() as callbacks:
+            line = add_line(self.order, self.item, 2)
+            set_order_status(self.order, Order.IN_PROGRESS)
+        self.assertEqual(self.published_since(start), [])
+
+        for callback in callbacks:
+            callback()
+        lines = [{'id': line.pk, 'name': 'Dosa', 'quantity': 2}]
+        self.assertEqual(self.published_since(start), [
+            ('items_added', {'order': self.order.pk, 'lines': lines}),
+            ('status_changed', {'order': self.order.pk, 'status': Order.IN_PROGRESS, 'ticket': {
+                'order': self.order.pk, 'table': 7, 'status': Order.IN_PROGRESS,
+                'created_at': self.order.created_at.isoformat(), 'lines': lines,
+            }}),
+        ])
+
+    def test_reopened_order_is_published_whole(self):
+        add_line(self.order, self.item, 1)
+        set_order_status(self.order, Order.COMPLETED)
+        start = self.broker.last_id
+        with self.captureOnCommitCallbacks(execute=True):
+            set_order_status(self.order, Order.PENDING)
+        [(kind, data)] = self.published_since(start)
+        self.assertEqual(data['ticket']['lines'][0]['name'], 'Dosa')
+        self.assertEqual(data['ticket']['status'], Order.PENDING)
+
+    def test_deleting_a_table_removes_its_open_orders(self):
+        done = Order.objects.create(table=self.table, customer=self.order.customer, status=Order.COMPLETED)
+        start = self.broker.last_id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('delete_table', args=[self.table.pk]))
+        self.assertFalse(Order.objects.filter(pk__in=[self.order.pk, done.pk]).exists())
+        self.assertEqual(self.published_since(start), [('order_removed', {'order': self.order.pk})])
+
+    def test_removed_line_is_published_with_zero_quantity(self):
+        line = add_line(self.order, self.item, 1)
+        start = self.broker.last_id
+        with self.captureOnCommitCallbacks(execute=True):
+            change_line_quantity(line, -1)
+        self.assertEqual(self.published_since(start), [
+            ('line_updated', {'order': self.order.pk, 'line': {'id': line.pk, 'name': 'Dosa', 'quantity': 0}}),
+        ])
+
+    def test_wsgi_falls_back_to_a_snapshot(self):
+        add_line(self.order, self.item, 3)
+        response = self.client.get(reverse('kitchen_feed'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = response.content.decode()
+        self.assertIn('event: snapshot', body)
+        tickets = json.loads(body.split('data: ', 1)[1])
+        self.assertEqual(tickets[0]['order'], self.order.pk)
+        self.assertEqual(tickets[0]['table'], 7)
+        self.assertEqual(tickets[0]['lines'][0]['quantity'], 3)
+
+    async def test_asgi_streams_events(self):
+        response = await self.async_client.get(reverse('kitchen_feed'))
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        self.assertIn(b'event: snapshot', await anext(stream))
+
+        self.broker.publish('status_changed', {'order': self.order.pk, 'status': Order.COMPLETED})
+        chunk = (await anext(stream)).decode()
+        self.assertIn('event: status_changed', chunk)
+        self.assertIn('"Completed"', chunk)
+        # Once the server drops the response, the stream's finally block
+        # takes the screen off the broker.
+        await stream.aclose()
+        del stream, response
+        gc.collect()
+        for _ in range(100):
+            if not self.broker.subscribers:
+                break
+            await asyncio.sleep(0)
+        self.assertEqual(self.broker.subscribers, set())
+
+    async def test_broker_replays_missed_events(self):
+        broker = LocalBroker(history=3)
+        for n in range(5):
+            broker.publish('status_changed', {'n': n})
+
+        subscription, missed = broker.subscribe(last_id=3)
+        self.assertEqual([event.id for event in missed], [4, 5])
+        broker.publish('status_changed', {'n': 5})
+        self.assertEqual((await subscription.get(1)).id, 6)
+
+        # Event 1 is gone from the history, so the screen needs a snapshot
+        self.assertIsNone(broker.subscribe(last_id=1)[1])
+        # An id from before a restart is not trusted either
+        self.assertIsNone(broker.subscribe(last_id=99)[1])
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        metrics.reset()
+        customer = Customer.objects.create(name='Meera', email='meera@example.com', phone='1')
+        table = Table.objects.create(number=3, capacity=2, customer=customer, occupied=True)
+        item = MenuItem.objects.create(name='Idli', description='', price=Decimal('60'), category='Breakfast')
+        self.orders = [Order.objects.create(table=table, customer=customer) for _ in range(3)]
+        add_line(self.orders[0], item, 2)
+        self.factory = RequestFactory()
+
+    def assertSameAsSync(self, name, path, **kwargs):
+        request = self.factory.get(path)
+        expected = getattr(views, name)(request, **kwargs)
+        actual = async_to_sync(getattr(async_views, name))(self.factory.get(path), **kwargs)
+        self.assertEqual(actual.status_code, 200)
+        # Both render the same template from the same data; CSRF tokens are
+        # masked differently on every render
+        csrf = re.compile(r'name="csrfmiddlewaretoken" value="[^"]+"')
+        self.assertEqual(csrf.sub('', actual.content.decode()), csrf.sub('', expected.content.decode()))
+
+    def test_pages_match_sync_views(self):
+        self.assertSameAsSync('dashboard', '/')
+        self.assertSameAsSync('orders', '/orders/?status=Pending')
+        self.assertSameAsSync('menu', '/menu/')
+        self.assertSameAsSync('tables', '/tables/')
+        self.assertSameAsSync('customer_list', '/customers/')
+        self.assertSameAsSync('order_detail', f'/orders/{self.orders[0].pk}/', id=self.orders[0].pk)
+
+    def test_missing_order_is_404(self):
+        with self.assertRaises(Http404):
+            async_to_sync(async_views.order_detail)(self.factory.get('/orders/0/'), id=0)
+
+    async def test_middleware_counts_queries_under_asgi(self):
+        response = await self.async_client.get(reverse('orders'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('restaurant_db_queries_total{route="orders",method="GET"} 3', metrics.render())
+
+
+# The benchmark serves requests from other threads, which only see
+# committed rows.
+class BenchmarkConcurrencyCommandTests(TransactionTestCase):
+    def test_runs_in_process(self):
+        customer = Customer.objects.create(name='Meera', email='meera@example.com', phone='1')
+        table = Table.objects.create(number=3, capacity=2, customer=customer)
+        Order.objects.create(table=table, customer=customer)
+        out = StringIO()
+        call_command('benchmark_concurrency', interface='asgi', requests=12, concurrency=4, json=True, stdout=out)
+        result = json.loads(out.getvalue())['asgi']
+        self.assertEqual(result['requests'], 12)
+        self.assertEqual(result['errors'], 0)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(name='Kiran', email='kiran@example.com', phone='1')
+        table = Table.objects.create(number=4, capacity=4, customer=customer)
+        naan = MenuItem.objects.create(name='Naan', description='', price=Decimal('40'), category='Breads')
+        dal = MenuItem.objects.create(name='Dal', description='', price=Decimal('180'), category='Mains')
+        self.done = Order.objects.create(table=table, customer=customer, status=Order.COMPLETED)
+        add_line(self.done, naan, 3)
+        add_line(self.done, dal, 1)
+        self.empty = Order.objects.create(table=table, customer=customer)
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_orders'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_has_a_row_per_line(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="orders-', response['Content-Disposition'])
+        rows = list(csv.DictReader(body.decode().splitlines()))
+        self.assertEqual([row['order_id'] for row in rows], [str(self.done.pk)] * 2 + [str(self.empty.pk)])
+        self.assertEqual(rows[0]['menu_item'], 'Naan')
+        self.assertEqual(rows[0]['line_total'], '120.00')
+        self.assertEqual(rows[0]['order_total'], '300.00')
+        self.assertEqual(rows[2]['line_id'], '')
+
+    def test_json_nests_lines_and_filters_by_status(self):
+        response, body = self.export(format='json', status=Order.COMPLETED)
+        orders = json.loads(body)
+        self.assertEqual(len(orders), 1)
+        self.assertEqual(orders[0]['total_amount'], '300.00')
+        self.assertEqual([line['name'] for line in orders[0]['lines']], ['Naan', 'Dal'])
+
+    def test_gzip(self):
+        response, body = self.export(gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.csv.gz"'))
+        self.assertTrue(gzip.decompress(body).decode().startswith('order_id,created_at'))
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get(reverse('export_orders'), {'format': 'xml'}).status_code, 400)
+
+    def test_reads_in_batches(self):
+        # Two orders with a batch size of one: each batch is one query for
+        # the orders and one for their lines, then one that comes back empty
+        with self.assertNumQueries(5):
+            out = StringIO()
+            call_command('export_orders', format='json', batch_size=1, stdout=out)
+        self.assertEqual(len(json.loads(out.getvalue())), 2)
+
+
+class ImportRecordsTests(TestCase):
+    def run_import(self, kind, text, **kwargs):
+        return import_records(kind, StringIO(text), **kwargs)
+
+    def test_customers_are_created_and_updated_by_email(self):
+        Customer.objects.create(name='Old Name', email='asha@example.com', phone='100')
+        result = self.run_import('customers', (
+            'name,email,phone\n'
+            'Asha,asha@example.com,100\n'
+            'Ben,ben@example.com,200\n'
+        ))
+        self.assertEqual((result.created, result.updated, result.error_count), (1, 1, 0))
+        self.assertEqual(Customer.objects.get(email='asha@example.com').name, 'Asha')
+        self.assertTrue(Customer.objects.filter(email='ben@example.com').exists())
+
+    def test_row_errors_are_reported_and_skipped(self):
+        Customer.objects.create(name='Asha', email='asha@example.com', phone='100')
+        result = self.run_import('customers', (
+            'name,email,phone\n'
+            'Ben,not-an-email,200\n'
+            'Cara,cara@example.com,100\n'
+            'Dev,dev@example.com,300\n'
+            'Eve,dev@example.com,400\n'
+        ))
+        self.assertEqual((result.created, result.updated, result.error_count), (1, 0, 3))
+        rows = dict(result.errors)
+        self.assertIn('email', rows[2])
+        self.assertIn('belongs to another record', rows[3])
+        self.assertIn('already used on row 4', rows[5])
+        self.assertEqual(Customer.objects.count(), 2)
+
+    def test_uniqueness_is_checked_once_per_batch(self):
+        text = 'name,email,phone\n' + ''.join(f'C{i},c{i}@example.com,{i}\n' for i in range(10))
+        with CaptureQueriesContext(connection) as ctx:
+            result = self.run_import('customers', text, batch_size=5)
+        self.assertEqual(result.created, 10)
+        # Per batch of five: the collision lookup and the insert
+        statements = [query['sql'].split()[0] for query in ctx.captured_queries]
+        self.assertEqual([verb for verb in statements if verb in ('SELECT', 'INSERT')], ['SELECT', 'INSERT'] * 2)
+
+    def test_menu_import_refreshes_catalog(self):
+        MenuItem.objects.create(name='Naan', description='Bread', price=Decimal('40'), category='Breads')
+        get_menu_catalog()
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.run_import('menu', (
+                'name,description,price,category,available\n'
+                'Naan,Bread,45,Breads,yes\n'
+                'Lassi,Yoghurt drink,60,Drinks,0\n'
+            ))
+        self.assertEqual((result.created, result.updated), (1, 1))
+        catalog = get_menu_catalog()
+        self.assertEqual([(item.name, item.price) for item in catalog.available], [('Naan', Decimal('45'))])
+
+    def test_unreadable_rows_stop_the_import(self):
+        too_long = 'x' * (csv.field_size_limit() + 1)
+        result = self.run_import('tables', f'number,capacity\n1,4\n2,{too_long}\n3,2\n')
+        self.assertEqual((result.created, result.error_count), (1, 1))
+        self.assertEqual(result.errors[0][0], 3)
+        self.assertIn('field larger than field limit', result.errors[0][1])
+        self.assertEqual(list(Table.objects.values_list('number', flat=True)), [1])
+
+        with self.assertRaisesMessage(ValueError, 'header row'):
+            self.run_import('tables', f'number,{too_long}\n1,4\n')
+
+    def test_dry_run_saves_nothing(self):
+        result = self.run_import('tables', 'number,capacity\n1,4\n2,2\n', dry_run=True)
+        self.assertEqual(result.created, 2)
+        self.assertFalse(Table.objects.exists())
+
+    def test_missing_columns(self):
+        with self.assertRaises(ValueError):
+            self.run_import('tables', 'number\n1\n')
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as fh:
+            fh.write('number,capacity\n1,4\n2,zero\n')
+        self.addCleanup(os.remove, fh.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_records', 'tables', fh.name, stdout=out, stderr=err)
+        self.assertIn('1 new, 0 updated, 1 with errors', out.getvalue())
+        self.assertIn('row 3: capacity', err.getvalue())
+
+    def test_command_invalidates_the_server_through_the_database(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as fh:
+            fh.write('number,capacity\n1,4\n')
+        self.addCleanup(os.remove, fh.name)
+        before = get_floor_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_records', 'tables', fh.name, stdout=StringIO())
+        # The bump is in the database, where every server process reads it
+        self.assertEqual(ContentVersion.objects.get(key='floor_map').version, before + 1)
+        self.assertEqual([table.number for table in get_floor_map().tables], [1])
+
+    def test_upload_view(self):
+        upload = SimpleUploadedFile('tables.csv', b'number,capacity\n7,6\n')
+        response = self.client.post(reverse('import_data'), {'kind': 'tables', 'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '1 new, 0 updated, 0 with errors')
+        self.assertEqual(Table.objects.get(number=7).capacity, 6)
+
+        upload = SimpleUploadedFile('tables.csv', b'number,' + b'x' * (csv.field_size_limit() + 1) + b'\n7,6\n')
+        response = self.client.post(reverse('import_data'), {'kind': 'tables', 'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'header row cannot be read')
+
+
+class SeatingTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.customer = Customer.objects.create(name='Asha', email='asha@example.com', phone='100')
+        self.table = Table.objects.create(number=5, capacity=4)
+
+    def log(self):
+        return list(TableOccupancyEvent.objects.filter(table=self.table).order_by('id').values_list('kind', 'to_state'))
+
+    def test_full_cycle_is_logged(self):
+        self.client.post(reverse('edit_table', args=[self.table.pk]),
+                         {'number': 5, 'capacity': 4, 'customer': self.customer.pk})
+        self.client.post(reverse('create_order', args=[self.table.pk]), {'status': Order.PENDING})
+        order = Order.objects.get(table=self.table)
+        set_order_status(order, Order.COMPLETED)
+        self.client.post(reverse('change_table_state', args=[self.table.pk, 'clear']))
+
+        self.assertEqual(self.log(), [
+            ('seat', 'seated'), ('order', 'ordered'), ('bill', 'billed'), ('clear', 'available'),
+        ])
+        self.table.refresh_from_db()
+        self.assertEqual((self.table.state, self.table.occupied, self.table.customer), ('available', False, None))
+
+    def test_bill_waits_for_every_open_order(self):
+        move_table(self.table, TableOccupancyEvent.SEAT, customer=self.customer)
+        first = Order.objects.create(table=self.table, customer=self.customer)
+        second = Order.objects.create(table=self.table, customer=self.customer)
+        for order in (first, second):
+            move_table(self.table, TableOccupancyEvent.ORDER, order=order)
+        set_order_status(first, Order.COMPLETED)
+        self.assertEqual(Table.objects.get(pk=self.table.pk).state, Table.ORDERED)
+        set_order_status(second, Order.COMPLETED)
+        self.assertEqual(Table.objects.get(pk=self.table.pk).state, Table.BILLED)
+
+    def test_invalid_transition(self):
+        with self.assertRaises(ValidationError):
+            move_table(self.table, TableOccupancyEvent.BILL)
+        self.assertEqual(self.log(), [])
+
+    def test_floor_map_is_cached_until_a_transition(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Table.objects.create(number=6, capacity=2)
+        get_floor_map()
+        # One lookup of the floor version per page
+        with self.assertNumQueries(2):
+            self.client.get(reverse('tables'))
+            self.client.get(reverse('select_table_for_order'))
+        with self.captureOnCommitCallbacks(execute=True):
+            move_table(self.table, TableOccupancyEvent.SEAT, customer=self.customer)
+        floor = get_floor_map()
+        self.assertEqual((floor.total, floor.occupied, floor.by_state['seated']), (2, 1, 1))
+        self.assertEqual(floor.get(self.table.pk).customer.name, 'Asha')
+
+    def test_dashboard_view_occupancy(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            move_table(self.table, TableOccupancyEvent.SEAT, customer=self.customer)
+        response = self.client.get(reverse('dashboard.view'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['occupied_tables'], 1)
+        # Measured in table-hours, so a table seated a moment ago barely counts
+        self.assertLess(response.context['occupancy_rate'], 1)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        caches['template_fragments'].clear()
+        self.asha = Customer.objects.create(name='Asha', email='asha@example.com', phone='100')
+        self.ben = Customer.objects.create(name='Ben', email='ben@example.com', phone='200')
+
+    def render_rows(self):
+        template = Template(
+            "{% load fragments %}{% cachedfor c in customers 'test_row' c.pk c.updated_at %}[{{ c.name }}]"
+            "{% empty %}none{% endcachedfor %}"
+        )
+        return template.render(Context({'customers': Customer.objects.order_by('pk')}))
+
+    def test_rows_are_rendered_once_per_version(self):
+        self.assertEqual(self.render_rows(), '[Asha][Ben]')
+        # Renamed without touching updated_at: the cached rows are served
+        Customer.objects.update(name='Renamed')
+        self.assertEqual(self.render_rows(), '[Asha][Ben]')
+        # Saving bumps updated_at, so only that row is rendered again
+        self.ben.name = 'Benjamin'
+        self.ben.save()
+        self.assertEqual(self.render_rows(), '[Asha][Benjamin]')
+
+    def test_empty(self):
+        Customer.objects.all().delete()
+        self.assertEqual(self.render_rows(), 'none')
+
+    def test_orders_page_follows_status_changes(self):
+        table = Table.objects.create(number=3, capacity=2)
+        order = Order.objects.create(table=table, customer=self.asha)
+        self.assertContains(self.client.get(reverse('orders')), 'Pending')
+        set_order_status(order, Order.COMPLETED)
+        response = self.client.get(reverse('orders'))
+        self.assertContains(response, 'Completed')
+        self.assertNotContains(response, 'Pending</span>')
+
+    def test_tables_page_keeps_csrf_token_out_of_rows(self):
+        tables = [Table.objects.create(number=number, capacity=4) for number in (1, 2)]
+        with self.captureOnCommitCallbacks(execute=True):
+            move_table(tables[0], TableOccupancyEvent.SEAT, customer=self.asha)
+        response = self.client.get(reverse('tables'))
+        self.assertContains(response, 'csrfmiddlewaretoken', count=1)
+        self.assertContains(response, f'formaction="{reverse("change_table_state", args=[tables[0].pk, "clear"])}"')
+
+        # The section is cached until the floor changes
+        with self.captureOnCommitCallbacks(execute=True):
+            move_table(tables[1], TableOccupancyEvent.SEAT, customer=self.ben)
+        self.assertContains(self.client.get(reverse('tables')), 'Ben')
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.customer = Customer.objects.create(name='Asha', email='asha@example.com', phone='100')
+        self.table = Table.objects.create(number=5, capacity=4)
+        self.item = MenuItem.objects.create(name='Soup', description='', price=Decimal('5.00'), category='Starters')
+        self.order = Order.objects.create(table=self.table, customer=self.customer)
+
+    def poll(self, url, etag, **headers):
+        return self.client.get(url, headers={'if-none-match': etag, **headers})
+
+    def test_unchanged_pages_are_not_modified(self):
+        for url, queries in [
+            (reverse('menu'), 1),
+            (reverse('tables'), 1),
+            (reverse('orders'), 2),
+            (reverse('order_detail', args=[self.order.pk]), 2),
+        ]:
+            with self.subTest(url=url):
+                # The first response sets the CSRF cookie the tag depends on
+                self.client.get(url)
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(queries):
+                    not_modified = self.poll(url, response['ETag'])
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified['ETag'], response['ETag'])
+                self.assertEqual(not_modified.content, b'')
+
+    def test_changes_give_a_new_etag(self):
+        orders_tag = self.client.get(reverse('orders'))['ETag']
+        detail_url = reverse('order_detail', args=[self.order.pk])
+        detail_tag = self.client.get(detail_url)['ETag']
+        menu_tag = self.client.get(reverse('menu'))['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            add_line(self.order, self.item, 1)
+        self.assertEqual(self.poll(reverse('orders'), orders_tag).status_code, 200)
+        self.assertEqual(self.poll(detail_url, detail_tag).status_code, 200)
+        self.assertEqual(self.poll(reverse('menu'), menu_tag).status_code, 304)
+
+        # A renamed menu item shows on the order's lines
+        detail_tag = self.client.get(detail_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.name = 'Tomato soup'
+            self.item.save()
+        self.assertContains(self.poll(detail_url, detail_tag), 'Tomato soup')
+        self.assertEqual(self.poll(reverse('menu'), menu_tag).status_code, 200)
+
+        # A renamed customer shows in the orders list
+        orders_tag = self.client.get(reverse('orders'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.customer.name = 'Asha R'
+            self.customer.save()
+        self.assertContains(self.poll(reverse('orders'), orders_tag), 'Asha R')
+
+    def test_versions_are_shared_between_processes(self):
+        orders_tag = self.client.get(reverse('orders'))['ETag']
+        detail_url = reverse('order_detail', args=[self.order.pk])
+        detail_tag = self.client.get(detail_url)['ETag']
+        # Another worker, or a management command, bumps the versions in the
+        # database; this process's cache never hears of it
+        ContentVersion.objects.filter(key='orders').update(version=F('version') + 1)
+        Order.objects.filter(pk=self.order.pk).update(version=F('version') + 1)
+        self.assertEqual(self.poll(reverse('orders'), orders_tag).status_code, 200)
+        self.assertEqual(self.poll(detail_url, detail_tag).status_code, 200)
+
+    def test_status_change_and_delete(self):
+        detail_url = reverse('order_detail', args=[self.order.pk])
+        detail_tag = self.client.get(detail_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            set_order_status(self.order, Order.COMPLETED)
+        self.assertEqual(self.poll(detail_url, detail_tag).status_code, 200)
+
+        detail_tag = self.client.get(detail_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.delete()
+        self.assertEqual(self.poll(detail_url, detail_tag).status_code, 404)
+
+    def test_new_csrf_cookie_gets_a_new_form(self):
+        self.client.get(reverse('tables'))
+        response = self.client.get(reverse('tables'))
+        self.assertEqual(self.poll(reverse('tables'), response['ETag']).status_code, 304)
+        self.client.cookies['csrftoken'] = 'a' * 32
+        self.assertEqual(self.poll(reverse('tables'), response['ETag']).status_code, 200)
+
+    def test_async_views(self):
+        factory = RequestFactory()
+        url = reverse('order_detail', args=[self.order.pk])
+        response = async_to_sync(async_views.order_detail)(factory.get(url), id=self.order.pk)
+        self.assertEqual(response.status_code, 200)
+        not_modified = async_to_sync(async_views.order_detail)(
+            factory.get(url, headers={'if-none-match': response['ETag']}), id=self.order.pk,
+        )
+        self.assertEqual(not_modified.status_code, 304)
+        # The sync and async views send the same tag
+        self.assertEqual(views.order_detail(factory.get(url), id=self.order.pk)['ETag'], response['ETag'])
+
+
+class StaticAssetsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        source = tempfile.TemporaryDirectory()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(root.cleanup)
+        self.source, self.root = source.name, root.name
+        os.makedirs(os.path.join(self.source, 'app'))
+        self.css = ('body { background: url("icon.svg"); }\n' + '.row { color: #333; }\n' * 50).encode()
+        with open(os.path.join(self.source, 'app', 'app.css'), 'wb') as f:
+            f.write(self.css)
+        with open(os.path.join(self.source, 'app', 'icon.svg'), 'wb') as f:
+            f.write(b'<svg xmlns="http://www.w3.org/2000/svg"/>')
+
+    def collect(self):
+        return override_settings(
+            STATICFILES_DIRS=[self.source],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+            STATIC_ROOT=self.root,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'restaurant.staticfiles.CompressedManifestStaticFilesStorage'},
+            },
+        )
+
+    def test_pages_use_the_cdns_until_the_assets_are_built(self):
+        # The built files are not committed, so the manifest has no entry
+        # for them and the pages must not ask for one
+        with self.collect():
+            call_command('collectstatic', interactive=False, verbosity=0)
+            for name in ('dashboard', 'tables'):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'https://cdn.tailwindcss.com/3.4.4')
+        dashboard = self.client.get(reverse('dashboard')).content.decode()
+        self.assertEqual(dashboard.count('chart.umd'), 1)
+
+    @override_settings(SELF_HOSTED_ASSETS=True)
+    def test_pages_load_nothing_from_a_cdn(self):
+        for name in ('dashboard', 'tables', 'employees'):
+            content = self.client.get(reverse(name)).content.decode()
+            self.assertNotIn('https://cdn', content)
+            self.assertNotIn('unpkg.com', content)
+        dashboard = self.client.get(reverse('dashboard')).content.decode()
+        self.assertEqual(dashboard.count('chart.umd.min.js'), 1)
+
+    def test_collectstatic_fingerprints_and_compresses(self):
+        with self.collect():
+            call_command('collectstatic', interactive=False, verbosity=0)
+            css = staticfiles_storage.stored_name('app/app.css')
+            self.assertRegex(css, r'^app/app\.[0-9a-f]{12}\.css$')
+            with open(os.path.join(self.root, css), 'rb') as f:
+                hashed = f.read()
+            # References inside the stylesheet point at hashed names too
+            self.assertIn(staticfiles_storage.stored_name('app/icon.svg').split('/')[-1].encode(), hashed)
+            with gzip.open(os.path.join(self.root, css + '.gz')) as f:
+                self.assertEqual(f.read(), hashed)
+            # Too small to be worth compressing
+            self.assertFalse(os.path.exists(os.path.join(self.root, staticfiles_storage.stored_name('app/icon.svg') + '.gz')))
+
+    def test_serve_precompressed_with_long_cache_headers(self):
+        factory = RequestFactory()
+        with self.collect():
+            call_command('collectstatic', interactive=False, verbosity=0)
+            css = staticfiles_storage.stored_name('app/app.css')
+
+            response = staticfiles.serve(factory.get('/static/' + css, headers={'accept-encoding': 'gzip, br;q=0'}), css)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+            self.assertLess(int(response['Content-Length']), len(self.css))
+            response.close()
+
+            response = staticfiles.serve(factory.get('/static/' + css), css)
+            self.assertNotIn('Content-Encoding', response)
+            response.close()
+
+            # The unhashed copy may change, so it is only cached briefly
+            response = staticfiles.serve(factory.get('/static/app/app.css'), 'app/app.css')
+            self.assertEqual(response['Cache-Control'], 'public, max-age=300')
+            response.close()
+
+            with self.assertRaises(Http404):
+                staticfiles.serve(factory.get('/static/../manage.py'), '../manage.py')
+
+    def test_build_assets_needs_npm_packages(self):
+        # npm ci needs package-lock.json, which the first npm install writes
+        with self.assertRaisesMessage(CommandError, 'Run `npm install` first'):
+            call_command('build_assets', node_modules=self.source)
+
+    def test_deploy_check_warns_about_cdns(self):
+        with override_settings(SELF_HOSTED_ASSETS=False):
+            self.assertEqual([warning.id for warning in checks.check_self_hosted_assets(None)], ['restaurant.W001'])
+        with override_settings(SELF_HOSTED_ASSETS=True):
+            self.assertEqual(checks.check_self_hosted_assets(None), [])
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.customer = Customer.objects.create(name='Asha', email='asha@example.com', phone='100')
+        self.table = Table.objects.create(number=5, capacity=4)
+        self.items = [
+            MenuItem.objects.create(name=name, description='A long description ' * 5, price=Decimal(price), category=category)
+            for name, price, category in [
+                ('Soup', '5.00', 'Starters'), ('Salad', '6.00', 'Starters'), ('Steak', '20.00', 'Mains'),
+                ('Cake', '7.00', 'Desserts'), ('Pie', '6.50', 'Desserts'),
+            ]
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            move_table(self.table, TableOccupancyEvent.SEAT, customer=self.customer)
+
+    def get(self, name, *args, **params):
+        response = self.client.get(reverse(name, args=args), params)
+        return response, response.json()
+
+    def post(self, name, *args, data):
+        response = self.client.post(reverse(name, args=args), json.dumps(data), content_type='application/json')
+        return response, response.json()
+
+    def test_menu_items_default_and_selected_fields(self):
+        response, data = self.get('api_menu_items')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['results'][0], {
+            'id': self.items[3].pk, 'name': 'Cake', 'price': '7.00', 'category': 'Desserts', 'available': True,
+        })
+        response, data = self.get('api_menu_items', fields='name,price', category='Starters')
+        self.assertEqual(data['results'], [{'name': 'Salad', 'price': '6.00'}, {'name': 'Soup', 'price': '5.00'}])
+
+        response, data = self.get('api_menu_items', fields='name,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields must be', data['errors'][0])
+
+    def test_lists_read_values_not_models(self):
+        with mock.patch.object(MenuItem, 'from_db', side_effect=AssertionError), \
+                mock.patch.object(Table, 'from_db', side_effect=AssertionError), \
+                mock.patch.object(Customer, 'from_db', side_effect=AssertionError):
+            # The menu and tables lists also read their version for the ETag
+            for name, queries in (('api_menu_items', 2), ('api_tables', 2), ('api_customers', 1)):
+                with self.assertNumQueries(queries):
+                    self.assertEqual(self.get(name)[0].status_code, 200)
+
+    def test_cursor_pagination(self):
+        names = []
+        params = {'fields': 'name', 'limit': 2}
+        while True:
+            response, data = self.get('api_menu_items', **params)
+            names += [row['name'] for row in data['results']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(names, ['Cake', 'Pie', 'Steak', 'Salad', 'Soup'])
+
+        self.assertEqual(self.get('api_menu_items', cursor='bm9wZQ')[0].status_code, 400)
+        self.assertEqual(self.get('api_menu_items', limit=500)[0].status_code, 400)
+
+    def test_customers_page_through_the_name_key_index(self):
+        for name, phone in (('zoë', '200'), ('Ben', '300'), ('Zack', '400')):
+            Customer.objects.create(name=name, email=f'{phone}@example.com', phone=phone)
+        names, params = [], {'fields': 'name', 'limit': 2}
+        while True:
+            response, data = self.get('api_customers', **params)
+            names += [row['name'] for row in data['results']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(names, ['Asha', 'Ben', 'Zack', 'zoë'])
+
+        if connection.vendor == 'sqlite':
+            with CaptureQueriesContext(connection) as ctx:
+                self.get('api_customers', limit=2)
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + ctx.captured_queries[0]['sql'])
+                plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+            # Read in index order, no sort
+            self.assertIn('customer_name_key_idx', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_orders_newest_first_across_pages(self):
+        orders = [Order.objects.create(table=self.table, customer=self.customer) for _ in range(3)]
+        # Same created_at: the id breaks the tie
+        Order.objects.update(created_at=timezone.now())
+        response, first = self.get('api_orders', limit=2, fields='id,customer')
+        response, second = self.get('api_orders', limit=2, fields='id,customer', cursor=first['next_cursor'])
+        self.assertEqual(
+            [row['id'] for row in first['results'] + second['results']], [order.pk for order in reversed(orders)],
+        )
+        self.assertEqual(first['results'][0]['customer'], 'Asha')
+        self.assertIsNone(second['next_cursor'])
+
+        set_order_status(orders[0], Order.COMPLETED)
+        response, data = self.get('api_orders', status=Order.COMPLETED, fields='id')
+        self.assertEqual(data['results'], [{'id': orders[0].pk}])
+
+    def test_order_entry_flow(self):
+        response, order = self.post('api_orders', data={'table_id': self.table.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((order['status'], order['table'], order['lines']), (Order.PENDING, 5, []))
+        self.assertEqual(Table.objects.get(pk=self.table.pk).state, Table.ORDERED)
+
+        response, order = self.post('api_order_lines', order['id'], data={
+            'items': [{'menu_item_id': self.items[0].pk, 'quantity': 2}, {'menu_item_id': self.items[2].pk, 'quantity': 1}],
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(order['total_amount'], '30.00')
+        self.assertEqual([(line['name'], line['quantity']) for line in order['lines']], [('Soup', 2), ('Steak', 1)])
+
+        response, data = self.post('api_order_lines', order['id'], data={'items': [{'menu_item_id': 0, 'quantity': 1}]})
+        self.assertEqual(response.status_code, 400)
+
+        response, done = self.post('api_order_status', order['id'], data={'status': Order.COMPLETED})
+        self.assertEqual(done['status'], Order.COMPLETED)
+        self.assertEqual(self.post('api_order_status', order['id'], data={'status': 'Lost'})[0].status_code, 400)
+
+        response, data = self.get('api_order', order['id'], fields='id,lines')
+        self.assertEqual(set(data), {'id', 'lines'})
+        self.assertEqual(self.client.get(reverse('api_order', args=[0])).status_code, 404)
+
+    def test_order_for_an_empty_table(self):
+        empty = Table.objects.create(number=6, capacity=2)
+        response, data = self.post('api_orders', data={'table_id': empty.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(data['errors'], ['This table does not have a customer assigned.'])
+        self.assertEqual(self.post('api_orders', data={'table_id': 'x'})[0].status_code, 400)
+
+    def test_much_smaller_than_the_pages(self):
+        order = Order.objects.create(table=self.table, customer=self.customer)
+        add_line(order, self.items[0], 2)
+        for page, api in [
+            (reverse('order_detail', args=[order.pk]), reverse('api_order', args=[order.pk])),
+            (reverse('menu'), reverse('api_menu_items') + '?available=true'),
+            (reverse('tables'), reverse('api_tables')),
+        ]:
+            with self.subTest(api=api):
+                self.assertLess(len(self.client.get(api).content) * 10, len(self.client.get(page).content))
+
+    def test_polls_are_not_modified(self):
+        response = self.client.get(reverse('api_menu_items'))
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(reverse('api_menu_items'), headers={'if-none-match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+
+
+class CustomerSearchTests(TestCase):
+    def setUp(self):
+        self.asha = Customer.objects.create(name='Asha  Sharma', email='Asha.S@Example.com', phone='+91 98765-43210')
+        self.zoe = Customer.objects.create(name='Zoë Ashworth', email='zoe@example.com', phone='020 7946 0000')
+        self.ben = Customer.objects.create(name='Ben Okafor', email='ben@example.com', phone='98700 11111')
+
+    def names(self, query, **kwargs):
+        return [customer.name for customer in search_customers(query, **kwargs)]
+
+    def test_search_keys_follow_the_fields(self):
+        self.assertEqual(
+            (self.asha.name_key, self.asha.surname_key, self.asha.email_key, self.asha.phone_key),
+            ('asha sharma', 'sharma', 'asha.s@example.com', '919876543210'),
+        )
+        self.zoe.name = 'Zoé Hart'
+        self.zoe.save(update_fields=['name'])
+        self.zoe.refresh_from_db()
+        self.assertEqual((self.zoe.name_key, self.zoe.surname_key), ('zoe hart', 'hart'))
+
+    def test_prefix_of_name_surname_email_or_phone(self):
+        self.assertEqual(self.names('ash'), ['Asha  Sharma', 'Zoë Ashworth'])
+        self.assertEqual(self.names('ZOE'), ['Zoë Ashworth'])
+        self.assertEqual(self.names('okaf'), ['Ben Okafor'])
+        self.assertEqual(self.names('asha.s@'), ['Asha  Sharma'])
+        self.assertEqual(self.names('91 987'), ['Asha  Sharma'])
+        self.assertEqual(self.names('987'), ['Ben Okafor'])
+        # Only prefixes match
+        self.assertEqual(self.names('harma'), [])
+        self.assertEqual(self.names('  '), [])
+
+    def test_limit_stops_early(self):
+        Customer.objects.bulk_create(
+            Customer(name=f'Ash {i}', email=f'ash{i}@example.com', phone=f'5{i:04d}', name_key=f'ash {i}')
+            for i in range(20)
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(len(search_customers('ash', limit=10)), 10)
+        self.assertEqual(len(async_to_sync(asearch_customers)('ash', limit=10)), 10)
+
+    def test_import_fills_search_keys(self):
+        import_records('customers', StringIO('name,email,phone\nAsha Rao,asha.s@example.com,(044) 555\nCara Diaz,cara@example.com,777\n'))
+        self.assertEqual(self.names('rao'), ['Asha Rao'])
+        self.assertEqual(self.names('diaz'), ['Cara Diaz'])
+        self.assertEqual(self.names('044'), ['Asha Rao'])
+
+    def test_api(self):
+        response = self.client.get(reverse('api_customer_search'), {'q': 'ash', 'fields': 'id,name'})
+        self.assertEqual(response.json(), {'results': [
+            {'id': self.asha.pk, 'name': 'Asha  Sharma'}, {'id': self.zoe.pk, 'name': 'Zoë Ashworth'},
+        ]})
+        response = self.client.get(reverse('api_customer_search'), {'q': 'ash', 'limit': '1'})
+        self.assertEqual(response.json()['results'], [{'id': self.asha.pk, 'name': 'Asha  Sharma', 'phone': '+91 98765-43210'}])
+        response = self.client.get(reverse('api_customer_search'), {'q': 'ash', 'limit': '1000'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_table_form_does_not_list_customers(self):
+        table = Table.objects.create(number=1, capacity=4)
+        response = self.client.get(reverse('edit_table', args=[table.pk]))
+        self.assertNotContains(response, '<option')
+        self.assertNotContains(response, 'Ben Okafor')
+        self.assertContains(response, reverse('api_customer_search'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('edit_table', args=[table.pk]), {'number': 1, 'capacity': 4, 'customer': self.ben.pk})
+        table.refresh_from_db()
+        self.assertEqual(table.customer, self.ben)
+        response = self.client.get(reverse('edit_table', args=[table.pk]))
+        self.assertContains(response, 'value="Ben Okafor (98700 11111)"')
+
+    def test_customers_page_searches(self):
+        response = self.client.get(reverse('customers'), {'q': 'okafor'})
+        self.assertContains(response, 'Ben Okafor')
+        self.assertNotContains(response, 'Zoë Ashworth')
+        self.assertFalse(response.context['more'])
+
+
+class OccupancyAnalyticsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.customer = Customer.objects.create(name='Asha', email='asha@example.com', phone='100')
+        self.table = Table.objects.create(number=1, capacity=4)
+        Table.objects.create(number=2, capacity=4)
+        self.day = timezone.localdate() - timedelta(days=3)
+
+    def at(self, hour, minute=0):
+        return start_of_day(self.day) + timedelta(hours=hour, minutes=minute)
+
+    def seat_and_clear(self, seated, cleared):
+        for kind, to_state, moment in (('seat', 'seated', seated), ('clear', 'available', cleared)):
+            event = TableOccupancyEvent.objects.create(
+                table=self.table, kind=kind, from_state='available', to_state=to_state, customer=self.customer,
+            )
+            TableOccupancyEvent.objects.filter(pk=event.pk).update(created_at=moment)
+
+    def test_bucketing(self):
+        edges = [0, 3600, 7200, 10800]
+        self.assertEqual(occupancy.occupied_seconds([1800, 7200], [5400, 9000], edges), [1800, 1800, 1800])
+        self.assertEqual(occupancy.occupied_seconds([-100], [20000], edges), [3600, 3600, 3600])
+
+    def test_numpy_and_plain_python_agree(self):
+        # The last edge repeats, as on a day with a short last hour
+        edges = [0, 3600, 7200, 9000, 9000]
+        starts = [1800, 500, 3600, -100, -500, 7200, 9000, 12000, 100, 3000]
+        ends = [5400, 500, 7200, 20000, -100, 9000, 9500, 13000, 50, 3600]
+        expected = [1800 + 3600 + 600, 1800 + 3600 + 3600, 1800 + 1800, 0]
+        index, weights = [0, 2, 0, 3], [1.5, 2.0, 0.5, 4.0]
+
+        paths = [('plain', None)]
+        if occupancy.np is not None:
+            paths.append(('numpy', occupancy.np))
+        for name, np in paths:
+            with self.subTest(path=name), mock.patch.object(occupancy, 'np', np):
+                self.assertEqual(occupancy.occupied_seconds(starts, ends, edges), expected)
+                self.assertEqual(occupancy.occupied_seconds([], [], edges), [0, 0, 0, 0])
+                self.assertEqual(occupancy._sum_by(index, weights, 5), [2.0, 0, 2.0, 4.0, 0])
+        if occupancy.np is None:
+            self.skipTest('numpy is not installed, so only the plain Python path ran')
+
+    def test_seatings_from_events_and_orders(self):
+        self.seat_and_clear(self.at(12), self.at(13, 30))
+        self.seat_and_clear(self.at(14), self.at(15))
+        order = Order.objects.create(table=self.table, customer=self.customer)
+        Order.objects.filter(pk=order.pk).update(created_at=self.at(18, 30))
+
+        [day] = occupancy.daily_occupancy(self.day, self.day)
+        self.assertEqual(day['occupied_seconds'][12:20], [3600, 1800, 3600, 0, 0, 0, 1800, 1800])
+        self.assertEqual((day['seatings'], day['turnovers']), (3, 2))
+
+        summary = occupancy.summarize([day], tables=2)
+        self.assertAlmostEqual(summary['avg_seating_minutes'], (90 + 60 + 60) / 3)
+        self.assertAlmostEqual(summary['avg_turnover_minutes'], (30 + 210) / 2)
+        self.assertAlmostEqual(summary['occupancy_rate'], 3.5 * 3600 / (2 * 14 * 3600) * 100)
+
+    def test_finished_days_are_cached(self):
+        self.seat_and_clear(self.at(12), self.at(13))
+        occupancy.daily_occupancy(self.day, self.day)
+        with self.assertNumQueries(0):
+            [day] = occupancy.daily_occupancy(self.day, self.day)
+        self.assertEqual(day['seatings'], 1)
+
+    def test_heatmap_page(self):
+        self.seat_and_clear(self.at(12), self.at(13))
+        response = self.client.get(reverse('occupancy_analytics'), {'days': 30})
+        self.assertEqual(response.status_code, 200)
+        rows = dict(response.context['heatmaps'][0][1])
+        hours = response.context['hours']
+        # One of two tables for the whole hour, averaged over the span's days of that weekday
+        same_weekday = sum(1 for d in range(30) if (timezone.localdate() - timedelta(days=d)).weekday() == self.day.weekday())
+        self.assertAlmostEqual(rows[self.day.strftime('%A')][hours.index(12)][0], 50 / same_weekday)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(TestCase):
+    def test_reuses_returned_connections(self):
+        pool = ConnectionPool(max_size=2)
+        first = pool.getconn(FakeConnection)
+        second = pool.getconn(FakeConnection)
+        pool.putconn(first)
+        pool.putconn(second)
+        self.assertIs(pool.getconn(FakeConnection), second)
+        self.assertEqual((pool.connects, pool.size), (2, 2))
+
+    def test_waits_then_times_out_when_full(self):
+        pool = ConnectionPool(max_size=1, timeout=0.05)
+        held = pool.getconn(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(FakeConnection)
+        threading.Timer(0.01, pool.putconn, [held]).start()
+        pool.timeout = 5
+        self.assertIs(pool.getconn(FakeConnection), held)
+
+    def test_drops_broken_and_expired_connections(self):
+        pool = ConnectionPool(max_size=2, check=lambda conn: not getattr(conn, 'broken', False))
+        conn = pool.getconn(FakeConnection)
+        conn.broken = True
+        pool.putconn(conn)
+        replacement = pool.getconn(FakeConnection)
+        self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+
+        pool.putconn(replacement, discard=True)
+        self.assertTrue(replacement.closed)
+        pool.max_lifetime = 0
+        expired = pool.getconn(FakeConnection)
+        pool.putconn(expired)
+        self.assertTrue(expired.closed)
+        self.assertEqual(pool.size, 0)
+
+    def test_open_and_close(self):
+        pool = ConnectionPool(min_size=2, max_size=3)
+        pool.open(FakeConnection)
+        self.assertEqual((pool.size, pool.connects), (2, 2))
+        held = pool.getconn(FakeConnection)
+        pool.close()
+        pool.putconn(held)
+        self.assertTrue(held.closed)
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(FakeConnection)
+
+
+class PooledBackendTests(TestCase):
+    def wrapper(self, **overrides):
+        directory = tempfile.mkdtemp()
+        settings_dict = {
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(directory, 'pooled.sqlite3'), 'CONN_MAX_AGE': 0,
+            'OPTIONS': {'pool': {'max_size': 2}}, **overrides,
+        }
+        wrapper = PooledSQLiteWrapper(settings_dict, alias='pooled')
+        self.addCleanup(wrapper.close_pool)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_close_returns_the_connection_to_the_pool(self):
+        wrapper = self.wrapper()
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+        self.assertIsNone(wrapper.connection)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertIs(wrapper.connection, raw)
+        self.assertEqual(wrapper.pool.connects, 1)
+
+    def test_connection_closed_in_a_transaction_is_discarded(self):
+        wrapper = self.wrapper()
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.set_autocommit(False)
+        wrapper.close()
+        wrapper.ensure_connection()
+        self.assertIsNot(wrapper.connection, raw)
+
+    def test_pooling_needs_conn_max_age_zero(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.wrapper(CONN_MAX_AGE=60).ensure_connection()
+
+    def test_without_pool_option_behaves_like_sqlite(self):
+        wrapper = self.wrapper(OPTIONS={})
+        wrapper.ensure_connection()
+        self.assertIsNone(wrapper.pool)
+
+
+class BenchmarkConnectionsCommandTests(TransactionTestCase):
+    def test_compares_connection_modes(self):
+        customer = Customer.objects.create(name='Meera', email='meera@example.com', phone='1')
+        table = Table.objects.create(number=3, capacity=2, customer=customer)
+        Order.objects.create(table=table, customer=customer)
+        saved = connection.settings_dict['CONN_MAX_AGE'], dict(connection.settings_dict['OPTIONS'])
+        out = StringIO()
+        call_command(
+            'benchmark_connections', mode=['per-request', 'persistent'], requests=6, threads=2, json=True, stdout=out,
+        )
+        result = json.loads(out.getvalue())
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # Django never closes an in-memory SQLite connection, so each
+            # thread keeps the one it opened whatever CONN_MAX_AGE says
+            self.assertLessEqual(result['per-request']['connections'], 2)
+        else:
+            self.assertEqual(result['per-request']['connections'], 6)
+        self.assertLessEqual(result['persistent']['connections'], 2)
+        self.assertEqual(result['persistent']['errors'], 0)
+        # The command puts the connection settings back as it found them
+        self.assertEqual((connection.settings_dict['CONN_MAX_AGE'], connection.settings_dict['OPTIONS']), saved)
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        routers._lag_checks.clear()
+        self.addCleanup(routers._lag_checks.clear)
+        self.factory = RequestFactory()
+        self.middleware = routers.ReplicaRoutingMiddleware(routers.replica_reads(self.report))
+
+    @staticmethod
+    def report(request):
+        return HttpResponse(routers.read_database())
+
+    def replica(self, fresh=True):
+        return mock.patch.multiple(routers, replica_alias=lambda: 'replica', replica_is_fresh=lambda alias: fresh)
+
+    def serve(self, request):
+        with self.replica(self.fresh):
+            return self.middleware(request)
+
+    def test_reporting_reads_go_to_the_replica(self):
+        self.fresh = True
+        self.assertEqual(self.serve(self.factory.get('/')).content, b'replica')
+        with mock.patch.object(routers, 'replica_alias', return_value='replica'):
+            self.assertEqual(routers.read_database(), 'default')
+            with routers.primary_reads():
+                self.assertEqual(self.report(None).content, b'default')
+
+        async def areport(request):
+            return HttpResponse(routers.read_database())
+
+        async def aserve(request):
+            with self.replica():
+                return await routers.ReplicaRoutingMiddleware(routers.replica_reads(areport))(request)
+        self.assertEqual(async_to_sync(aserve)(self.factory.get('/')).content, b'replica')
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        self.fresh = True
+        response = self.serve(self.factory.post('/'))
+        self.assertEqual(response.content, b'default')
+        cookie = response.cookies[routers.STICKY_COOKIE].value
+
+        request = self.factory.get('/')
+        request.COOKIES[routers.STICKY_COOKIE] = cookie
+        self.assertEqual(self.serve(request).content, b'default')
+        request.COOKIES[routers.STICKY_COOKIE] = str(time.time() - 1)
+        self.assertEqual(self.serve(request).content, b'replica')
+
+    def test_stale_replica_falls_back_to_the_primary(self):
+        self.fresh = False
+        self.assertEqual(self.serve(self.factory.get('/')).content, b'default')
+
+    @override_settings(REPLICA_DATABASE='default', REPLICA_MAX_LAG_SECONDS=5, REPLICA_LAG_CHECK_SECONDS=0)
+    def test_lag_from_heartbeat(self):
+        self.assertIsNone(routers.replica_lag('default'))
+        self.assertFalse(routers.replica_is_fresh('default'))
+        call_command('replica_heartbeat', count=1)
+        self.assertTrue(routers.replica_is_fresh('default'))
+        ReplicaHeartbeat.objects.update(beat_at=timezone.now() - timedelta(seconds=30))
+        self.assertFalse(routers.replica_is_fresh('default'))
+
+    def test_writes_and_migrations_stay_on_the_primary(self):
+        router = routers.ReplicaRouter()
+        self.assertEqual(router.db_for_write(Order, instance=Order(pk=1)), 'default')
+        with mock.patch.object(routers, 'replica_alias', return_value='replica'):
+            self.assertFalse(router.allow_migrate('replica', 'restaurant'))
+            self.assertTrue(router.allow_migrate('default', 'restaurant'))
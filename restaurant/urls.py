@@ -1,38 +1,45 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
+
+# Under ASGI the read-heavy pages are served by their async versions
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
-    path('', views.dashboard, name='dashboard'),
+    path('', read_views.dashboard, name='dashboard'),
 
     # Customers
-    path('customers/', views.customer_list, name='customers'),
+    path('customers/', read_views.customer_list, name='customers'),
     path('customers/add/', views.add_customer, name='add_customer'),
     path('customers/edit/<int:pk>/', views.edit_customer, name='edit_customer'), 
     path('customers/delete/<int:pk>/', views.delete_customer, name='delete_customer'), 
 
     # Tables
-    path('tables/', views.tables, name='tables'),
+    path('tables/', read_views.tables, name='tables'),
     path('tables/add/', views.add_table, name='add_table'),
     path('tables/edit/<int:pk>/', views.edit_table, name='edit_table'),
     path('tables/delete/<int:pk>/', views.delete_table, name='delete_table'),
+    path('tables/<int:pk>/<str:kind>/', views.change_table_state, name='change_table_state'),
 
     # Menu
-    path('menu/', views.menu, name='menu'),
+    path('menu/', read_views.menu, name='menu'),
     path('menu/add/', views.add_menu_item, name='add_menu_item'),
     path('menu/<int:pk>/update/', views.update_menu_item, name='update_menu_item'),
     path('menu/<int:pk>/delete/', views.delete_menu_item, name='delete_menu_item'),
 
     # Orders
-    path('orders/', views.orders, name='orders'),
+    path('orders/', read_views.orders, name='orders'),
+    path('orders/export/', views.export_orders, name='export_orders'),
     path('orders/select_table/', views.select_table_for_order, name='select_table_for_order'),
     path('orders/create/<int:table_id>/', views.create_order, name='create_order'),
-    path('orders/', views.orders, name='orders'),  
+    path('orders/', read_views.orders, name='orders'),  
     path('orders/add_items/<int:order_id>/', views.add_items_to_order, name='add_items_to_order'),
     path('orders/update_item/<int:order_item_id>/', views.update_order_item, name='update_order_item'),
     path('orders/delete/<int:order_id>/', views.delete_order, name='delete_order'),
     path('orders/delete_item/<int:order_item_id>/', views.delete_order_item, name='delete_order_item'),
-    path('orders/<int:id>/', views.order_detail, name='order_detail'),
+    path('orders/<int:id>/', read_views.order_detail, name='order_detail'),
     path('orders/<int:order_id>/add_item/', views.add_order_item, name='add_order_item'),
+    path('orders/<int:order_id>/lines/', views.add_order_lines, name='add_order_lines'),
     path('orders/<int:order_id>/change-status/', views.change_order_status, name='change_order_status'),
 
     # Employees
@@ -45,6 +52,24 @@ urlpatterns = [
     path('dashboard/', views.dashboard_view, name='dashboard.view'),
     path('orders/<int:order_id>/item/<int:item_id>/decrease/', views.decrease_item_quantity, name='decrease_item_quantity'),
     path('orders/<int:order_id>/item/<int:item_id>/increase/', views.increase_item_quantity, name='increase_item_quantity'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('import/', views.import_data, name='import_data'),
+    path('api/leaderboard/', views.leaderboard_api, name='leaderboard_api'),
+    path('analytics/occupancy/', views.occupancy_analytics, name='occupancy_analytics'),
+
+    # Kitchen display
+    path('kitchen/', views.kitchen_display, name='kitchen'),
+    path('kitchen/feed/', views.kitchen_feed, name='kitchen_feed'),
+
+    # JSON API for POS terminals (restaurant/api.py)
+    path('api/v1/menu-items/', api.menu_items, name='api_menu_items'),
+    path('api/v1/tables/', api.tables, name='api_tables'),
+    path('api/v1/customers/', api.customers, name='api_customers'),
+    path('api/v1/customers/search/', api.customer_search, name='api_customer_search'),
+    path('api/v1/orders/', api.orders, name='api_orders'),
+    path('api/v1/orders/<int:id>/', api.order, name='api_order'),
+    path('api/v1/orders/<int:id>/lines/', api.order_lines, name='api_order_lines'),
+    path('api/v1/orders/<int:id>/status/', api.order_status, name='api_order_status'),
 
 
 ]
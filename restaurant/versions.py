@@ -0,0 +1,99 @@
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.models import F
+
+from .models import ContentVersion
+from .routers import primary_reads
+
+# Shared versions
+# The menu catalog, the floor map and the orders pages are versioned (see
+# catalog.py, floor.py and conditional.py): a process keeps what it built
+# for a version until the version moves on. Every process has to see a
+# bump, including one made by a management command such as import_records
+# or seed_restaurant, and Django's default cache is local to each process,
+# so the numbers are kept in the database instead, one ContentVersion row
+# per key. Reading one is a primary-key lookup, always on the primary, and
+# RequestVersionsMiddleware makes it at most once per key in each request,
+# however many forms and templates ask for the menu catalog.
+
+# {key: version} read so far in the current request
+_seen = ContextVar('request_versions', default=None)
+
+
+def _new_version():
+    # Seeded from the clock so a version whose row was lost never comes back
+    # as a number an old snapshot or ETag already carries.
+    return time.time_ns()
+
+
+def _versions(key):
+    return ContentVersion.objects.filter(key=key).values_list('version', flat=True)
+
+
+def _remember(key, version):
+    seen = _seen.get()
+    if seen is not None:
+        seen[key] = version
+    return version
+
+
+def get_version(key):
+    seen = _seen.get()
+    if seen and key in seen:
+        return seen[key]
+    with primary_reads():
+        version = _versions(key).first()
+        if version is None:
+            version = ContentVersion.objects.get_or_create(key=key, defaults={'version': _new_version()})[0].version
+    return _remember(key, version)
+
+
+async def aget_version(key):
+    seen = _seen.get()
+    if seen and key in seen:
+        return seen[key]
+    with primary_reads():
+        version = await _versions(key).afirst()
+        if version is None:
+            version = (await ContentVersion.objects.aget_or_create(key=key, defaults={'version': _new_version()}))[0].version
+    return _remember(key, version)
+
+
+def bump_version(key):
+    if not ContentVersion.objects.filter(key=key).update(version=F('version') + 1):
+        ContentVersion.objects.get_or_create(key=key, defaults={'version': _new_version()})
+    # A page rendered after a change in the same request shows the change
+    seen = _seen.get()
+    if seen:
+        seen.pop(key, None)
+
+
+class RequestVersionsMiddleware:
+    """Read each shared version at most once per request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _seen.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            _seen.reset(token)
+
+    async def __acall__(self, request):
+        token = _seen.set({})
+        try:
+            return await self.get_response(request)
+        finally:
+            _seen.reset(token)
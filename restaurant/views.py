@@ -1,41 +1,57 @@
+import asyncio
+import io
+import json
 from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.core.exceptions import ValidationError
+from django.views.decorators.http import require_POST
 from datetime import datetime, timedelta, timezone
-from .models import MenuItem, Table, Customer, Order, Employee, OrderItem
-from .forms import CustomerForm, TableForm, MenuItemForm, OrderForm, OrderItemForm, UpdateOrderForm, UpdateOrderItemForm, EmployeeForm
+from .models import MenuItem, Table, Customer, Order, Employee, OrderItem, DailySalesRollup, TableOccupancyEvent
+from .queries import (
+    parse_order_filters, filter_orders, paginate_orders,
+    orders_for_list, order_with_lines, order_summary, start_of_day, kitchen_tickets,
+)
+from .rollups import LEADERBOARD_ORDERINGS, LEADERBOARD_WINDOWS, leaderboard, sales_for_week
+from .catalog import get_menu_catalog
+from .conditional import etag, menu_etag, order_detail_etag, orders_etag, tables_etag
+from .customer_search import customer_page
+from .floor import get_floor_map
+from . import occupancy
+from . import events
+from .exports import FORMATS as EXPORT_FORMATS, export_stream
+from .imports import import_records
+from .instrumentation import instrumentation_enabled, metrics as route_metrics
+from .routers import read_database, replica_reads
+from .services import (
+    add_line, add_lines, update_line, change_line_quantity, remove_line, set_order_status, assign_customer, move_table,
+    open_order,
+)
+from .forms import CustomerForm, TableForm, MenuItemForm, OrderForm, OrderItemForm, UpdateOrderForm, UpdateOrderItemForm, EmployeeForm, ImportForm
+from django.conf import settings
 from django.contrib import messages
-from django.db.models import Sum, Count
+from django.db.models import Sum, Count, Q
 from django.db.models.functions import TruncMonth
 from django.utils import timezone
 
+@replica_reads
 def dashboard(request):
-    # Get weekly sales data
-    today = timezone.now().date()
+    # Weekly sales come from the precomputed daily rollup
+    today = timezone.localdate()
     week_start = today - timedelta(days=today.weekday())
-    weekly_sales = []
-    
-    for i in range(7):
-        day = week_start + timedelta(days=i)
-        day_sales = Order.objects.filter(
-            created_at__date=day
-        ).aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
-        weekly_sales.append(float(day_sales))
-
-    # Get popular items data
-    popular_items = OrderItem.objects.values(
-        'menu_item__name'
-    ).annotate(
-        count=Count('id')
-    ).order_by('-count')[:4]
+    weekly_sales = sales_for_week(week_start)
+
+    # Best sellers by quantity, from the maintained leaderboard
+    popular = leaderboard('all', limit=4)
 
     popular_items_data = {
-        'labels': [item['menu_item__name'] for item in popular_items],
-        'data': [item['count'] for item in popular_items]
+        'labels': [item['menu_item__name'] for item in popular],
+        'data': [item['quantity'] for item in popular]
     }
 
-    total_orders = Order.objects.count()
-    occupied_tables = Table.objects.filter(occupied=True).count()
+    total_orders = DailySalesRollup.objects.aggregate(total=Sum('order_count'))['total'] or 0
+    occupied_tables = get_floor_map().occupied
     total_menu_items = MenuItem.objects.count()
     total_customers = Customer.objects.count()
     total_employees = Employee.objects.count()
@@ -51,21 +67,39 @@ def dashboard(request):
     }
     return render(request, 'restaurant/dashboard.html', context)
 
+@etag(tables_etag)
 def tables(request):
-    tables = Table.objects.all()
-    return render(request, 'restaurant/tables.html', {'tables': tables})
+    floor = get_floor_map()
+    return render(request, 'restaurant/tables.html', {'tables': floor.tables, 'floor_version': floor.version})
 
 def customers(request):
     customers = Customer.objects.all()
     return render(request, 'restaurant/customers.html', {'customers': customers})
 
+@etag(orders_etag)
 def orders(request):
-    orders = Order.objects.all()
-    return render(request, 'restaurant/orders.html', {'orders': orders})
+    filters = parse_order_filters(request.GET)
+    queryset = filter_orders(orders_for_list(), filters)
+    orders, next_cursor = paginate_orders(queryset, cursor=request.GET.get('cursor'))
+
+    # Carry the active filters over to the "next page" link
+    params = request.GET.copy()
+    params.pop('cursor', None)
 
+    context = {
+        'orders': orders,
+        'filters': filters,
+        'status_choices': Order.ORDER_STATUS_CHOICES,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+        'filter_query': params.urlencode(),
+    }
+    return render(request, 'restaurant/orders.html', context)
+
+@etag(menu_etag)
 def menu(request):
-    menu_items = MenuItem.objects.all()
-    return render(request, 'restaurant/menu.html', {'menu_items': menu_items})
+    catalog = get_menu_catalog()
+    return render(request, 'restaurant/menu.html', {'menu_items': catalog.items, 'menu_version': catalog.version})
 
 def employees(request):
     employees = Employee.objects.all()
@@ -74,8 +108,9 @@ def employees(request):
 
 # Customers
 def customer_list(request):
-    customers = Customer.objects.all()
-    return render(request, 'restaurant/customers.html', {'customers': customers})
+    query = request.GET.get('q', '').strip()
+    customers, more = customer_page(query)
+    return render(request, 'restaurant/customers.html', {'customers': customers, 'more': more, 'query': query})
 
 def add_customer(request):
     if request.method == "POST":
@@ -108,15 +143,27 @@ def delete_customer(request,pk):
     return redirect('customers') 
 
 # Tables
+@etag(tables_etag)
 def tables(request):
-    all_tables = Table.objects.all()
-    return render(request, 'restaurant/tables.html', {'tables': all_tables})
+    floor = get_floor_map()
+    return render(request, 'restaurant/tables.html', {'tables': floor.tables, 'floor_version': floor.version})
+
+def _save_table(form):
+    # The customer goes through the seating service so the change is logged
+    customer = form.cleaned_data['customer']
+    table = form.save(commit=False)
+    if table.pk:
+        table.save(update_fields=['number', 'capacity'])
+    else:
+        table.customer = None
+        table.save()
+    assign_customer(table, customer)
 
 def add_table(request):
     if request.method == 'POST':
         form = TableForm(request.POST)
         if form.is_valid():
-            form.save()  
+            _save_table(form)
             return redirect('tables')
     else:
         form = TableForm()
@@ -127,12 +174,24 @@ def edit_table(request, pk):
     if request.method == 'POST':
         form = TableForm(request.POST, instance=table)
         if form.is_valid():
-            form.save()  
+            _save_table(form)
             return redirect('tables')
     else:
         form = TableForm(instance=table)
     return render(request, 'restaurant/table_form.html', {'form': form, 'title': 'Edit Table'})
 
+# Bill or clear a table from the tables page
+@require_POST
+def change_table_state(request, pk, kind):
+    table = get_object_or_404(Table, pk=pk)
+    if kind not in (TableOccupancyEvent.BILL, TableOccupancyEvent.CLEAR):
+        raise Http404
+    try:
+        move_table(table, kind)
+    except ValidationError as e:
+        messages.error(request, ' '.join(e.messages))
+    return redirect('tables')
+
 def delete_table(request, pk):
     table = get_object_or_404(Table, pk=pk)
     table.delete()
@@ -140,9 +199,10 @@ def delete_table(request, pk):
 
 
 # Menu
+@etag(menu_etag)
 def menu_list(request):
-    menu_items = MenuItem.objects.all()
-    return render(request, 'restaurant/menu.html', {'menu_items': menu_items})
+    catalog = get_menu_catalog()
+    return render(request, 'restaurant/menu.html', {'menu_items': catalog.items, 'menu_version': catalog.version})
 
 # View to add a new menu item
 def add_menu_item(request):
@@ -190,10 +250,11 @@ def create_order(request, table_id):
     if request.method == 'POST':
         form = OrderForm(request.POST)
         if form.is_valid():
-            order = form.save(commit=False)
-            order.table = table
-            order.customer = table.customer
-            order.save()
+            try:
+                order = open_order(table, form.cleaned_data['status'])
+            except ValidationError as e:
+                messages.error(request, ' '.join(e.messages))
+                return redirect('tables')
             return redirect('add_items_to_order', order.id)
     else:
         form = OrderForm()
@@ -207,19 +268,12 @@ def add_items_to_order(request, order_id):
     if request.method == 'POST':
         form = OrderItemForm(request.POST)
         if form.is_valid():
-            order_item = form.save(commit=False)
-            order_item.order = order
-            order_item.save()
-
-            # Recalculate total amount
-            order.total_amount = sum(item.price * item.quantity for item in order.orderitem_set.all())
-            order.save()
-
+            add_line(order, form.cleaned_data['menu_item'], form.cleaned_data['quantity'])
             return redirect('add_items_to_order', order.id)
     else:
         form = OrderItemForm()
 
-    menu_items = MenuItem.objects.all()
+    menu_items = get_menu_catalog().available
     return render(request, 'restaurant/order_items_form.html', {'form': form, 'order': order, 'menu_items': menu_items})
 
 # View to update the status of an order
@@ -229,11 +283,7 @@ def update_order(request, order_id):
     if request.method == 'POST':
         form = UpdateOrderForm(request.POST, instance=order)
         if form.is_valid():
-            form.save()
-
-            order.total_amount = sum(item.price * item.quantity for item in order.orderitem_set.all())
-            order.save()
-
+            set_order_status(order, form.cleaned_data['status'])
             return redirect('orders')
     else:
         form = UpdateOrderForm(instance=order)
@@ -247,12 +297,8 @@ def update_order_item(request, order_item_id):
     if request.method == 'POST':
         form = UpdateOrderItemForm(request.POST, instance=order_item)
         if form.is_valid():
-            order_item = form.save()
-
-            order_item.order.total_amount = sum(item.price * item.quantity for item in order_item.order.orderitem_set.all())
-            order_item.order.save()
-
-            return redirect('add_items_to_order', order_item.order.id)
+            update_line(order_item, form.cleaned_data['menu_item'], form.cleaned_data['quantity'])
+            return redirect('add_items_to_order', order_item.order_id)
     else:
         form = UpdateOrderItemForm(instance=order_item)
 
@@ -261,26 +307,79 @@ def update_order_item(request, order_item_id):
 # View to delete an order
 def delete_order(request, order_id):
     order = get_object_or_404(Order, id=order_id)
+    # Kitchen screens hear about it from signals.py
     order.delete()
     return redirect('orders')
 
 # View to delete an order item
 def delete_order_item(request, order_item_id):
     order_item = get_object_or_404(OrderItem, id=order_item_id)
-    order = order_item.order
-    order_item.delete()
+    remove_line(order_item)
+    return redirect('add_items_to_order', order_item.order_id)
+
+# Order history export for accounting. Takes the same filters as the orders
+# page plus format=csv|json and gzip=1, and streams the file batch by batch.
+@replica_reads
+def export_orders(request):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("format must be csv or json")
+    # The file is read after the view returns, so the database is picked now
+    queryset = filter_orders(Order.objects.using(read_database()), parse_order_filters(request.GET))
+    chunks, content_type, extension = export_stream(queryset, export_format, gzip=request.GET.get('gzip') == '1')
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="orders-{timezone.localdate():%Y%m%d}.{extension}"'
+    return response
+
+# CSV import of menu items, customers or tables; see restaurant/imports.py
+def import_data(request):
+    result = None
+    if request.method == 'POST':
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            # Large uploads are spooled to disk; rows are read from there as needed
+            text = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            try:
+                result = import_records(form.cleaned_data['kind'], text, dry_run=form.cleaned_data['dry_run'])
+            except (ValueError, UnicodeDecodeError) as e:
+                form.add_error('file', str(e))
+            finally:
+                text.detach()
+    else:
+        form = ImportForm()
+    return render(request, 'restaurant/import.html', {'form': form, 'result': result})
+
+# Batch endpoint for POS terminals: add a whole basket in one request.
+# Accepts JSON {"items": [{"menu_item_id": 1, "quantity": 2}, ...]} or
+# form fields menu_item/quantity repeated once per line.
+@require_POST
+def add_order_lines(request, order_id):
+    order = get_object_or_404(Order, id=order_id)
 
-    order.total_amount = sum(item.price * item.quantity for item in order.orderitem_set.all())
-    order.save()
+    if request.content_type == 'application/json':
+        try:
+            items = json.loads(request.body).get('items', [])
+            basket = [(item.get('menu_item_id'), item.get('quantity')) for item in items]
+        except (ValueError, AttributeError, TypeError):
+            return JsonResponse({'errors': ["Request body must be JSON with an 'items' list."]}, status=400)
+    else:
+        basket = list(zip(request.POST.getlist('menu_item'), request.POST.getlist('quantity')))
+
+    try:
+        add_lines(order, basket)
+    except ValidationError as e:
+        return JsonResponse({'errors': e.messages}, status=400)
 
-    return redirect('add_items_to_order', order.id)
+    return JsonResponse(order_summary(order.id), status=201)
 
 def select_table_for_order(request):
-    tables = Table.objects.all()
-    return render(request, 'restaurant/select_table.html', {'tables': tables})
+    return render(request, 'restaurant/select_table.html', {'tables': get_floor_map().tables})
 
+@etag(order_detail_etag)
 def order_detail(request, id):
-    order = get_object_or_404(Order, id=id)
+    order = get_object_or_404(order_with_lines(), id=id)
     return render(request, 'restaurant/order_detail.html', {'order': order})
 
 def add_order_item(request, order_id):
@@ -289,10 +388,8 @@ def add_order_item(request, order_id):
     if request.method == 'POST':
         form = OrderItemForm(request.POST)
         if form.is_valid():
-            order_item = form.save(commit=False)
-            order_item.order = order  
-            order_item.save()
-            return redirect('order_detail', id=order.id)  
+            add_line(order, form.cleaned_data['menu_item'], form.cleaned_data['quantity'])
+            return redirect('order_detail', id=order.id)
     
     else:
         form = OrderItemForm()
@@ -339,32 +436,12 @@ def delete_employee(request, employee_id):
 
 def increase_item_quantity(request, order_id, item_id):
     item = get_object_or_404(OrderItem, id=item_id, order_id=order_id)
-    item.quantity += 1
-    item.price = item.quantity * item.menu_item.price
-    item.save()
-
-    # Update order total
-    order = item.order
-    order.total_amount = sum(i.price for i in order.orderitem_set.all())
-    order.save()
-
+    change_line_quantity(item, 1)
     return redirect('order_detail', id=order_id)
 
 def decrease_item_quantity(request, order_id, item_id):
     item = get_object_or_404(OrderItem, id=item_id, order_id=order_id)
-    order = item.order
-
-    if item.quantity > 1:
-        item.quantity -= 1
-        item.price = item.quantity * item.menu_item.price
-        item.save()
-    else:
-        item.delete()
-
-    # Update order total
-    order.total_amount = sum(i.price for i in order.orderitem_set.all())
-    order.save()
-
+    change_line_quantity(item, -1)
     return redirect('order_detail', id=order_id)
 
 # def delete_order_item(request, item_id):
@@ -373,46 +450,198 @@ def decrease_item_quantity(request, order_id, item_id):
 #     item.delete()
 #     return redirect('order_detail', id=order_id)
 
+@replica_reads
 def dashboard_view(request):
-    today = timezone.now().date()
+    today = timezone.localdate()
     week_ago = today - timedelta(days=7)
     month_ago = today - timedelta(days=30)
 
-    total_tables = Table.objects.count()
-
-    occupied_tables_today = Table.objects.filter(occupied=True, updated_at__date=today).count()
-    occupied_tables_week = Table.objects.filter(occupied=True, updated_at__gte=week_ago).count()
-    occupied_tables_month = Table.objects.filter(occupied=True, updated_at__gte=month_ago).count()
+    floor = get_floor_map()
+    total_tables = floor.total
+
+    # Tables in use at some point of each window: seated during it, per the
+    # occupancy log, or still occupied now
+    occupied_now = Q(table__occupied=True)
+    seated = TableOccupancyEvent.objects.filter(
+        Q(created_at__gte=start_of_day(month_ago)) | occupied_now, kind=TableOccupancyEvent.SEAT,
+    ).aggregate(
+        today=Count('table', distinct=True, filter=Q(created_at__gte=start_of_day(today)) | occupied_now),
+        week=Count('table', distinct=True, filter=Q(created_at__gte=start_of_day(week_ago)) | occupied_now),
+        month=Count('table', distinct=True),
+    )
+    occupied_tables_today = seated['today']
+    occupied_tables_week = seated['week']
+    occupied_tables_month = seated['month']
+    days = occupancy.daily_occupancy(today - timedelta(days=29), today)
+
+    order_counts = DailySalesRollup.objects.filter(date__gte=month_ago).aggregate(
+        today=Sum('order_count', filter=Q(date=today)),
+        week=Sum('order_count', filter=Q(date__gte=week_ago)),
+        month=Sum('order_count'),
+    )
+    customer_counts = Customer.objects.aggregate(
+        total=Count('id'),
+        week=Count('id', filter=Q(created_at__gte=start_of_day(week_ago))),
+        month=Count('id', filter=Q(created_at__gte=start_of_day(month_ago))),
+    )
 
     context = {
-        'total_orders': Order.objects.filter(created_at__date=today).count(),
-        'total_orders_week': Order.objects.filter(created_at__gte=week_ago).count(),
-        'total_orders_month': Order.objects.filter(created_at__gte=month_ago).count(),
+        'total_orders': order_counts['today'] or 0,
+        'total_orders_week': order_counts['week'] or 0,
+        'total_orders_month': order_counts['month'] or 0,
 
         'occupied_tables': occupied_tables_today,
         'occupied_tables_week': occupied_tables_week,
         'occupied_tables_month': occupied_tables_month,
 
         'total_menu_items': MenuItem.objects.count(),
-        'total_customers': Customer.objects.count(),
-        'total_customers_week': Customer.objects.filter(created_at__gte=week_ago).count(),
-        'total_customers_month': Customer.objects.filter(created_at__gte=month_ago).count(),
+        'total_customers': customer_counts['total'],
+        'total_customers_week': customer_counts['week'],
+        'total_customers_month': customer_counts['month'],
 
         'total_employees': Employee.objects.count(),
         'total_tables': total_tables,
 
-        'occupancy_rate': (occupied_tables_today / total_tables * 100) if total_tables > 0 else 0,
-        'occupancy_rate_week': (occupied_tables_week / total_tables * 100) if total_tables > 0 else 0,
-        'occupancy_rate_month': (occupied_tables_month / total_tables * 100) if total_tables > 0 else 0,
+        # Share of table-hours in use during opening hours, see occupancy.py
+        'occupancy_rate': occupancy.summarize(days[-1:], total_tables)['occupancy_rate'],
+        'occupancy_rate_week': occupancy.summarize(days[-7:], total_tables)['occupancy_rate'],
+        'occupancy_rate_month': occupancy.summarize(days, total_tables)['occupancy_rate'],
     }
     return render(request, 'restaurant/dashboard.html', context)
 
 
+@replica_reads
+def occupancy_analytics(request):
+    try:
+        span = min(max(int(request.GET.get('days', 365)), 1), 730)
+    except ValueError:
+        span = 365
+    today = timezone.localdate()
+    days = occupancy.daily_occupancy(today - timedelta(days=span - 1), today)
+    tables = get_floor_map().total
+
+    heatmaps = [
+        ('By weekday', occupancy.heatmap(sorted(days, key=lambda day: day['date'].weekday()), tables,
+                                         lambda date: date.strftime('%A'))),
+        ('By month', occupancy.heatmap(days, tables, lambda date: date.strftime('%b %Y'))),
+    ]
+    context = {
+        'span': span,
+        'span_choices': [30, 90, 365],
+        'summary': occupancy.summarize(days, tables),
+        'hours': list(occupancy.opening_hours()),
+        # Each cell is (rate, background opacity)
+        'heatmaps': [
+            (title, [(label, [(rate, f'{min(rate, 100) / 100:.2f}') for rate in rates]) for label, rates in rows])
+            for title, rows in heatmaps
+        ],
+    }
+    return render(request, 'restaurant/occupancy.html', context)
+
+
 def change_order_status(request, order_id):
     order = get_object_or_404(Order, pk=order_id)
     if request.method == 'POST':
         new_status = request.POST.get('status')
         if new_status in dict(Order.ORDER_STATUS_CHOICES):
-            order.status = new_status
-            order.save()
-    return redirect('order_detail', id=order.id)
\ No newline at end of file
+            set_order_status(order, new_status)
+    return redirect('order_detail', id=order.id)
+
+# Best-selling menu items: /api/leaderboard/?window=7d&order_by=revenue&limit=10
+@replica_reads
+def leaderboard_api(request):
+    window = request.GET.get('window', '7d')
+    order_by = request.GET.get('order_by', 'quantity')
+    errors = []
+    if window not in LEADERBOARD_WINDOWS:
+        errors.append(f"window must be one of {', '.join(LEADERBOARD_WINDOWS)}.")
+    if order_by not in LEADERBOARD_ORDERINGS:
+        errors.append(f"order_by must be one of {', '.join(LEADERBOARD_ORDERINGS)}.")
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= 100:
+        errors.append("limit must be a number from 1 to 100.")
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+
+    items = [
+        {
+            'menu_item_id': row['menu_item_id'],
+            'name': row['menu_item__name'],
+            'category': row['menu_item__category'],
+            'quantity': row['quantity'],
+            'revenue': str(row['revenue']),
+        }
+        for row in leaderboard(window, order_by, limit)
+    ]
+    return JsonResponse({'window': window, 'order_by': order_by, 'items': items})
+
+def metrics(request):
+    # Prometheus scrape target for the per-route counters kept by
+    # PerformanceMiddleware in this process. Route names and timings are
+    # not for everyone, so only staff see them unless PERF_METRICS_PUBLIC.
+    if not instrumentation_enabled():
+        raise Http404
+    if not (settings.PERF_METRICS_PUBLIC or request.user.is_staff):
+        raise Http404
+    return HttpResponse(route_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Kitchen display
+# Screens load the open tickets once and then follow order changes as
+# Server-Sent Events, so an update costs no queries however many screens
+# are watching. Streams are closed every few minutes and the browser
+# reconnects with Last-Event-ID to pick up where it left off.
+KITCHEN_RETRY_MS = 2000
+KITCHEN_HEARTBEAT_SECONDS = 15
+KITCHEN_STREAM_SECONDS = 300
+
+
+def kitchen_display(request):
+    return render(request, 'restaurant/kitchen.html')
+
+
+def _kitchen_snapshot(tickets):
+    return f"event: snapshot\ndata: {json.dumps(tickets)}\n\n"
+
+
+async def _kitchen_stream(last_id):
+    broker = events.get_broker()
+    subscription, missed = broker.subscribe(last_id)
+    try:
+        yield f"retry: {KITCHEN_RETRY_MS}\n\n"
+        if missed is None:
+            yield _kitchen_snapshot(await sync_to_async(kitchen_tickets)())
+        else:
+            for event in missed:
+                yield event.to_sse()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + KITCHEN_STREAM_SECONDS
+        # A screen that fell too far behind reconnects and reloads a snapshot
+        while loop.time() < deadline and not subscription.overflowed:
+            event = await subscription.get(KITCHEN_HEARTBEAT_SECONDS)
+            yield ': keep-alive\n\n' if event is None else event.to_sse()
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def kitchen_feed(request):
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI an open stream would hold a worker for its whole life,
+        # so send the current tickets and let the browser poll via retry.
+        tickets = await sync_to_async(kitchen_tickets)()
+        body = f"retry: {KITCHEN_RETRY_MS}\n\n" + _kitchen_snapshot(tickets)
+        return HttpResponse(body, content_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+    try:
+        last_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_id = None
+    return StreamingHttpResponse(
+        _kitchen_stream(last_id),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
@@ -2,15 +2,27 @@
 ASGI config for restaurant_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn restaurant_system.asgi:application``)
+to let the kitchen display feed keep its streams open; under WSGI the feed
+falls back to sending a snapshot per request.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
 
+import atexit
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "restaurant_system.settings")
+os.environ.setdefault("RESTAURANT_ASYNC_VIEWS", "1")
 
 application = get_asgi_application()
+
+# Open the pooled database connections before the first request, and close
+# them when the server process exits (see restaurant/db/pool.py)
+from restaurant.db.pool import close_pools, open_pools  # noqa: E402
+
+open_pools()
+atexit.register(close_pools)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "restaurant.instrumentation.PerformanceMiddleware",
+    "restaurant.routers.ReplicaRoutingMiddleware",
+    "restaurant.versions.RequestVersionsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -53,12 +57,25 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "restaurant_system.urls"
 
+# Compiled templates are kept by the cached loader, so each template is
+# parsed once per process. Django does this by default since 4.1; the
+# loaders are spelled out so production does not depend on that default.
+# runserver still resets the cache when a template file changes.
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "restaurant.instrumentation.InstrumentedDjangoTemplates",
         "DIRS": [],
-        "APP_DIRS": True,
+        "APP_DIRS": False,
         "OPTIONS": {
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -75,16 +92,119 @@ WSGI_APPLICATION = "restaurant_system.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+def env_flag(name, default):
+    return os.environ.get(name, '1' if default else '0').lower() in ('1', 'true', 'yes', 'on')
+
+
+# Every value can be overridden from the environment, e.g. RESTAURANT_DB_HOST.
+# The restaurant.db backends are Django's MySQL and SQLite backends plus an
+# optional connection pool (see restaurant/db/pool.py).
+#
+# By default each thread keeps its connection for RESTAURANT_DB_CONN_MAX_AGE
+# seconds instead of connecting for every request ('none' keeps it for good,
+# 0 closes it after each request), checking it still works before reusing
+# it. RESTAURANT_DB_POOL=1 shares a pool of at most RESTAURANT_DB_POOL_SIZE
+# connections between threads instead, which suits ASGI; it replaces
+# persistent connections, so CONN_MAX_AGE is 0 then.
+DB_POOL = env_flag('RESTAURANT_DB_POOL', False)
+DB_CONN_MAX_AGE = os.environ.get('RESTAURANT_DB_CONN_MAX_AGE', '60')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'restaurant_dblocal',
-        'USER': 'root',
-        'PASSWORD': 'root',
-        'HOST': 'localhost',
-        'PORT': '3306',
+        'ENGINE': os.environ.get('RESTAURANT_DB_ENGINE', 'restaurant.db.mysql'),
+        'NAME': os.environ.get('RESTAURANT_DB_NAME', 'restaurant_dblocal'),
+        'USER': os.environ.get('RESTAURANT_DB_USER', 'root'),
+        'PASSWORD': os.environ.get('RESTAURANT_DB_PASSWORD', 'root'),
+        'HOST': os.environ.get('RESTAURANT_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('RESTAURANT_DB_PORT', '3306'),
+        'CONN_MAX_AGE': 0 if DB_POOL else None if DB_CONN_MAX_AGE.lower() == 'none' else int(DB_CONN_MAX_AGE),
+        'CONN_HEALTH_CHECKS': env_flag('RESTAURANT_DB_HEALTH_CHECKS', True),
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('RESTAURANT_DB_POOL_MIN_SIZE', '0')),
+                'max_size': int(os.environ.get('RESTAURANT_DB_POOL_SIZE', '10')),
+                'timeout': float(os.environ.get('RESTAURANT_DB_POOL_TIMEOUT', '30')),
+            },
+        } if DB_POOL else {},
     }
 }
+if 'sqlite' in DATABASES['default']['ENGINE']:
+    # Order writes run in threads against one database (see services.py).
+    # SQLite takes its write lock at BEGIN in IMMEDIATE mode, so a waiting
+    # writer queues for `timeout` seconds instead of failing on upgrade, and
+    # the test database is a file because threads cannot share an in-memory
+    # one without hitting "database table is locked".
+    DATABASES['default']['OPTIONS'].update({'transaction_mode': 'IMMEDIATE', 'timeout': 20})
+    DATABASES['default']['TEST'] = {'NAME': os.environ.get('RESTAURANT_DB_TEST_NAME', str(BASE_DIR / 'test_db.sqlite3'))}
+
+# A read replica for the reporting pages, if RESTAURANT_DB_REPLICA_HOST or
+# RESTAURANT_DB_REPLICA_NAME is set; the other connection settings default to
+# the primary's. See restaurant/routers.py for which reads go there. Its lag
+# is measured with a heartbeat, so run `manage.py replica_heartbeat` next to
+# the app; without it the replica counts as stale and is not used.
+REPLICA_DATABASE = 'replica'
+if os.environ.get('RESTAURANT_DB_REPLICA_HOST') or os.environ.get('RESTAURANT_DB_REPLICA_NAME'):
+    PRIMARY = DATABASES['default']
+    DATABASES[REPLICA_DATABASE] = {
+        **PRIMARY,
+        'NAME': os.environ.get('RESTAURANT_DB_REPLICA_NAME', PRIMARY['NAME']),
+        'USER': os.environ.get('RESTAURANT_DB_REPLICA_USER', PRIMARY['USER']),
+        'PASSWORD': os.environ.get('RESTAURANT_DB_REPLICA_PASSWORD', PRIMARY['PASSWORD']),
+        'HOST': os.environ.get('RESTAURANT_DB_REPLICA_HOST', PRIMARY['HOST']),
+        'PORT': os.environ.get('RESTAURANT_DB_REPLICA_PORT', PRIMARY['PORT']),
+        'OPTIONS': dict(PRIMARY['OPTIONS']),
+        # Tests read the replica through the primary's connection
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['restaurant.routers.ReplicaRouter']
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('RESTAURANT_DB_REPLICA_MAX_LAG', '5'))
+REPLICA_LAG_CHECK_SECONDS = 1
+# How long a client's reads stay on the primary after it changes something
+REPLICA_STICKY_SECONDS = int(os.environ.get('RESTAURANT_DB_REPLICA_STICKY', '10'))
+
+
+# Per-request timing, query and template figures (see restaurant/instrumentation.py),
+# served at /metrics/. Requests slower than the budget are logged with their SQL.
+# /metrics/ answers staff users only, unless RESTAURANT_METRICS_PUBLIC is on
+# for a Prometheus scraper that cannot log in (keep it on a private network).
+PERF_INSTRUMENTATION = True
+PERF_METRICS_PUBLIC = env_flag('RESTAURANT_METRICS_PUBLIC', False)
+PERF_REQUEST_BUDGET_MS = 500
+PERF_ROUTE_BUDGETS_MS = {}
+
+# Serve the read-heavy pages from restaurant/async_views.py. asgi.py turns
+# this on; under WSGI the sync views avoid an async_to_sync hop per request.
+ASYNC_READ_VIEWS = env_flag('RESTAURANT_ASYNC_VIEWS', False)
+
+# Hours the restaurant is open, [start, end) in local time. Occupancy rates
+# (restaurant/occupancy.py) are measured over these hours only.
+RESTAURANT_OPENING_HOURS = (10, 24)
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The menu catalog and floor map snapshots are kept here under version
+# numbers that live in the database (see restaurant/versions.py), so every
+# process sees a change even with locmem. With more than one worker process,
+# a shared backend (Redis/Memcached) also saves each of them building its
+# own snapshot.
+# Rendered rows of the list pages go to 'template_fragments' (see
+# restaurant/templatetags/fragments.py), so thousands of rows do not push
+# the catalog, floor map and occupancy figures out of 'default'. Both need
+# more than locmem's default of 300 entries: a year of occupancy analytics
+# alone is 365 day keys, and a list page is one key per row.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'restaurant',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'restaurant-fragments',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
 
 
 # Password validation
@@ -122,6 +242,39 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = os.environ.get('RESTAURANT_STATIC_ROOT', str(BASE_DIR / 'staticfiles'))
+
+# `npm install && python manage.py build_assets` builds the stylesheet and
+# vendors the JS into restaurant/static (see restaurant/staticfiles.py); the
+# first `npm install` writes package-lock.json; commit it with the output so
+# later builds can use `npm ci`. Outside DEBUG, collectstatic stores the files
+# under hashed names with gzip/brotli copies, and restaurant_system/urls.py
+# serves them with long cache headers unless RESTAURANT_SERVE_STATIC is off
+# because a web server does.
+#
+# Pages load those files as soon as the build output is there, and only
+# fall back to the libraries' CDNs without it; `manage.py check --deploy`
+# warns about that (restaurant/checks.py). RESTAURANT_SELF_HOSTED_ASSETS
+# overrides the choice.
+BUILT_ASSETS = [
+    BASE_DIR / 'restaurant' / 'static' / 'restaurant' / path
+    for path in ('css/app.css', 'vendor/alpine.min.js', 'vendor/chart.umd.min.js', 'vendor/fontawesome/css/all.min.css')
+]
+SELF_HOSTED_ASSETS = env_flag('RESTAURANT_SELF_HOSTED_ASSETS', all(path.exists() for path in BUILT_ASSETS))
+STATIC_MANIFEST = env_flag('RESTAURANT_STATIC_MANIFEST', not DEBUG)
+SERVE_STATIC = env_flag('RESTAURANT_SERVE_STATIC', not DEBUG)
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'restaurant.staticfiles.CompressedManifestStaticFilesStorage' if STATIC_MANIFEST
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
@@ -1,7 +1,18 @@
+import re
+
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from restaurant import staticfiles
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('restaurant.urls')),  
 ]
+
+# Under DEBUG, runserver serves static files itself
+if settings.SERVE_STATIC:
+    urlpatterns.append(
+        re_path(rf'^{re.escape(settings.STATIC_URL.lstrip("/"))}(?P<path>.*)$', staticfiles.serve),
+    )
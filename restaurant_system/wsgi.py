@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/wsgi/
 """
 
+import atexit
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -14,3 +15,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "restaurant_system.settings")
 
 application = get_wsgi_application()
+
+# Open the pooled database connections before the first request, and close
+# them when the server process exits (see restaurant/db/pool.py)
+from restaurant.db.pool import close_pools, open_pools  # noqa: E402
+
+open_pools()
+atexit.register(close_pools)
@@ -0,0 +1,14 @@
+// Used by `python manage.py build_assets`. Only classes found in these files
+// end up in restaurant/static/restaurant/css/app.css.
+module.exports = {
+  content: [
+    './restaurant/templates/**/*.html',
+    // Form widgets and views set classes too
+    './restaurant/**/*.py',
+  ],
+  darkMode: 'class',
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};